@@ -0,0 +1,295 @@
+"""
+Admission control: keeps the processing jobs running at once within a memory budget.
+
+Every request estimates the peak memory of its job from the upload (see
+estimate_workbook_bytes) and takes a ticket for that many bytes. A ticket waits
+until the running tickets leave room for it, so large jobs queue instead of
+running the host out of memory together. Tickets live in SQLite, so the budget is
+shared by every gunicorn worker and job process on the host.
+"""
+import os
+import re
+import time
+import uuid
+import sqlite3
+import zipfile
+import collections
+
+import sheet_reference
+
+# Memory of a job besides its cells: the worker's openpyxl/lxml state, buffers, ...
+JOB_OVERHEAD_BYTES = 32 * 1024 * 1024
+# Peak memory per input cell, measured on 100k x 4 exports: in-memory output
+# workbooks keep every cell (~490 bytes), streaming output keeps nothing per cell
+IN_MEMORY_CELL_BYTES = 512
+# Shared strings are all loaded as Python strings, at roughly this many times their XML size
+SHARED_STRINGS_FACTOR = 3
+# Average sheet XML bytes per cell, for sheets that have no <dimension> element
+XML_BYTES_PER_CELL = 60
+# Only the start of a sheet part is read to find its <dimension>
+SHEET_HEAD_BYTES = 4096
+
+_DIMENSION_RE = re.compile(rb'<dimension\s+ref="[A-Z]*\d*:?([A-Z]+)(\d+)"')
+
+TICKET_WAITING = 'waiting'
+TICKET_RUNNING = 'running'
+
+# What admit() hands out: the ticket's id and its estimated bytes, which let start()
+# register the ticket again if it was dropped as stale in the meantime
+Ticket = collections.namedtuple('Ticket', ['id', 'bytes'])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS admission_tickets (
+    id TEXT PRIMARY KEY,
+    bytes INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    owner_pid INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL
+)
+"""
+
+
+class AdmissionRejected(Exception):
+    """
+    A job the server will not take now. status is the HTTP status to answer with:
+    503 when the job alone exceeds the budget, 429 when the queue is full (retry
+    after retry_after seconds).
+    """
+
+    def __init__(self, message, status, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _column_number(letters):
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number
+
+
+def _sheet_cells(archive, sheet_path):
+    """Number of cells of a sheet part: from its <dimension> if there is one, else from its XML size."""
+    with archive.open(sheet_path) as part:
+        head = part.read(SHEET_HEAD_BYTES)
+    match = _DIMENSION_RE.search(head)
+    if match:
+        return _column_number(match.group(1).decode('ascii')) * int(match.group(2))
+    return archive.getinfo(sheet_path).file_size // XML_BYTES_PER_CELL
+
+
+def estimate_workbook_bytes(source, input_sheet_names=None, streaming=True, sheet_workers=1):
+    """
+    Estimates the peak memory of processing a workbook (a path or a binary file
+    object, which is rewound afterwards).
+
+    input_sheet_names are the sheets that get processed; None means every sheet,
+    e.g. for '*'. streaming is False only for in-memory output workbooks (never
+    used for several sheets). sheet_workers is how many sheets are processed at
+    once, each in its own process with its own copy of the shared strings.
+    The estimate reads the zip directory and the start of each sheet part only.
+    A file that is not a readable xlsx gets JOB_OVERHEAD_BYTES; processing will
+    reject it quickly anyway.
+    """
+    try:
+        with zipfile.ZipFile(source) as archive:
+            paths = sheet_reference.sheet_part_paths(archive)
+            if input_sheet_names is not None:
+                paths = {name: path for name, path in paths.items() if name in input_sheet_names}
+            cells = sum(_sheet_cells(archive, path) for path in paths.values() if path in archive.NameToInfo)
+            try:
+                shared_strings = archive.getinfo('xl/sharedStrings.xml').file_size
+            except KeyError:
+                shared_strings = 0
+    except (zipfile.BadZipFile, KeyError, OSError, SyntaxError, ValueError):
+        return JOB_OVERHEAD_BYTES
+    finally:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+
+    cell_bytes = 0 if streaming else IN_MEMORY_CELL_BYTES
+    processes = max(1, min(len(paths), sheet_workers))
+    return processes * (JOB_OVERHEAD_BYTES + shared_strings * SHARED_STRINGS_FACTOR) + cells * cell_bytes
+
+
+def estimate_batch_bytes(zip_path, max_workers, **options):
+    """
+    Estimates the peak memory of a batch: the max_workers largest workbooks of the
+    zip processed at once. options are passed to estimate_workbook_bytes.
+    """
+    estimates = []
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.lower().endswith('.xlsx'):
+                    continue
+                with archive.open(info) as member:
+                    estimates.append(estimate_workbook_bytes(member, **options))
+    except (zipfile.BadZipFile, OSError):
+        return JOB_OVERHEAD_BYTES
+    estimates.sort(reverse=True)
+    return sum(estimates[:max(1, max_workers)]) or JOB_OVERHEAD_BYTES
+
+
+def default_memory_budget():
+    """Half of the host's physical memory, or None where it cannot be read."""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AdmissionController:
+    """
+    Memory budget shared by the processes of one host.
+
+    admit() registers a job's estimated bytes as a waiting ticket, or raises
+    AdmissionRejected when the job can never fit (503) or when the tickets already
+    waiting add up to more than max_queued_bytes (429). start() then blocks until
+    the running tickets leave room for it (or until timeout), and release() frees
+    it once the job is done. A waiting ticket belongs to the process that admitted
+    it (the gunicorn worker), a running one to the process that started it (the
+    worker itself, or the pool process of a background job); tickets of processes
+    that died are dropped, so a crashed worker or job cannot hold budget forever.
+    A job whose ticket was dropped while it waited is registered again by start()
+    and still waits for room, so it never runs outside the budget.
+
+    With budget_bytes None every method is a no-op and every job is admitted.
+    """
+
+    def __init__(self, db_path, budget_bytes, max_queued_bytes=None, poll_interval=0.5):
+        self.db_path = db_path
+        self.budget_bytes = budget_bytes
+        self.max_queued_bytes = max_queued_bytes
+        self.poll_interval = poll_interval
+        if budget_bytes is None:
+            return
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(_SCHEMA)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _drop_stale(conn):
+        owners = [row['owner_pid'] for row in conn.execute("SELECT DISTINCT owner_pid FROM admission_tickets")]
+        for pid in owners:
+            if not _process_alive(pid):
+                conn.execute("DELETE FROM admission_tickets WHERE owner_pid = ?", (pid,))
+
+    def _totals(self, conn):
+        totals = {TICKET_WAITING: 0, TICKET_RUNNING: 0}
+        for row in conn.execute("SELECT state, SUM(bytes) AS total FROM admission_tickets GROUP BY state"):
+            totals[row['state']] = row['total']
+        return totals
+
+    def admit(self, estimated_bytes):
+        """Registers a job of estimated_bytes and returns its Ticket (None when disabled)."""
+        if self.budget_bytes is None:
+            return None
+        if estimated_bytes > self.budget_bytes:
+            raise AdmissionRejected(
+                f"This file needs about {estimated_bytes // 2 ** 20} MB to process, more than the "
+                f"server's {self.budget_bytes // 2 ** 20} MB limit.", 503)
+        ticket = Ticket(uuid.uuid4().hex, estimated_bytes)
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            self._drop_stale(conn)
+            waiting = self._totals(conn)[TICKET_WAITING]
+            if self.max_queued_bytes is not None and waiting + estimated_bytes > self.max_queued_bytes:
+                conn.rollback()
+                raise AdmissionRejected("Too many files are waiting to be processed. Please retry later.",
+                                        429, retry_after=30)
+            conn.execute("INSERT INTO admission_tickets (id, bytes, state, owner_pid, created_at) "
+                         "VALUES (?, ?, ?, ?, ?)", (ticket.id, ticket.bytes, TICKET_WAITING, os.getpid(), time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+        return ticket
+
+    def _try_start(self, ticket):
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            self._drop_stale(conn)
+            row = conn.execute("SELECT state FROM admission_tickets WHERE id = ?", (ticket.id,)).fetchone()
+            if row is not None and row['state'] == TICKET_RUNNING:
+                conn.rollback()
+                return True
+            if row is None:
+                # Dropped as stale (the admitting process died while the job was queued)
+                conn.execute("INSERT INTO admission_tickets (id, bytes, state, owner_pid, created_at) "
+                             "VALUES (?, ?, ?, ?, ?)", (ticket.id, ticket.bytes, TICKET_WAITING, os.getpid(), time.time()))
+            if self._totals(conn)[TICKET_RUNNING] + ticket.bytes > self.budget_bytes:
+                # A re-registered ticket stays registered as waiting
+                conn.commit()
+                return False
+            # The running job's memory belongs to this process (a job's pool process,
+            # not the worker that admitted it), so stale detection has to follow it
+            conn.execute("UPDATE admission_tickets SET state = ?, started_at = ?, owner_pid = ? WHERE id = ?",
+                         (TICKET_RUNNING, time.time(), os.getpid(), ticket.id))
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+
+    def start(self, ticket, timeout=None):
+        """
+        Waits until the ticket fits in the budget next to the running ones and marks
+        it running. Returns False if that did not happen within timeout seconds.
+        """
+        if ticket is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._try_start(ticket):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    def release(self, ticket):
+        """Frees the ticket's bytes (whether it ran or was still waiting)."""
+        if ticket is None:
+            return
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM admission_tickets WHERE id = ?", (ticket.id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def usage(self):
+        """Bytes and number of tickets running and waiting, plus the budget."""
+        if self.budget_bytes is None:
+            return {'budget_bytes': None}
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT state, COUNT(*) AS count, SUM(bytes) AS total "
+                                "FROM admission_tickets GROUP BY state").fetchall()
+        finally:
+            conn.close()
+        usage = {'budget_bytes': self.budget_bytes, 'running': 0, 'running_bytes': 0, 'waiting': 0, 'waiting_bytes': 0}
+        for row in rows:
+            usage[row['state']] = row['count']
+            usage[f"{row['state']}_bytes"] = row['total']
+        return usage
@@ -1,10 +1,20 @@
 import os
 import json
+import uuid
+import mimetypes
 import logging # Import logging
 import time # Still used for time.sleep if needed, but not for threading.Thread
 from flask import Flask, request, jsonify, send_from_directory
 from werkzeug.utils import secure_filename
 import excel_processor
+import jobs
+import result_cache
+import metrics
+import batch
+import keyword_sets
+import script_detector
+import admission
+import janitor
 
 app = Flask(__name__)
 
@@ -18,55 +28,157 @@ handler.setFormatter(formatter)
 app.logger.addHandler(handler)
 
 # --- Configure upload and processed file directories using absolute paths ---
+# (ACENG_UPLOAD_FOLDER and ACENG_PROCESSED_FOLDER move them elsewhere)
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
-UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
-PROCESSED_FOLDER = os.path.join(BASE_DIR, 'processed_files')
+UPLOAD_FOLDER = os.environ.get('ACENG_UPLOAD_FOLDER', os.path.join(BASE_DIR, 'uploads'))
+PROCESSED_FOLDER = os.environ.get('ACENG_PROCESSED_FOLDER', os.path.join(BASE_DIR, 'processed_files'))
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['PROCESSED_FOLDER'] = PROCESSED_FOLDER
 
+# Reject uploads above this size up front (Flask answers 413 before reading the body)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('ACENG_MAX_UPLOAD_MB', '200')) * 1024 * 1024
+
 # Ensure directories exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(PROCESSED_FOLDER, exist_ok=True)
 app.logger.info(f"Uploads directory: {UPLOAD_FOLDER}")
 app.logger.info(f"Processed files directory: {PROCESSED_FOLDER}")
 
+# Build the output workbooks with write_only (streaming) worksheets so memory stays
+# flat on very large uploads. Set ACENG_STREAMING_OUTPUT=0 to use in-memory workbooks.
+app.config['STREAMING_OUTPUT'] = os.environ.get('ACENG_STREAMING_OUTPUT', '1') != '0'
+
+# Worker processes used to filter the sheets of a multi-sheet request (form field
+# inputSheets) at once; 0 = one per CPU
+app.config['SHEET_WORKERS'] = int(os.environ.get('ACENG_SHEET_WORKERS', '0')) or None
+
+# Data row reader: 'xlsx' parses the sheet XML directly (fast), 'openpyxl' builds
+# openpyxl cells and is kept for parity checks. Both produce the same output.
+app.config['READER'] = os.environ.get('ACENG_READER', 'xlsx')
+
+# Size output columns from the first N data rows only (0 = measure every row). Sampling
+# lets streaming mode read the input sheet once instead of twice.
+app.config['AUTOFIT_SAMPLE_ROWS'] = int(os.environ.get('ACENG_AUTOFIT_SAMPLE_ROWS', '0')) or None
+
+# --- Background jobs ---
+# Job state is kept in SQLite so every gunicorn worker can answer /jobs/<id>;
+# each worker runs at most JOB_WORKERS jobs at once in its own process pool.
+app.config['JOBS_DB'] = os.environ.get('ACENG_JOBS_DB', os.path.join(BASE_DIR, 'jobs.sqlite3'))
+app.config['JOB_WORKERS'] = int(os.environ.get('ACENG_JOB_WORKERS', '2'))
+# Workbooks of one /batch upload processed at once (inside the batch's job process)
+app.config['BATCH_WORKERS'] = int(os.environ.get('ACENG_BATCH_WORKERS', '2'))
+# Limit on the unpacked size of the workbooks in a /batch zip (guards against zip bombs)
+app.config['BATCH_MAX_UNPACKED_MB'] = int(os.environ.get('ACENG_BATCH_MAX_UNPACKED_MB', '2048'))
+job_queue = jobs.JobQueue(app.config['JOBS_DB'], max_workers=app.config['JOB_WORKERS'])
+
+# --- Result cache ---
+# Outputs are keyed by upload hash + keywords + sheet name + processor version, so a
+# re-upload of the same export returns the existing download links. Entries expire
+# after CACHE_MAX_AGE_HOURS and the least recently used go once CACHE_MAX_MB is exceeded.
+app.config['CACHE_MAX_MB'] = int(os.environ.get('ACENG_CACHE_MAX_MB', '2048'))
+app.config['CACHE_MAX_AGE_HOURS'] = float(os.environ.get('ACENG_CACHE_MAX_AGE_HOURS', '24'))
+processed_cache = result_cache.ResultCache(
+    PROCESSED_FOLDER,
+    max_bytes=app.config['CACHE_MAX_MB'] * 1024 * 1024,
+    max_age=app.config['CACHE_MAX_AGE_HOURS'] * 3600
+)
+
+# --- Keyword sets ---
+# Named keyword lists stored server side; uploads can reference one by name
+# (form field keywordSet) instead of sending the whole list every time.
+app.config['KEYWORD_SETS_DB'] = os.environ.get('ACENG_KEYWORD_SETS_DB', os.path.join(BASE_DIR, 'keyword_sets.sqlite3'))
+keyword_set_store = keyword_sets.KeywordSetStore(app.config['KEYWORD_SETS_DB'])
+
+# --- Metrics ---
+# Per-stage timings of every run are aggregated in SQLite (shared by all gunicorn
+# workers and job processes) and served at /metrics in Prometheus text format.
+app.config['METRICS_DB'] = os.environ.get('ACENG_METRICS_DB', os.path.join(BASE_DIR, 'metrics.sqlite3'))
+processing_metrics = metrics.ProcessingMetrics(app.config['METRICS_DB'])
+
+# --- Admission control ---
+# Each upload's peak memory is estimated from its sheets' sizes; jobs only start
+# while the estimates of the running ones fit in MEMORY_BUDGET_MB (default: half of
+# the RAM, 0 = no limit). /process-excel waits up to ADMISSION_WAIT_SECONDS for room,
+# /jobs and /batch queue; a job larger than the budget gets 503, and 429 is returned
+# once the waiting jobs add up to MAX_QUEUED_MB. Shared by all gunicorn workers via SQLite.
+memory_budget_mb = os.environ.get('ACENG_MEMORY_BUDGET_MB', '')
+app.config['MEMORY_BUDGET_MB'] = int(memory_budget_mb) if memory_budget_mb else \
+    (admission.default_memory_budget() or 0) // (1024 * 1024)
+app.config['MAX_QUEUED_MB'] = int(os.environ.get('ACENG_MAX_QUEUED_MB', str(4 * app.config['MEMORY_BUDGET_MB'])))
+app.config['ADMISSION_WAIT_SECONDS'] = float(os.environ.get('ACENG_ADMISSION_WAIT_SECONDS', '30'))
+app.config['ADMISSION_DB'] = os.environ.get('ACENG_ADMISSION_DB', os.path.join(BASE_DIR, 'admission.sqlite3'))
+admission_controller = admission.AdmissionController(
+    app.config['ADMISSION_DB'],
+    budget_bytes=app.config['MEMORY_BUDGET_MB'] * 1024 * 1024 or None,
+    max_queued_bytes=app.config['MAX_QUEUED_MB'] * 1024 * 1024
+)
+
+# --- Processed file janitor ---
+# A background thread in every worker deletes outputs (including batch zips) older
+# than OUTPUT_MAX_AGE_HOURS, then the oldest ones while processed_files is above
+# PROCESSED_MAX_MB, plus uploads left behind for UPLOAD_MAX_AGE_HOURS. A file lock
+# makes one worker sweep per JANITOR_INTERVAL_SECONDS.
+app.config['OUTPUT_MAX_AGE_HOURS'] = float(os.environ.get('ACENG_OUTPUT_MAX_AGE_HOURS', '24'))
+app.config['PROCESSED_MAX_MB'] = int(os.environ.get('ACENG_PROCESSED_MAX_MB', '4096'))
+app.config['UPLOAD_MAX_AGE_HOURS'] = float(os.environ.get('ACENG_UPLOAD_MAX_AGE_HOURS', '24'))
+app.config['JANITOR_INTERVAL_SECONDS'] = float(os.environ.get('ACENG_JANITOR_INTERVAL_SECONDS', '300'))
+file_janitor = janitor.FileJanitor(
+    PROCESSED_FOLDER,
+    UPLOAD_FOLDER,
+    lock_path=os.path.join(PROCESSED_FOLDER, '.janitor.lock'),
+    max_age=app.config['OUTPUT_MAX_AGE_HOURS'] * 3600,
+    max_bytes=app.config['PROCESSED_MAX_MB'] * 1024 * 1024,
+    upload_max_age=app.config['UPLOAD_MAX_AGE_HOURS'] * 3600,
+    interval=app.config['JANITOR_INTERVAL_SECONDS'],
+    cache=processed_cache
+)
+
 
 ALLOWED_EXTENSIONS = {'xlsx'}
 
+# JSON Lines downloads are not in the default mimetypes table
+mimetypes.add_type('application/x-ndjson', '.jsonl')
+
 def allowed_file(filename):
     """Checks if the file extension is allowed."""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# Removed delete_files_after_delay function and threading.Thread usage.
-# For robust background file deletion in production, a dedicated task queue (e.g., Celery)
-# should be used, not direct threading within the Flask app under Gunicorn.
-# Files will now remain in the 'processed_files' directory until manually cleared or
-# until a proper background task system is implemented.
+# Processed outputs are removed by the result cache's age- and size-based eviction
+# (see result_cache.py), which runs whenever a new result is stored, and by the
+# janitor thread (see janitor.py), which also covers batch zips and stale uploads.
+
+@app.before_request
+def start_janitor():
+    """Starts this worker's janitor thread on its first request (after gunicorn forked it)."""
+    file_janitor.ensure_started()
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    """Returns the upload size limit error as JSON, like the other API errors."""
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    app.logger.warning(f"Rejected upload larger than {limit_mb} MB")
+    return jsonify({'error': f'File too large. The maximum upload size is {limit_mb} MB.'}), 413
+
+@app.errorhandler(admission.AdmissionRejected)
+def admission_rejected(e):
+    """Answers a job the memory budget cannot take with 429 (retry later) or 503 (too large)."""
+    app.logger.warning(f"Rejected job: {e}")
+    headers = {'Retry-After': str(e.retry_after)} if e.retry_after else {}
+    return jsonify({'error': str(e)}), e.status, headers
 
 @app.route('/')
 def serve_index():
     """Serves the index.html file from the static directory."""
     return send_from_directory(os.path.join(BASE_DIR, 'static'), 'index.html')
 
-@app.route('/process-excel', methods=['POST'])
-def process_excel_file():
+def parse_processing_options():
     """
-    Handles the uploaded Excel file, processes it with dynamic keywords and input sheet name,
-    and returns download links.
+    Validates the processing options of the upload forms (keywords, sheet name, output format, ...).
+    Returns (options, None) on success or (None, (response, status)) on a bad request.
     """
-    if 'excelFile' not in request.files:
-        app.logger.warning('No file part in request')
-        return jsonify({'error': 'No file part'}), 400
-
-    file = request.files['excelFile']
-
-    if file.filename == '':
-        app.logger.warning('No selected file')
-        return jsonify({'error': 'No selected file'}), 400
-
     # Get keywords from the form data
     keywords_json = request.form.get('keywords')
     keywords_list = []
@@ -78,10 +190,25 @@ def process_excel_file():
             app.logger.info(f"Received keywords: {keywords_list}")
         except json.JSONDecodeError:
             app.logger.error('Invalid keywords JSON format')
-            return jsonify({'error': 'Invalid keywords format'}), 400
+            return None, (jsonify({'error': 'Invalid keywords format'}), 400)
         except ValueError as e:
             app.logger.error(f'Keywords format error: {e}')
-            return jsonify({'error': str(e)}), 400
+            return None, (jsonify({'error': str(e)}), 400)
+
+    # A saved keyword set replaces the keywords field; its compiled matcher is cached
+    keyword_set_name = request.form.get('keywordSet', '').strip()
+    keyword_matcher = None
+    keyword_set = None
+    if keyword_set_name:
+        if keywords_list:
+            app.logger.warning('Both keywords and keywordSet given')
+            return None, (jsonify({'error': 'Send either keywords or keywordSet, not both.'}), 400)
+        keyword_set, keyword_matcher = keyword_set_store.matcher(keyword_set_name)
+        if keyword_set is None:
+            app.logger.warning(f"Unknown keyword set requested: {keyword_set_name}")
+            return None, (jsonify({'error': f"Keyword set '{keyword_set_name}' not found."}), 404)
+        keywords_list = keyword_set['keywords']
+        app.logger.info(f"Using keyword set '{keyword_set_name}' version {keyword_set['version']}")
     if not keywords_list:
         app.logger.info("No keywords provided, proceeding without specific keyword filtering.")
         keywords_list = []
@@ -92,55 +219,468 @@ def process_excel_file():
         input_sheet_name = 'Sheet1'
     app.logger.info(f"Using input sheet name: '{input_sheet_name}'")
 
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        input_filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        
-        try:
-            file.save(input_filepath)
-            app.logger.info(f"File saved to: {input_filepath}")
-        except Exception as e:
-            app.logger.error(f"Failed to save uploaded file {filename}: {e}")
-            return jsonify({'error': f'Failed to save uploaded file: {str(e)}'}), 500
+    # Several sheets at once instead: '*' for every sheet with a KONTEN column, or a
+    # comma-separated list of sheet names
+    input_sheets_text = request.form.get('inputSheets', '').strip()
+    input_sheet_names = None
+    if input_sheets_text:
+        input_sheet_names = excel_processor.ALL_KONTEN_SHEETS if input_sheets_text == excel_processor.ALL_KONTEN_SHEETS \
+            else [sheet_name.strip() for sheet_name in input_sheets_text.split(',') if sheet_name.strip()]
+        app.logger.info(f"Using input sheets: {input_sheet_names}")
 
-        cleaned_output_filename = f"cleaned_{filename}"
-        excluded_output_filename = f"excluded_{filename}"
-        cleaned_output_filepath = os.path.join(app.config['PROCESSED_FOLDER'], cleaned_output_filename)
-        excluded_output_filepath = os.path.join(app.config['PROCESSED_FOLDER'], excluded_output_filename)
+    # Optionally add a column to the excluded file saying why each row was excluded
+    include_reason = request.form.get('includeReason', 'false').strip().lower() in ('1', 'true', 'on', 'yes')
 
+    # Other sheets of the workbook: 'copy' (default), 'skip' or 'reference' (raw XML copy)
+    auxiliary_sheets = request.form.get('auxiliarySheets', 'copy').strip().lower() or 'copy'
+    if auxiliary_sheets not in excel_processor.AUXILIARY_SHEET_MODES:
+        app.logger.warning(f"Invalid auxiliary sheet mode requested: {auxiliary_sheets}")
+        return None, (jsonify({'error': f"Invalid auxiliarySheets '{auxiliary_sheets}'. Expected one of: {', '.join(excel_processor.AUXILIARY_SHEET_MODES)}."}), 400)
+
+    # Output file format: 'xlsx' (default), 'csv', 'csv.gz' or 'jsonl'
+    output_format = request.form.get('outputFormat', 'xlsx').strip().lower() or 'xlsx'
+    if output_format not in excel_processor.OUTPUT_FORMATS:
+        app.logger.warning(f"Invalid output format requested: {output_format}")
+        return None, (jsonify({'error': f"Invalid outputFormat '{output_format}'. Expected one of: {', '.join(excel_processor.OUTPUT_FORMATS)}."}), 400)
+    if input_sheet_names is not None and output_format != 'xlsx':
+        app.logger.warning(f"Output format {output_format} requested for several sheets")
+        return None, (jsonify({'error': "inputSheets needs outputFormat 'xlsx'."}), 400)
+
+    # Scripts whose characters exclude a row (comma-separated names; empty = the defaults)
+    # and the share of KONTEN characters they must reach (empty = any character)
+    foreign_scripts_text = request.form.get('foreignScripts', '').strip().lower()
+    foreign_scripts = None
+    if foreign_scripts_text:
+        foreign_scripts = [] if foreign_scripts_text == 'none' else \
+            [script.strip() for script in foreign_scripts_text.split(',') if script.strip()]
+        unknown = [script for script in foreign_scripts if script not in script_detector.SCRIPT_RANGES]
+        if unknown:
+            app.logger.warning(f"Invalid foreign scripts requested: {unknown}")
+            return None, (jsonify({'error': f"Invalid foreignScripts {', '.join(unknown)}. Expected 'none' or any of: {', '.join(script_detector.SCRIPT_RANGES)}."}), 400)
+    foreign_ratio_text = request.form.get('foreignRatio', '').strip()
+    foreign_ratio = None
+    if foreign_ratio_text:
         try:
-            app.logger.info(f"Starting Excel processing for {filename}...")
-            excel_processor.process_data_excel(
-                input_filepath,
-                cleaned_output_filepath,
-                excluded_output_filepath,
-                keywords_list,
-                input_sheet_name
-            )
-            app.logger.info(f"Finished Excel processing for {filename}.")
-
-            # Files are no longer automatically deleted by this Flask app.
-            # Implement a dedicated task queue for background deletion if needed.
-            
-            return jsonify({
-                'message': 'File processed successfully',
-                'cleaned_url': f'/downloads/{cleaned_output_filename}',
-                'excluded_url': f'/downloads/{excluded_output_filename}'
-            }), 200
-
-        except Exception as e:
-            app.logger.error(f"Error during processing of {filename}: {e}", exc_info=True) # exc_info to log full traceback
-            return jsonify({'error': f'File processing failed: {str(e)}'}), 500
-    else:
+            foreign_ratio = float(foreign_ratio_text)
+        except ValueError:
+            foreign_ratio = -1
+        if not 0 < foreign_ratio <= 1:
+            app.logger.warning(f"Invalid foreign ratio requested: {foreign_ratio_text}")
+            return None, (jsonify({'error': f"Invalid foreignRatio '{foreign_ratio_text}'. Expected a number above 0 and at most 1."}), 400)
+
+    # Repeated rows (same UUID, or same normalized KONTEN): 'off', 'exclude' or 'drop'
+    dedup = request.form.get('dedup', 'off').strip().lower() or 'off'
+    if dedup not in excel_processor.DEDUP_MODES:
+        app.logger.warning(f"Invalid dedup mode requested: {dedup}")
+        return None, (jsonify({'error': f"Invalid dedup '{dedup}'. Expected one of: {', '.join(excel_processor.DEDUP_MODES)}."}), 400)
+    dedup_key = request.form.get('dedupKey', 'auto').strip().lower() or 'auto'
+    if dedup_key not in excel_processor.DEDUP_KEYS:
+        app.logger.warning(f"Invalid dedup key requested: {dedup_key}")
+        return None, (jsonify({'error': f"Invalid dedupKey '{dedup_key}'. Expected one of: {', '.join(excel_processor.DEDUP_KEYS)}."}), 400)
+
+    return {
+        'keywords_list': keywords_list,
+        'keyword_matcher': keyword_matcher,
+        'dedup': dedup,
+        'dedup_key': dedup_key,
+        'foreign_scripts': foreign_scripts,
+        'foreign_ratio': foreign_ratio,
+        'input_sheet_name': input_sheet_name,
+        'input_sheet_names': input_sheet_names,
+        'include_reason': include_reason,
+        'auxiliary_sheets': auxiliary_sheets,
+        'output_format': output_format,
+    }, None
+
+
+def parse_processing_request():
+    """
+    Validates the upload form shared by /process-excel and /jobs.
+    Returns (options, None) on success or (None, (response, status)) on a bad request.
+    """
+    if 'excelFile' not in request.files:
+        app.logger.warning('No file part in request')
+        return None, (jsonify({'error': 'No file part'}), 400)
+
+    file = request.files['excelFile']
+
+    if file.filename == '':
+        app.logger.warning('No selected file')
+        return None, (jsonify({'error': 'No selected file'}), 400)
+
+    options, error = parse_processing_options()
+    if error:
+        return None, error
+
+    if not allowed_file(file.filename):
         app.logger.warning(f"Invalid file type uploaded: {file.filename}")
-        return jsonify({'error': 'Invalid file type. Only .xlsx files are allowed.'}), 400
+        return None, (jsonify({'error': 'Invalid file type. Only .xlsx files are allowed.'}), 400)
+
+    return dict(options, file=file, filename=secure_filename(file.filename)), None
+
+
+def processing_cache_key(options):
+    """Cache key of a request: upload bytes, keywords, sheet name, processor version and output options."""
+    file_digest = result_cache.hash_stream(options['file'].stream)
+    return result_cache.cache_key(
+        file_digest,
+        options['keywords_list'],
+        options['input_sheet_name'],
+        excel_processor.PROCESSOR_VERSION,
+        {'reason_column': options['include_reason'],
+         'auxiliary_sheets': options['auxiliary_sheets'],
+         'output_format': options['output_format'],
+         'foreign_scripts': options['foreign_scripts'],
+         'foreign_ratio': options['foreign_ratio'],
+         'dedup': options['dedup'], 'dedup_key': options['dedup_key'],
+         'input_sheet_names': options['input_sheet_names'],
+         'autofit_sample_rows': app.config['AUTOFIT_SAMPLE_ROWS']}
+    )
+
+
+def save_upload(file, filename):
+    """
+    Copies an upload into its own file under UPLOAD_FOLDER and returns the path.
+    The random prefix keeps concurrent uploads with the same name apart.
+    """
+    input_filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
+    file.stream.seek(0)
+    file.save(input_filepath)
+    app.logger.info(f"File saved to: {input_filepath}")
+    return input_filepath
+
+
+def prepare_processing(options, key, persist_upload=False):
+    """
+    Builds the process_data_excel arguments and download URLs for a request.
+    Output names include the cache key, so different uploads with the same file
+    name no longer overwrite each other. The processor writes to per-run staging
+    paths; outputs lists (staged path, final path) pairs for
+    result_cache.publish_outputs, so concurrent runs of the same upload never
+    write the same file. Returns (processor_kwargs, urls, outputs).
+
+    By default the workbook is read straight from the request's spooled upload
+    stream, without another copy on disk. Background jobs outlive the request,
+    so with persist_upload=True the upload is saved to a unique path first.
+    """
+    filename = options['filename']
+    if persist_upload:
+        input_filepath = save_upload(options['file'], filename)
+    else:
+        input_filepath = options['file'].stream
+        input_filepath.seek(0)
+
+    # e.g. export.xlsx -> export.csv.gz for the csv.gz output format
+    output_filename = filename
+    if options['output_format'] != 'xlsx':
+        output_filename = f"{os.path.splitext(filename)[0]}.{options['output_format']}"
+    cleaned_output_filename = processed_cache.output_name(key, output_filename, 'cleaned')
+    excluded_output_filename = processed_cache.output_name(key, output_filename, 'excluded')
+    outputs = [(result_cache.staging_path(path), path)
+               for path in (os.path.join(app.config['PROCESSED_FOLDER'], cleaned_output_filename),
+                            os.path.join(app.config['PROCESSED_FOLDER'], excluded_output_filename))]
+
+    processor_kwargs = {
+        'input_filepath': input_filepath,
+        'cleaned_output_filepath': outputs[0][0],
+        'excluded_output_filepath': outputs[1][0],
+        'keywords_list': options['keywords_list'],
+        'keyword_matcher': options['keyword_matcher'],
+        'input_sheet_name': options['input_sheet_name'],
+        'streaming': app.config['STREAMING_OUTPUT'],
+        'reason_column': options['include_reason'],
+        'auxiliary_sheets': options['auxiliary_sheets'],
+        'autofit_sample_rows': app.config['AUTOFIT_SAMPLE_ROWS'],
+        'reader': app.config['READER'],
+        'output_format': options['output_format'],
+        'foreign_scripts': options['foreign_scripts'],
+        'foreign_ratio': options['foreign_ratio'],
+        'dedup': options['dedup'],
+        'dedup_key': options['dedup_key'],
+        'input_sheet_names': options['input_sheet_names'],
+        'sheet_workers': app.config['SHEET_WORKERS'],
+    }
+    urls = {
+        'cleaned_url': f'/downloads/{cleaned_output_filename}',
+        'excluded_url': f'/downloads/{excluded_output_filename}',
+    }
+    return processor_kwargs, urls, outputs
+
+
+def estimate_options(options):
+    """The admission.estimate_workbook_bytes arguments matching a request's processing options."""
+    sheet_names = options['input_sheet_names']
+    if sheet_names is None:
+        # Only xlsx output of a single sheet can be built in memory
+        return {'input_sheet_names': [options['input_sheet_name']],
+                'streaming': app.config['STREAMING_OUTPUT'] or options['output_format'] != 'xlsx'}
+    return {'input_sheet_names': None if sheet_names == excel_processor.ALL_KONTEN_SHEETS else sheet_names,
+            'sheet_workers': app.config['SHEET_WORKERS'] or os.cpu_count() or 1}
+
+
+def estimate_job_bytes(options):
+    """Estimated peak memory of processing the request's upload with its options."""
+    return admission.estimate_workbook_bytes(options['file'].stream, **estimate_options(options))
+
+
+def record_metrics(summary):
+    """
+    Adds a finished run (or a failed one, when summary is None) to /metrics.
+    Errors are only logged, so metrics never fail a request.
+    """
+    try:
+        if summary is None:
+            processing_metrics.record_failure()
+        else:
+            processing_metrics.record_run(summary)
+    except Exception as e:
+        app.logger.error(f"Could not record processing metrics: {e}")
+
+
+@app.route('/process-excel', methods=['POST'])
+def process_excel_file():
+    """
+    Handles the uploaded Excel file, processes it with dynamic keywords and input sheet name,
+    and returns download links. Blocks until processing is done; see /jobs for the
+    asynchronous variant. Repeated requests are answered from the result cache.
+    """
+    options, error = parse_processing_request()
+    if error:
+        return error
+    filename = options['filename']
+
+    key = processing_cache_key(options)
+    cached = processed_cache.lookup(key)
+    if cached is not None:
+        app.logger.info(f"Result cache hit for {filename} ({key[:16]}).")
+        return jsonify({'message': 'File processed successfully', 'cached': True, **cached}), 200
+
+    ticket = admission_controller.admit(estimate_job_bytes(options))
+    if not admission_controller.start(ticket, timeout=app.config['ADMISSION_WAIT_SECONDS']):
+        admission_controller.release(ticket)
+        raise admission.AdmissionRejected('The server is busy processing other files. Please retry later, '
+                                          'or submit the file to /jobs.', 429, retry_after=30)
+    try:
+        return run_processing(options, key)
+    finally:
+        admission_controller.release(ticket)
+
+
+def run_processing(options, key):
+    """Processes an admitted /process-excel request and returns its response."""
+    filename = options['filename']
+    try:
+        processor_kwargs, urls, outputs = prepare_processing(options, key)
+    except Exception as e:
+        app.logger.error(f"Failed to read uploaded file {filename}: {e}")
+        return jsonify({'error': f'Failed to read uploaded file: {str(e)}'}), 500
+
+    try:
+        app.logger.info(f"Starting Excel processing for {filename}...")
+        summary = excel_processor.process_data_excel(**processor_kwargs)
+        app.logger.info(f"Finished Excel processing for {filename}.")
+        app.logger.info(json.dumps({'event': 'excel_processed', 'filename': filename, **summary}))
+        record_metrics(summary)
+
+        result_cache.publish_outputs(outputs)
+        result = {**urls, **summary}
+        processed_cache.store(key, [os.path.basename(final_path) for _, final_path in outputs], result)
+
+        return jsonify({
+            'message': 'File processed successfully',
+            'cached': False,
+            **result
+        }), 200
+
+    except Exception as e:
+        app.logger.error(f"Error during processing of {filename}: {e}", exc_info=True) # exc_info to log full traceback
+        record_metrics(None)
+        result_cache.discard_outputs(outputs)
+        return jsonify({'error': f'File processing failed: {str(e)}'}), 500
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Accepts the same form as /process-excel but processes the file in the background.
+    Returns a job id right away; poll /jobs/<job_id> for progress and the download links.
+    On a result cache hit the download links are returned immediately with status 'done'.
+    """
+    options, error = parse_processing_request()
+    if error:
+        return error
+    filename = options['filename']
+
+    key = processing_cache_key(options)
+    cached = processed_cache.lookup(key)
+    if cached is not None:
+        app.logger.info(f"Result cache hit for {filename} ({key[:16]}).")
+        return jsonify({'message': 'File processed successfully', 'status': jobs.JOB_DONE,
+                        'cached': True, **cached}), 200
+
+    # The job waits in the queue until its ticket fits in the memory budget
+    ticket = admission_controller.admit(estimate_job_bytes(options))
+    try:
+        processor_kwargs, urls, outputs = prepare_processing(options, key, persist_upload=True)
+    except Exception as e:
+        admission_controller.release(ticket)
+        app.logger.error(f"Failed to save uploaded file {filename}: {e}")
+        return jsonify({'error': f'Failed to save uploaded file: {str(e)}'}), 500
+
+    try:
+        job_id = job_queue.submit(processor_kwargs, result=urls, filename=filename,
+                                  cache=processed_cache, cache_key=key, metrics=processing_metrics,
+                                  admission=admission_controller, admission_ticket=ticket, outputs=outputs)
+    except Exception as e:
+        admission_controller.release(ticket)
+        app.logger.error(f"Failed to queue processing of {filename}: {e}", exc_info=True)
+        return jsonify({'error': f'Failed to queue file for processing: {str(e)}'}), 500
+
+    app.logger.info(f"Queued Excel processing for {filename} as job {job_id}.")
+    return jsonify({
+        'message': 'File queued for processing',
+        'status': jobs.JOB_QUEUED,
+        'job_id': job_id,
+        'status_url': f'/jobs/{job_id}'
+    }), 202
+
+
+@app.route('/batch', methods=['POST'])
+def submit_batch():
+    """
+    Accepts a zip of .xlsx workbooks (form field zipFile) plus the same options as
+    /jobs and processes every workbook with them as one background job. The keywords
+    are compiled once for the whole batch. Poll /jobs/<job_id>; once it is done,
+    result_url points to a zip with all cleaned/excluded files and a manifest.json.
+    """
+    if 'zipFile' not in request.files or request.files['zipFile'].filename == '':
+        app.logger.warning('No zip file in batch request')
+        return jsonify({'error': 'No zip file selected'}), 400
+    file = request.files['zipFile']
+    if not file.filename.lower().endswith('.zip'):
+        app.logger.warning(f"Invalid batch file type uploaded: {file.filename}")
+        return jsonify({'error': 'Invalid file type. Only .zip files are allowed.'}), 400
+
+    options, error = parse_processing_options()
+    if error:
+        return error
+    filename = secure_filename(file.filename)
+
+    try:
+        zip_filepath = save_upload(file, filename)
+    except Exception as e:
+        app.logger.error(f"Failed to save uploaded file {filename}: {e}")
+        return jsonify({'error': f'Failed to save uploaded file: {str(e)}'}), 500
+
+    try:
+        ticket = admission_controller.admit(admission.estimate_batch_bytes(
+            zip_filepath, app.config['BATCH_WORKERS'], **estimate_options(options)))
+    except admission.AdmissionRejected:
+        os.remove(zip_filepath)
+        raise
+
+    result_filename = f"batch_{uuid.uuid4().hex}.zip"
+    batch_kwargs = {
+        'source': zip_filepath,
+        'result_zip_path': os.path.join(app.config['PROCESSED_FOLDER'], result_filename),
+        'keywords_list': options['keywords_list'],
+        'keyword_matcher': options['keyword_matcher'],
+        'input_sheet_name': options['input_sheet_name'],
+        'max_workers': app.config['BATCH_WORKERS'],
+        'max_total_bytes': app.config['BATCH_MAX_UNPACKED_MB'] * 1024 * 1024,
+        'streaming': app.config['STREAMING_OUTPUT'],
+        'reason_column': options['include_reason'],
+        'auxiliary_sheets': options['auxiliary_sheets'],
+        'autofit_sample_rows': app.config['AUTOFIT_SAMPLE_ROWS'],
+        'reader': app.config['READER'],
+        'output_format': options['output_format'],
+        'foreign_scripts': options['foreign_scripts'],
+        'foreign_ratio': options['foreign_ratio'],
+        'dedup': options['dedup'],
+        'dedup_key': options['dedup_key'],
+        'input_sheet_names': options['input_sheet_names'],
+        'sheet_workers': app.config['SHEET_WORKERS'],
+    }
+    try:
+        job_id = job_queue.submit(batch_kwargs, result={'result_url': f'/downloads/{result_filename}'},
+                                  filename=filename, runner=batch.run_batch,
+                                  admission=admission_controller, admission_ticket=ticket)
+    except Exception as e:
+        admission_controller.release(ticket)
+        app.logger.error(f"Failed to queue batch {filename}: {e}", exc_info=True)
+        return jsonify({'error': f'Failed to queue batch for processing: {str(e)}'}), 500
+
+    app.logger.info(f"Queued batch processing of {filename} as job {job_id}.")
+    return jsonify({
+        'message': 'Batch queued for processing',
+        'status': jobs.JOB_QUEUED,
+        'job_id': job_id,
+        'status_url': f'/jobs/{job_id}'
+    }), 202
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Returns the status and progress of a background job, plus download links once it is done."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job), 200
+
+@app.route('/keyword-sets', methods=['GET'])
+def list_keyword_sets():
+    """Lists the saved keyword sets (name, version, keyword count)."""
+    return jsonify({'keyword_sets': keyword_set_store.list()}), 200
+
+@app.route('/keyword-sets/<name>', methods=['GET'])
+def get_keyword_set(name):
+    """Returns a saved keyword set with its keywords."""
+    keyword_set = keyword_set_store.get(name)
+    if keyword_set is None:
+        return jsonify({'error': 'Keyword set not found'}), 404
+    return jsonify(keyword_set), 200
+
+@app.route('/keyword-sets/<name>', methods=['PUT'])
+def put_keyword_set(name):
+    """
+    Creates or replaces a keyword set from a JSON body {"keywords": [...]}.
+    Every update bumps the set's version; uploads then reference it as keywordSet=<name>.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or 'keywords' not in body:
+        return jsonify({'error': 'Expected a JSON body with a "keywords" list.'}), 400
+    try:
+        keyword_set, created = keyword_set_store.put(name, body['keywords'])
+    except ValueError as e:
+        app.logger.warning(f"Invalid keyword set {name}: {e}")
+        return jsonify({'error': str(e)}), 400
+    app.logger.info(f"Saved keyword set '{name}' version {keyword_set['version']} "
+                    f"({keyword_set['keyword_count']} keywords).")
+    return jsonify(keyword_set), 201 if created else 200
+
+@app.route('/keyword-sets/<name>', methods=['DELETE'])
+def delete_keyword_set(name):
+    """Deletes a keyword set."""
+    if not keyword_set_store.delete(name):
+        return jsonify({'error': 'Keyword set not found'}), 404
+    app.logger.info(f"Deleted keyword set '{name}'.")
+    return '', 204
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Aggregated processing metrics in the Prometheus text exposition format."""
+    return processing_metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
 @app.route('/downloads/<filename>')
 def download_file(filename):
-    """Serves the processed files for download."""
+    """
+    Serves the processed files for download. send_from_directory streams the file in
+    chunks (through the server's wsgi.file_wrapper where available) and answers Range
+    requests, so large outputs are never read into memory.
+    """
     # Ensure processed files are served from the correct absolute path
     app.logger.info(f"Serving download for: {filename}")
-    return send_from_directory(os.path.join(BASE_DIR, 'processed_files'), filename, as_attachment=True)
+    return send_from_directory(app.config['PROCESSED_FOLDER'], filename, as_attachment=True)
 
 # The if __name__ == '__main__': block is for local development only and is ignored by Gunicorn.
 # No changes are needed or made here for production deployment.
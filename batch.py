@@ -0,0 +1,320 @@
+"""
+Batch processing of many workbooks with one keyword list.
+
+The keywords are compiled into a KeywordMatcher once; the workbooks are then split
+by a bounded process pool (each worker receives the compiled matcher once, through
+the pool initializer) and all outputs are packed into a single zip together with a
+manifest.json describing every file.
+
+Used by the /batch endpoint of app.py (a zip of workbooks) and from the command line
+for offline runs without Flask:
+
+    python batch.py exports/ -o results.zip -k gopay dijual --sheet "Media Sosial"
+    python batch.py exports.zip -o results.zip --keywords-file keywords.txt --workers 4
+"""
+import os
+import sys
+import re
+import json
+import time
+import shutil
+import zipfile
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import excel_processor
+import script_detector
+from keyword_matcher import KeywordMatcher
+
+MANIFEST_NAME = 'manifest.json'
+WORKBOOK_EXTENSION = '.xlsx'
+# Outputs that are already compressed are stored as is in the result zip
+_STORED_FORMATS = ('xlsx', 'csv.gz')
+# Characters kept in the names of extracted workbooks; runs of anything else become '_'
+_UNSAFE_NAME_CHARACTERS = re.compile(r'[^A-Za-z0-9._-]+')
+
+# Matcher of a batch pool worker, set once by _init_batch_worker
+_worker_keyword_matcher = None
+
+
+def _init_batch_worker(keyword_matcher):
+    global _worker_keyword_matcher
+    _worker_keyword_matcher = keyword_matcher
+
+
+def _process_batch_file(processor_kwargs):
+    """Runs in a pool worker: processes one workbook with the worker's matcher."""
+    return excel_processor.process_data_excel(keyword_matcher=_worker_keyword_matcher, **processor_kwargs)
+
+
+def output_name(prefix, name, output_format):
+    """Name of an output file in the result zip, e.g. cleaned_export.csv for export.xlsx."""
+    if output_format != 'xlsx':
+        name = f"{os.path.splitext(name)[0]}.{output_format}"
+    return f"{prefix}_{name}"
+
+
+def collect_workbooks(directory):
+    """Returns (name, path) for every .xlsx file directly inside directory, sorted by name."""
+    workbooks = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.lower().endswith(WORKBOOK_EXTENSION) and not name.startswith('~$') and os.path.isfile(path):
+            workbooks.append((name, path))
+    return workbooks
+
+
+def safe_member_name(member_name):
+    """
+    File name for a zip member: its last path component (with '/' or '\\' as
+    separator), restricted to letters, digits, '.', '_' and '-'. Returns '' when
+    nothing usable is left.
+    """
+    name = os.path.basename(member_name.replace('\\', '/'))
+    return _UNSAFE_NAME_CHARACTERS.sub('_', name).strip('._')
+
+
+def extract_workbooks(archive, destination, max_total_bytes=None):
+    """
+    Extracts the .xlsx members of a zip (a path or file object) into destination and
+    returns (name, path) for each. Folders inside the zip are flattened; member names
+    are sanitised, so nothing can be written outside destination, and duplicates get
+    a numeric prefix. Raises ValueError if the zip is invalid, holds no workbooks or
+    would unpack to more than max_total_bytes.
+    """
+    try:
+        zip_file = zipfile.ZipFile(archive)
+    except zipfile.BadZipFile:
+        raise ValueError("The uploaded file is not a valid zip archive.")
+
+    with zip_file:
+        members = [info for info in zip_file.infolist()
+                   if not info.is_dir()
+                   and info.filename.lower().endswith(WORKBOOK_EXTENSION)
+                   and not info.filename.startswith('__MACOSX/')
+                   and not os.path.basename(info.filename).startswith('~$')]
+        if not members:
+            raise ValueError("The zip archive contains no .xlsx workbooks.")
+        total_bytes = sum(info.file_size for info in members)
+        if max_total_bytes is not None and total_bytes > max_total_bytes:
+            raise ValueError(f"The workbooks in the zip archive unpack to {total_bytes} bytes, "
+                             f"more than the limit of {max_total_bytes} bytes.")
+
+        workbooks = []
+        used_names = set()
+        for index, info in enumerate(members):
+            name = safe_member_name(info.filename)
+            if not name.lower().endswith(WORKBOOK_EXTENSION):
+                name = f"workbook{WORKBOOK_EXTENSION}"
+            if name in used_names:
+                name = f"{index}_{name}"
+            used_names.add(name)
+            path = os.path.join(destination, name)
+            with zip_file.open(info) as src, open(path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            workbooks.append((name, path))
+    return workbooks
+
+
+def process_batch(workbooks, output_dir, keywords_list=None, input_sheet_name='Sheet1', max_workers=2,
+                  progress_callback=None, keyword_matcher=None, **processor_options):
+    """
+    Processes every (name, path) in workbooks with the same keywords and options and
+    returns the manifest (a dict). Outputs are written to output_dir as
+    cleaned_<name> / excluded_<name>.
+
+    The keywords are compiled once (unless a prebuilt keyword_matcher is given) and
+    handed to each of the max_workers pool workers when it starts; at most max_workers files are processed at once. A file
+    that fails is recorded in the manifest and does not stop the others. Input files
+    are deleted once processed, like process_data_excel does for single uploads.
+    processor_options are passed on to process_data_excel (output_format, reader, ...).
+    progress_callback, if given, is called as progress_callback(rows_processed,
+    rows_excluded) with the batch totals after each file.
+    """
+    if keyword_matcher is None:
+        keyword_matcher = KeywordMatcher(keywords_list or [])
+    output_format = processor_options.get('output_format', 'xlsx')
+    started_at = time.time()
+
+    files = []
+    totals = {'rows_processed': 0, 'rows_kept': 0, 'rows_excluded': 0}
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_batch_worker,
+                             initargs=(keyword_matcher,)) as pool:
+        futures = {}
+        for name, path in workbooks:
+            cleaned_name = output_name('cleaned', name, output_format)
+            excluded_name = output_name('excluded', name, output_format)
+            processor_kwargs = dict(processor_options,
+                                    input_filepath=path,
+                                    cleaned_output_filepath=os.path.join(output_dir, cleaned_name),
+                                    excluded_output_filepath=os.path.join(output_dir, excluded_name),
+                                    input_sheet_name=input_sheet_name)
+            futures[pool.submit(_process_batch_file, processor_kwargs)] = (name, cleaned_name, excluded_name)
+
+        for future in as_completed(futures):
+            name, cleaned_name, excluded_name = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                print(f"Batch: processing {name} failed: {e}")
+                files.append({'name': name, 'status': 'failed', 'error': str(e)})
+                continue
+            files.append({'name': name, 'status': 'done', 'cleaned_file': cleaned_name,
+                          'excluded_file': excluded_name, **summary})
+            for field in totals:
+                totals[field] += summary.get(field, 0)
+            if progress_callback:
+                progress_callback(totals['rows_processed'], totals['rows_excluded'])
+
+    files.sort(key=lambda entry: entry['name'])
+    return {
+        'input_sheet_name': input_sheet_name,
+        'keywords': [str(keyword).strip() for keyword in keywords_list or []],
+        'options': processor_options,
+        'files_total': len(files),
+        'files_done': sum(1 for entry in files if entry['status'] == 'done'),
+        'files_failed': sum(1 for entry in files if entry['status'] == 'failed'),
+        **totals,
+        'started_at': started_at,
+        'finished_at': time.time(),
+        'files': files,
+    }
+
+
+def write_result_zip(zip_path, output_dir, manifest):
+    """Packs the outputs listed in manifest (found in output_dir) plus manifest.json into zip_path."""
+    output_format = manifest['options'].get('output_format', 'xlsx')
+    compression = zipfile.ZIP_STORED if output_format in _STORED_FORMATS else zipfile.ZIP_DEFLATED
+    tmp_path = f"{zip_path}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as result:
+        for entry in manifest['files']:
+            if entry['status'] != 'done':
+                continue
+            for key in ('cleaned_file', 'excluded_file'):
+                result.write(os.path.join(output_dir, entry[key]), entry[key], compress_type=compression)
+        result.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2, ensure_ascii=False, default=str))
+    os.replace(tmp_path, zip_path)
+
+
+def run_batch(source, result_zip_path, keywords_list=None, input_sheet_name='Sheet1', max_workers=2,
+              max_total_bytes=None, progress_callback=None, keyword_matcher=None, **processor_options):
+    """
+    Processes all workbooks of source (a directory, or a zip given as path or file
+    object) into a single result zip at result_zip_path and returns the manifest.
+    Intermediate files live in a temporary directory that is removed afterwards; a
+    zip source given as a path is deleted too, like a processed upload.
+    """
+    workdir = tempfile.mkdtemp(prefix='aceng_batch_')
+    try:
+        input_dir = os.path.join(workdir, 'input')
+        output_dir = os.path.join(workdir, 'output')
+        os.makedirs(input_dir)
+        os.makedirs(output_dir)
+
+        if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+            # Work on copies: process_data_excel deletes its input files
+            workbooks = []
+            for name, path in collect_workbooks(source):
+                copy_path = os.path.join(input_dir, name)
+                shutil.copyfile(path, copy_path)
+                workbooks.append((name, copy_path))
+            if not workbooks:
+                raise ValueError(f"No .xlsx workbooks found in {source}.")
+        else:
+            try:
+                workbooks = extract_workbooks(source, input_dir, max_total_bytes)
+            finally:
+                if isinstance(source, (str, os.PathLike)):
+                    os.remove(source)
+
+        manifest = process_batch(workbooks, output_dir, keywords_list, input_sheet_name, max_workers,
+                                 progress_callback, keyword_matcher, **processor_options)
+        write_result_zip(result_zip_path, output_dir, manifest)
+        return manifest
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def read_keywords_file(path):
+    """Reads keywords from a JSON list or from a text file with one keyword per line."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        keywords = json.loads(text)
+        if not isinstance(keywords, list):
+            raise ValueError("Keywords file does not contain a JSON list.")
+        return keywords
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Split the rows of many Excel workbooks into cleaned and excluded files in one run.')
+    parser.add_argument('source', help='directory of .xlsx workbooks, or a zip of them')
+    parser.add_argument('-o', '--output', required=True, help='result zip to write')
+    parser.add_argument('-k', '--keywords', nargs='*', default=[], help='keywords to exclude')
+    parser.add_argument('--keywords-file', help='JSON list or one keyword per line')
+    parser.add_argument('--sheet', default='Sheet1', help='input sheet name (default: Sheet1)')
+    parser.add_argument('--sheets', nargs='+', metavar='SHEET',
+                        help="filter several sheets per workbook instead of --sheet ('*' = every sheet "
+                             "with a KONTEN column); xlsx output only")
+    parser.add_argument('--sheet-workers', type=int,
+                        help='sheets of a workbook processed at once with --sheets (default: CPU count)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='workbooks processed at once (default: CPU count)')
+    parser.add_argument('--output-format', choices=excel_processor.OUTPUT_FORMATS, default='xlsx')
+    parser.add_argument('--reader', choices=excel_processor.READERS, default='xlsx')
+    parser.add_argument('--auxiliary-sheets', choices=excel_processor.AUXILIARY_SHEET_MODES, default='copy')
+    parser.add_argument('--reason-column', action='store_true', help='add an EXCLUDE REASON column')
+    parser.add_argument('--foreign-scripts', nargs='*', choices=list(script_detector.SCRIPT_RANGES),
+                        help='scripts whose characters exclude a row (default: '
+                             f"{' '.join(script_detector.DEFAULT_SCRIPTS)}; none given = no script check)")
+    parser.add_argument('--foreign-ratio', type=float,
+                        help='only exclude rows where at least this share of KONTEN is in those scripts')
+    parser.add_argument('--dedup', choices=excel_processor.DEDUP_MODES, default='off',
+                        help='exclude or drop repeated rows (same UUID, or same normalized KONTEN)')
+    parser.add_argument('--dedup-key', choices=excel_processor.DEDUP_KEYS, default='auto')
+    parser.add_argument('--in-memory', action='store_true',
+                        help='build xlsx outputs in memory instead of streaming them')
+    args = parser.parse_args(argv)
+
+    keywords = list(args.keywords)
+    if args.keywords_file:
+        keywords.extend(read_keywords_file(args.keywords_file))
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.sheets and args.output_format != 'xlsx':
+        parser.error('--sheets needs --output-format xlsx')
+
+    processor_options = {
+        'output_format': args.output_format,
+        'reader': args.reader,
+        'auxiliary_sheets': args.auxiliary_sheets,
+        'reason_column': args.reason_column,
+        'streaming': not args.in_memory,
+        'foreign_scripts': args.foreign_scripts,
+        'foreign_ratio': args.foreign_ratio,
+        'dedup': args.dedup,
+        'dedup_key': args.dedup_key,
+        'input_sheet_names': excel_processor.ALL_KONTEN_SHEETS if args.sheets == [excel_processor.ALL_KONTEN_SHEETS]
+        else args.sheets,
+        'sheet_workers': args.sheet_workers,
+    }
+    if os.path.isdir(args.source):
+        manifest = run_batch(args.source, args.output, keywords, args.sheet, args.workers, **processor_options)
+    else:
+        # Pass the zip as a file object: run_batch deletes zips given by path
+        with open(args.source, 'rb') as archive:
+            manifest = run_batch(archive, args.output, keywords, args.sheet, args.workers, **processor_options)
+
+    print(f"{manifest['files_done']} of {manifest['files_total']} workbooks processed "
+          f"({manifest['rows_processed']} rows, {manifest['rows_excluded']} excluded) -> {args.output}")
+    for entry in manifest['files']:
+        if entry['status'] == 'failed':
+            print(f"  failed: {entry['name']}: {entry['error']}", file=sys.stderr)
+    return 1 if manifest['files_failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
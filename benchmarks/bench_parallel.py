@@ -0,0 +1,75 @@
+"""
+Benchmark of the multi-core path of excel_processor.process_data_excel: several
+KONTEN sheets of one workbook filtered at once (input_sheet_names, sheet_workers).
+
+Generates one workbook with --sheets data sheets of --rows rows each, with long
+KONTEN texts and a large keyword list (with workbook_generator, seeded, so every run
+processes the same input), then times the same run with each --sheet-workers
+count. Each sheet is read, classified and spilled in its own process, so the work
+that scales is everything but the final write of the outputs, which stays in the
+calling process. Prints the wall time and the speedup over the first count.
+
+Usage:
+    python benchmarks/bench_parallel.py [--rows 50000] [--sheets 8] [--sheet-workers 1 2 4 8]
+"""
+import argparse
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+BENCH_DIR = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+import excel_processor
+import workbook_generator
+
+KEYWORD_COUNT = 400
+# About 100 words per KONTEN cell
+KONTEN_LENGTH = 800
+SEED = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time multi-sheet processing with 1..N sheet workers.')
+    parser.add_argument('--rows', type=int, default=50_000, help='data rows per sheet')
+    parser.add_argument('--sheets', type=int, default=8, help='number of KONTEN sheets')
+    parser.add_argument('--sheet-workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--keywords', type=int, default=KEYWORD_COUNT)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_parallel_')
+    try:
+        source = os.path.join(workdir, 'source.xlsx')
+        # Only 3 columns, no foreign words and no planted keywords: the generated
+        # keywords end in a number, so they never match and every row is scanned in full
+        workbook_generator.make_workbook(source, args.rows, columns=3, konten_length=KONTEN_LENGTH,
+                                         foreign_ratio=0.0, seed=SEED, data_sheets=args.sheets)
+        keywords = workbook_generator.make_keywords(args.keywords, SEED)
+
+        print(f"{args.sheets} sheets x {args.rows} rows, {len(keywords)} keywords, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'seconds':>10} {'speedup':>8}")
+        baseline = None
+        for sheet_workers in args.sheet_workers:
+            # process_data_excel deletes its input, so work on a copy
+            input_path = os.path.join(workdir, 'input.xlsx')
+            shutil.copy(source, input_path)
+            start = time.perf_counter()
+            excel_processor.process_data_excel(
+                input_path,
+                os.path.join(workdir, 'cleaned.xlsx'),
+                os.path.join(workdir, 'excluded.xlsx'),
+                keywords,
+                input_sheet_names=excel_processor.ALL_KONTEN_SHEETS,
+                sheet_workers=sheet_workers,
+            )
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{sheet_workers:>8} {elapsed:>10.2f} {baseline / elapsed:>7.2f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark for the data row loop of excel_processor.process_data_excel.
+
+Generates workbooks of increasing size with the seeded workbook_generator and
+times the in-memory output path.
+With the row append no longer scanning max_row, seconds per 1k rows should stay
+roughly constant, i.e. total runtime grows linearly with the row count.
+
+Usage:
+    python benchmarks/bench_row_append.py [rows ...]
+
+Defaults to 10k, 100k and 1M rows (the 1M run takes a while and needs a few GB of RAM).
+"""
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+BENCH_DIR = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+import excel_processor
+import workbook_generator
+
+DEFAULT_ROW_COUNTS = [10_000, 100_000, 1_000_000]
+KEYWORDS = ['gopay', 'dijual']
+SEED = 0
+
+
+def run(rows, workdir):
+    source = os.path.join(workdir, f'source_{rows}.xlsx')
+    workbook_generator.make_workbook(source, rows, keywords=KEYWORDS, seed=SEED)
+    # process_data_excel deletes its input, so work on a copy
+    input_path = os.path.join(workdir, f'input_{rows}.xlsx')
+    shutil.copy(source, input_path)
+
+    start = time.perf_counter()
+    excel_processor.process_data_excel(
+        input_path,
+        os.path.join(workdir, f'cleaned_{rows}.xlsx'),
+        os.path.join(workdir, f'excluded_{rows}.xlsx'),
+        KEYWORDS,
+        'Sheet1',
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    row_counts = [int(arg) for arg in sys.argv[1:]] or DEFAULT_ROW_COUNTS
+    workdir = tempfile.mkdtemp(prefix='bench_row_append_')
+    try:
+        results = []
+        for rows in row_counts:
+            elapsed = run(rows, workdir)
+            results.append((rows, elapsed))
+        print(f"{'rows':>10} {'seconds':>10} {'s per 1k rows':>14}")
+        for rows, elapsed in results:
+            print(f"{rows:>10} {elapsed:>10.2f} {elapsed / rows * 1000:>14.4f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Micro-benchmark of the foreign script check on KONTEN texts.
+
+Compares the regex the processor used before (a character class of the five
+default scripts, searched on every value) with the check exclusion_reason now runs
+(str.isascii(), then ScriptDetector.search), on texts of several lengths and kinds:
+pure ASCII, ASCII plus an emoji, Latin with accents, and text with a foreign word
+at the end. Both are timed as inline statements, the way the row loop runs them.
+Prints microseconds per value and the speedup for each case, plus the cost of a
+ScriptDetector.is_foreign call and of the ratio mode.
+
+Usage:
+    python benchmarks/bench_script_detector.py [--lengths 80 1000 10000] [--number 2000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+BENCH_DIR = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+from script_detector import ScriptDetector
+import workbook_generator
+
+# The pattern excel_processor compiled before ScriptDetector existed
+LEGACY_PATTERN = re.compile(r'[一-鿿가-힯ऀ-ॿ؀-ۿЀ-ӿ]')
+
+KINDS = ('ascii', 'emoji', 'latin', 'foreign_end')
+
+
+def make_text(kind, length, seed=0):
+    rng = random.Random(seed)
+    text = workbook_generator.konten_text(rng, length, foreign=False)
+    if kind == 'emoji':
+        text += ' \U0001F600'
+    elif kind == 'latin':
+        text = text.replace('a', 'á', 3)
+    elif kind == 'foreign_end':
+        text += ' 你好'
+    return text
+
+
+# The statement the row loop used to run, and the one exclusion_reason runs now
+LEGACY_CHECK = 'LEGACY_PATTERN.search(text) is not None'
+ROW_CHECK = 'not text.isascii() and search(text) is not None'
+
+
+def per_call_us(stmt, namespace, number):
+    return min(timeit.repeat(stmt, number=number, repeat=5, globals=namespace)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the foreign script check.')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[80, 1000, 10000])
+    parser.add_argument('--number', type=int, default=20000, help='calls per timing')
+    args = parser.parse_args()
+
+    detector = ScriptDetector()
+    ratio_detector = ScriptDetector(min_ratio=0.3)
+    print(f"{'kind':<12} {'length':>7} {'regex us':>10} {'row check us':>13} {'speedup':>8} "
+          f"{'is_foreign us':>14} {'ratio us':>10}")
+    for length in args.lengths:
+        for kind in KINDS:
+            namespace = {'LEGACY_PATTERN': LEGACY_PATTERN, 'search': detector.search, 'detector': detector,
+                         'ratio_detector': ratio_detector, 'text': make_text(kind, length)}
+            assert eval(LEGACY_CHECK, namespace) == eval(ROW_CHECK, namespace) == detector.is_foreign(namespace['text'])
+            legacy = per_call_us(LEGACY_CHECK, namespace, args.number)
+            current = per_call_us(ROW_CHECK, namespace, args.number)
+            method = per_call_us('detector.is_foreign(text)', namespace, args.number)
+            ratio = per_call_us('ratio_detector.is_foreign(text)', namespace, args.number)
+            print(f"{kind:<12} {len(namespace['text']):>7} {legacy:>10.3f} {current:>13.3f} "
+                  f"{legacy / current:>7.1f}x {method:>14.3f} {ratio:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
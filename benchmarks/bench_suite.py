@@ -0,0 +1,163 @@
+"""
+Reproducible benchmark suite for excel_processor.process_data_excel.
+
+Generates synthetic workbooks (see workbook_generator.py) for every combination of
+the requested row counts and keyword list sizes, runs process_data_excel on them in
+each requested mode and prints the results as JSON: wall time, rows/sec and peak
+RSS per case, plus the per-stage timings process_data_excel reports. Every run
+happens in a freshly spawned process, so the peak RSS of a case is its own and not
+that of the cases before it.
+
+The same arguments and seed always produce the same workbooks, so saving the JSON
+of two commits and comparing rows_per_sec / peak_rss_bytes shows regressions in
+the hot loop.
+
+Usage:
+    python benchmarks/bench_suite.py [--rows 1000 100000] [--keywords 10 1000]
+                                     [--modes memory streaming] [--readers xlsx openpyxl]
+                                     [--output results.json] ...
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import openpyxl
+
+BENCH_DIR = os.path.abspath(os.path.dirname(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+import excel_processor
+import workbook_generator
+
+DEFAULT_ROW_COUNTS = [1_000, 10_000, 100_000]
+DEFAULT_KEYWORD_COUNTS = [10, 1000]
+# Keywords planted in the KONTEN texts; the first ones of every keyword list, so
+# all keyword list sizes of at least this many exclude the same rows
+PLANTED_KEYWORDS = 10
+MODES = ('memory', 'streaming')
+
+
+def run_case(input_path, output_dir, keywords, mode, reader):
+    """Runs one process_data_excel call; executed in a fresh process."""
+    # process_data_excel deletes its input, so work on a copy
+    work_path = os.path.join(output_dir, 'input.xlsx')
+    shutil.copy(input_path, work_path)
+    start = time.perf_counter()
+    summary = excel_processor.process_data_excel(
+        work_path,
+        os.path.join(output_dir, 'cleaned.xlsx'),
+        os.path.join(output_dir, 'excluded.xlsx'),
+        keywords,
+        'Sheet1',
+        streaming=mode == 'streaming',
+        reader=reader,
+    )
+    seconds = time.perf_counter() - start
+    return seconds, excel_processor.peak_rss_bytes(), summary
+
+
+def run_isolated(*args):
+    """Runs run_case in a newly spawned process and returns its result."""
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_case, *args).result()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark process_data_excel on synthetic workbooks.')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROW_COUNTS)
+    parser.add_argument('--keywords', type=int, nargs='+', default=DEFAULT_KEYWORD_COUNTS,
+                        help='keyword list sizes to run with')
+    parser.add_argument('--columns', type=int, default=4)
+    parser.add_argument('--konten-length', type=int, default=80)
+    parser.add_argument('--foreign-ratio', type=float, default=0.05)
+    parser.add_argument('--keyword-ratio', type=float, default=0.1)
+    parser.add_argument('--hyperlink-ratio', type=float, default=0.0)
+    parser.add_argument('--auxiliary-sheets', type=int, default=0)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=['streaming'])
+    parser.add_argument('--readers', nargs='+', choices=excel_processor.READERS, default=['xlsx'])
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case; the fastest is reported')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON here instead of stdout')
+    args = parser.parse_args()
+
+    all_keywords = workbook_generator.make_keywords(max(args.keywords + [PLANTED_KEYWORDS]), args.seed)
+    workdir = tempfile.mkdtemp(prefix='bench_suite_')
+    cases = []
+    try:
+        for rows in args.rows:
+            input_path = workbook_generator.make_workbook(
+                os.path.join(workdir, f'source_{rows}.xlsx'), rows,
+                columns=args.columns, konten_length=args.konten_length,
+                foreign_ratio=args.foreign_ratio, keywords=all_keywords[:PLANTED_KEYWORDS],
+                keyword_ratio=args.keyword_ratio, hyperlink_ratio=args.hyperlink_ratio,
+                auxiliary_sheets=args.auxiliary_sheets, seed=args.seed)
+            for keyword_count in args.keywords:
+                for mode in args.modes:
+                    for reader in args.readers:
+                        runs = [run_isolated(input_path, workdir, all_keywords[:keyword_count],
+                                             mode, reader)
+                                for _ in range(args.repeat)]
+                        seconds, _, summary = min(runs, key=lambda run: run[0])
+                        peak_rss = max((run[1] for run in runs), key=lambda value: value or 0)
+                        case = {
+                            'rows': rows,
+                            'keywords': keyword_count,
+                            'mode': mode,
+                            'reader': reader,
+                            'seconds': round(seconds, 4),
+                            'rows_per_sec': round(rows / seconds, 1),
+                            'peak_rss_bytes': peak_rss,
+                            'rows_excluded': summary['rows_excluded'],
+                            'stages': summary['stages'],
+                        }
+                        cases.append(case)
+                        print(f"{rows:>9} rows {keyword_count:>6} keywords {mode:>9} {reader:>8}: "
+                              f"{case['rows_per_sec']:>10.1f} rows/s", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'openpyxl': openpyxl.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workbook': {
+            'columns': args.columns,
+            'konten_length': args.konten_length,
+            'foreign_ratio': args.foreign_ratio,
+            'keyword_ratio': args.keyword_ratio,
+            'hyperlink_ratio': args.hyperlink_ratio,
+            'auxiliary_sheets': args.auxiliary_sheets,
+            'seed': args.seed,
+        },
+        'cases': cases,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Synthetic KONTEN workbook generator for the benchmarks.
+
+Generates workbooks shaped like the social media exports the app processes: a data
+sheet with UUID, AKUN and KONTEN columns (plus filler columns up to the requested
+column count), optional hyperlinks in a URL column and optional auxiliary sheets.
+Output is deterministic for a given seed, so runs on different commits process
+exactly the same input.
+
+Usage:
+    python benchmarks/workbook_generator.py out.xlsx [--rows N] [--columns N] ...
+"""
+import argparse
+import random
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+
+WORDS = ['nasabah', 'layanan', 'transfer', 'kartu', 'kredit', 'promo', 'cabang', 'aplikasi',
+         'saldo', 'rekening', 'bunga', 'cicilan', 'tabungan', 'investasi', 'pinjaman', 'digital',
+         'berita', 'ekonomi', 'hari', 'ini', 'murah', 'stasiun', 'pelayanan', 'memuaskan']
+# Words in the scripts the processor treats as foreign (CJK, Hangul, Devanagari, Arabic, Cyrillic)
+FOREIGN_WORDS = ['你好', '世界', '안녕하세요', 'नमस्ते', 'مرحبا', 'привет']
+# Rows of each auxiliary sheet
+AUXILIARY_SHEET_ROWS = 200
+
+
+def make_keywords(count, seed=0):
+    """Returns count distinct two-word keywords built from WORDS plus a numeric suffix."""
+    rng = random.Random(seed)
+    keywords = []
+    for i in range(count):
+        keywords.append(f"{rng.choice(WORDS)} {rng.choice(WORDS)}{i}")
+    return keywords
+
+
+def konten_text(rng, length, foreign, keyword=None):
+    """Builds a KONTEN text of about length characters, with a foreign word and/or keyword in it."""
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    if foreign:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(FOREIGN_WORDS))
+    if keyword:
+        words.insert(rng.randrange(len(words) + 1), keyword)
+    return ' '.join(words)
+
+
+def make_workbook(path, rows, columns=4, konten_length=80, foreign_ratio=0.05, keywords=(),
+                  keyword_ratio=0.1, hyperlink_ratio=0.0, auxiliary_sheets=0, sheet_name='Sheet1', seed=0,
+                  data_sheets=1):
+    """
+    Writes a synthetic workbook to path and returns path.
+
+    rows data rows are written to sheet_name with at least 3 columns (UUID, AKUN,
+    KONTEN); columns beyond that are numeric filler, the 4th being a URL column that
+    gets a hyperlink in hyperlink_ratio of the rows. About foreign_ratio of the KONTEN
+    texts contain a foreign-script word and keyword_ratio of them one of keywords,
+    so the excluded share of a run is predictable. auxiliary_sheets extra sheets of
+    AUXILIARY_SHEET_ROWS rows each are added after the data sheet. With data_sheets > 1
+    that many data sheets of rows rows each are written, sheet_name followed by
+    sheet_name 2, sheet_name 3, ...
+    """
+    columns = max(columns, 3)
+    rng = random.Random(seed)
+    keywords = list(keywords)
+
+    wb = openpyxl.Workbook(write_only=True)
+    header = ['UUID', 'AKUN', 'KONTEN']
+    if columns > 3:
+        header.append('URL')
+    header.extend(f'KOLOM{i}' for i in range(5, columns + 1))
+
+    for sheet_index in range(max(data_sheets, 1)):
+        # The first sheet keeps the names and UUIDs of a single-sheet workbook
+        suffix = '' if sheet_index == 0 else f' {sheet_index + 1}'
+        uuid_prefix = 'uuid-' if sheet_index == 0 else f'uuid-{sheet_index + 1}-'
+        ws = wb.create_sheet(sheet_name + suffix)
+        ws.append(header)
+        for i in range(rows):
+            keyword = rng.choice(keywords) if keywords and rng.random() < keyword_ratio else None
+            row = [f'{uuid_prefix}{i:08d}', f'akun{i % 97}',
+                   konten_text(rng, konten_length, rng.random() < foreign_ratio, keyword)]
+            if columns > 3:
+                url = f'https://example.com/post/{i}'
+                if rng.random() < hyperlink_ratio:
+                    cell = WriteOnlyCell(ws, url)
+                    cell.hyperlink = url
+                    row.append(cell)
+                else:
+                    row.append(url)
+            row.extend(rng.randrange(100000) for _ in range(columns - 4))
+            ws.append(row)
+
+    for sheet_index in range(auxiliary_sheets):
+        aux_ws = wb.create_sheet(f'Lookup{sheet_index + 1}')
+        aux_ws.append(['KODE', 'NAMA', 'NILAI'])
+        for i in range(AUXILIARY_SHEET_ROWS):
+            aux_ws.append([f'K{i:04d}', rng.choice(WORDS), round(rng.random() * 1000, 2)])
+
+    wb.save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic KONTEN workbook.')
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--columns', type=int, default=4)
+    parser.add_argument('--konten-length', type=int, default=80)
+    parser.add_argument('--foreign-ratio', type=float, default=0.05)
+    parser.add_argument('--keywords', type=int, default=0, help='number of keywords to plant in KONTEN')
+    parser.add_argument('--keyword-ratio', type=float, default=0.1)
+    parser.add_argument('--hyperlink-ratio', type=float, default=0.0)
+    parser.add_argument('--auxiliary-sheets', type=int, default=0)
+    parser.add_argument('--data-sheets', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    make_workbook(args.path, args.rows, args.columns, args.konten_length, args.foreign_ratio,
+                  make_keywords(args.keywords, args.seed), args.keyword_ratio, args.hyperlink_ratio,
+                  args.auxiliary_sheets, seed=args.seed, data_sheets=args.data_sheets)
+    print(args.path)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,34 @@
 import os
+import sys
+import csv
+import gzip
+import json
 import time
-import re
+import pickle
+import shutil
+import tempfile
+import collections
+from concurrent.futures import ProcessPoolExecutor
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Border, Side, Alignment, Protection # Still import, but not used for copying styles
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.worksheet.hyperlink import Hyperlink
+from openpyxl.styles.numbers import BUILTIN_FORMATS, BUILTIN_FORMATS_MAX_SIZE
+from keyword_matcher import KeywordMatcher
+from script_detector import ScriptDetector, DEFAULT_SCRIPTS
+from row_dedup import DigestIndex, normalize_konten
+import sheet_reference
+import xlsx_reader
+
+try:
+    import resource
+except ImportError:  # not available on Windows; peak RSS is then reported as None
+    resource = None
+
+# Bump whenever a change alters the cleaned/excluded output for the same input
+# (it is part of the result cache key).
+PROCESSOR_VERSION = '7'
+
 
 def copy_cell_properties(source_cell, target_cell):
     """
@@ -35,10 +60,627 @@ def copy_cell_properties(source_cell, target_cell):
     # Therefore, no attempts are made to copy them here.
 
 
-def process_data_excel(input_filepath, cleaned_output_filepath, excluded_output_filepath, keywords_list=None, input_sheet_name='Sheet1', output_sheet_name='Processed Data'):
+def build_cell(target_ws, source_cell):
+    """
+    Builds a detached cell for target_ws carrying the same value, number format
+    and hyperlink that copy_cell_properties would set, ready for ws.append().
+    Works for both regular and write_only worksheets.
+    """
+    new_cell = WriteOnlyCell(target_ws)
+    copy_cell_properties(source_cell, new_cell)
+    return new_cell
+
+
+def cell_payload(source_cell):
+    """
+    Reads what copy_cell_properties copies (value, number format, hyperlink) from a
+    source cell once, so it can be applied to several target cells.
+    """
+    number_format = None
+    try:
+        number_format = source_cell.number_format
+    except Exception as e:
+        print(f"Warning: Could not read number_format for cell {source_cell.coordinate}: {e}")
+    hyperlink = source_cell.hyperlink if hasattr(source_cell, 'hyperlink') and source_cell.hyperlink else None
+    return source_cell.value, number_format, hyperlink
+
+
+def build_cell_from_payload(target_ws, payload):
+    """Like build_cell, but from a cell_payload tuple."""
+    value, number_format, hyperlink = payload
+    new_cell = WriteOnlyCell(target_ws, value=value)
+    try:
+        if number_format:
+            new_cell.number_format = number_format
+    except Exception as e:
+        print(f"Warning: Could not copy number_format '{number_format}': {e}")
+    if hyperlink:
+        new_cell.hyperlink = Hyperlink(ref=hyperlink.ref,
+                                       target=hyperlink.target,
+                                       tooltip=hyperlink.tooltip,
+                                       display=hyperlink.display)
+    return new_cell
+
+
+class StyleNumberFormats:
+    """
+    Number format codes of the style ids of a read_only workbook, for rows read with
+    xlsx_reader. Each style id is resolved once, the way ReadOnlyCell.number_format does.
+    """
+
+    def __init__(self, workbook):
+        self.workbook = workbook
+        self._formats = {}
+
+    def get(self, style_id):
+        try:
+            return self._formats[style_id]
+        except KeyError:
+            pass
+        number_format = None
+        try:
+            number_format = _source_number_format(self.workbook, self.workbook._cell_styles[style_id])
+        except Exception as e:
+            print(f"Warning: Could not read number_format of style {style_id}: {e}")
+        self._formats[style_id] = number_format
+        return number_format
+
+
+READERS = ('xlsx', 'openpyxl')
+
+
+def iter_data_rows(input_sheet, reader='xlsx', values_only=False):
+    """
+    Yields the data rows (row 2 onwards) of a read_only input sheet.
+
+    reader='openpyxl' uses input_sheet.iter_rows: tuples of ReadOnlyCells, or of
+    values with values_only=True. reader='xlsx' parses the sheet XML directly with
+    xlsx_reader and always yields value tuples; unless values_only is set they are
+    StyledRows that also carry each value's style id, for the number format copy.
+    """
+    if reader == 'xlsx':
+        return xlsx_reader.iter_worksheet_rows(input_sheet, min_row=2, with_styles=not values_only)
+    return input_sheet.iter_rows(min_row=2, values_only=values_only)
+
+
+def copy_row(target_ws, row, columns_to_copy_indices, number_formats):
+    """
+    Builds the output cells of a data row for target_ws, keeping values and number
+    formats. row is a tuple of read_only cells or an xlsx_reader.StyledRow, whose
+    style ids are turned into number formats with number_formats (StyleNumberFormats).
+    """
+    if isinstance(row, xlsx_reader.StyledRow):
+        style_ids = row.style_ids
+        return [build_cell_from_payload(target_ws, (row[idx], number_formats.get(style_ids[idx]), None))
+                for idx in columns_to_copy_indices]
+    return [build_cell(target_ws, row[idx]) for idx in columns_to_copy_indices]
+
+
+AUXILIARY_SHEET_MODES = ('copy', 'skip', 'reference')
+
+
+def copy_auxiliary_sheets(original_workbook, sheet_names, workbooks):
+    """
+    Copies the given sheets of original_workbook into every workbook in workbooks.
+    Each source sheet is read once and each source cell is inspected once; the
+    result is appended to the matching sheet of every output.
+    """
+    for sheet_name in sheet_names:
+        original_sheet = original_workbook[sheet_name]
+        new_sheets = []
+        for workbook in workbooks:
+            new_ws = workbook.create_sheet(title=sheet_name)
+            new_ws.sheet_state = original_sheet.sheet_state
+            new_sheets.append(new_ws)
+
+        for row in original_sheet.iter_rows(values_only=False):
+            payloads = [cell_payload(cell) for cell in row]
+            for new_ws in new_sheets:
+                new_ws.append([build_cell_from_payload(new_ws, payload) for payload in payloads])
+
+
+def _source_number_format(original_workbook, style):
+    number_format_id = style.numFmtId
+    if number_format_id < BUILTIN_FORMATS_MAX_SIZE:
+        return BUILTIN_FORMATS.get(number_format_id, 'General')
+    return original_workbook._number_formats[number_format_id - BUILTIN_FORMATS_MAX_SIZE]
+
+
+def prepare_reference_sheets(original_workbook, sheet_names, workbooks, reference_state=None):
+    """
+    Sets up auxiliary_sheets='reference': adds an empty placeholder sheet per source
+    sheet to every workbook, to be swapped for the source XML after saving (see
+    sheet_reference). Sheets whose XML cannot be referenced are copied normally.
+    reference_state, the result of an earlier call on the same workbooks, is
+    extended instead of starting over (to add sheets one at a time).
+
+    Returns (raw sheet XML by title, one style id map per workbook).
+    """
+    raw_sheets, style_maps = reference_state or ({}, [])
+    for sheet_name in sheet_names:
+        sheet_xml = original_workbook._archive.read(original_workbook[sheet_name]._worksheet_path)
+        if not sheet_reference.is_referenceable(sheet_xml[:4096]):
+            copy_auxiliary_sheets(original_workbook, [sheet_name], workbooks)
+            continue
+        raw_sheets[sheet_name] = sheet_xml
+        for workbook in workbooks:
+            new_ws = workbook.create_sheet(title=sheet_name)
+            new_ws.sheet_state = original_workbook[sheet_name].sheet_state
+
+    if raw_sheets and not style_maps:
+        for workbook in workbooks:
+            # Register a style with the same number format for every source style id
+            style_map = {}
+            anchor_ws = workbook.worksheets[0]
+            for idx, style in enumerate(original_workbook._cell_styles):
+                style_cell = WriteOnlyCell(anchor_ws)
+                try:
+                    style_cell.number_format = _source_number_format(original_workbook, style)
+                except Exception as e:
+                    print(f"Warning: Could not map number format of style {idx}: {e}")
+                style_map[str(idx)] = str(style_cell.style_id)
+            style_maps.append(style_map)
+    return raw_sheets, style_maps
+
+
+def add_auxiliary_sheets(original_workbook, input_sheet_name, workbooks, mode='copy'):
+    """
+    Adds every sheet except input_sheet_name to the output workbooks: 'copy' copies
+    the cells, 'skip' leaves them out and 'reference' prepares an XML-level copy.
+    Returns the state finish_reference_sheets needs after saving (None unless 'reference').
+    """
+    sheet_names = [sheet_name for sheet_name in original_workbook.sheetnames if sheet_name != input_sheet_name]
+    if mode == 'skip' or not sheet_names:
+        return None
+    if mode == 'reference':
+        return prepare_reference_sheets(original_workbook, sheet_names, workbooks)
+    copy_auxiliary_sheets(original_workbook, sheet_names, workbooks)
+    return None
+
+
+def finish_reference_sheets(original_workbook, reference_state, output_paths):
+    """Swaps the placeholder sheets of the saved outputs for the rewritten source XML."""
+    raw_sheets, style_maps = reference_state
+    shared_strings = original_workbook[next(iter(raw_sheets))]._shared_strings if raw_sheets else []
+    for output_path, style_map in zip(output_paths, style_maps):
+        replacements = {
+            sheet_name: sheet_reference.rewrite_sheet_xml(sheet_xml, shared_strings, style_map)
+            for sheet_name, sheet_xml in raw_sheets.items()
+        }
+        sheet_reference.replace_sheet_parts(output_path, replacements)
+
+
+# Detector used when a call does not configure the foreign scripts: any character
+# of the default scripts (CJK, Hangul, Devanagari, Arabic, Cyrillic) excludes a row
+DEFAULT_SCRIPT_DETECTOR = ScriptDetector()
+
+
+# Header of the optional column that records why a row was excluded
+REASON_COLUMN_HEADER = 'EXCLUDE REASON'
+KEYWORD_REASON_PREFIX = 'keyword: '
+FOREIGN_CHARACTER_REASON = 'foreign characters'
+
+
+def exclusion_reason(konten_value, keyword_matcher, script_detector=DEFAULT_SCRIPT_DETECTOR):
+    """
+    Returns why a KONTEN value should be excluded ('keyword: <keyword>' or
+    'foreign characters'), or None when the row is kept.
+    """
+    keyword = keyword_matcher.find(konten_value)
+    if keyword is not None:
+        return f"{KEYWORD_REASON_PREFIX}{keyword}"
+    if konten_value.isascii():
+        return None
+    # Without a ratio the compiled regex is called directly (see ScriptDetector)
+    search = script_detector.search
+    if search is not None:
+        foreign = search(konten_value) is not None
+    else:
+        foreign = script_detector.is_foreign(konten_value)
+    return FOREIGN_CHARACTER_REASON if foreign else None
+
+
+# Row decisions (the streaming pre-pass stores them one byte per row)
+ROW_KEEP = 0
+ROW_EXCLUDE = 1
+ROW_SKIP = 2
+
+def iter_classified_rows(rows, konten_col_index, keyword_matcher, values_only=True,
+                         script_detector=DEFAULT_SCRIPT_DETECTOR):
+    """
+    Yields (row, decision, reason) for every data row in rows, in sheet order.
+    rows are value tuples (values_only=True) or tuples of read_only cells.
+    """
+    for row in rows:
+        if konten_col_index >= len(row):
+            yield row, ROW_SKIP, None
+            continue
+        value = row[konten_col_index] if values_only else row[konten_col_index].value
+        reason = exclusion_reason(str(value or '').strip(), keyword_matcher, script_detector)
+        yield row, (ROW_KEEP if reason is None else ROW_EXCLUDE), reason
+
+
+DEDUP_MODES = ('off', 'exclude', 'drop')
+DEDUP_KEYS = ('auto', 'uuid', 'konten')
+DUPLICATE_REASON = 'duplicate'
+# Only used in the streaming pre-pass decisions: excluded as a duplicate
+ROW_DUPLICATE = 3
+
+
+class RowDeduplicator:
+    """
+    Marks repeated rows of the classified row stream (see iter_classified_rows).
+
+    A kept row is a duplicate when an earlier kept row has the same key: the UUID
+    value, or the normalized KONTEN text (lowercase, whitespace collapsed) when the
+    sheet has no UUID column or dedup_key='konten'. Rows with an empty key are never
+    duplicates. mode='exclude' sends duplicates to the excluded output with reason
+    'duplicate'; mode='drop' leaves them out of both outputs. Keys are remembered
+    as 64-bit digests in a DigestIndex, so memory stays at about 16 bytes per row.
+    """
+
+    def __init__(self, mode, header_values, konten_col_index, dedup_key='auto'):
+        self.mode = mode
+        upper_headers = [str(value or '').strip().upper() for value in header_values]
+        if dedup_key == 'auto':
+            dedup_key = 'uuid' if 'UUID' in upper_headers else 'konten'
+        if dedup_key == 'uuid':
+            if 'UUID' not in upper_headers:
+                raise ValueError("dedup_key 'uuid' needs a 'UUID' column in the input sheet.")
+            self.key_col_index = upper_headers.index('UUID')
+        else:
+            self.key_col_index = konten_col_index
+        self.key = dedup_key
+        self.index = DigestIndex()
+        self.duplicates = 0
+
+    def apply(self, classified_rows, values_only=True):
+        """Passes (row, decision, reason) through, turning duplicates into excluded or skipped rows."""
+        key_col_index = self.key_col_index
+        normalize = normalize_konten if self.key == 'konten' else lambda value: str(value).strip()
+        duplicate = (ROW_EXCLUDE, DUPLICATE_REASON) if self.mode == 'exclude' else (ROW_SKIP, DUPLICATE_REASON)
+        add = self.index.add
+        for row, decision, reason in classified_rows:
+            if decision == ROW_KEEP and key_col_index < len(row):
+                value = row[key_col_index] if values_only else row[key_col_index].value
+                key = normalize(value) if value is not None else ''
+                if key and not add(key):
+                    self.duplicates += 1
+                    decision, reason = duplicate
+            yield row, decision, reason
+
+    def summary(self):
+        return {
+            'mode': self.mode,
+            'key': self.key,
+            'duplicates': self.duplicates,
+            'dropped': self.duplicates if self.mode == 'drop' else 0,
+            'unique_keys': self.index.count,
+            'index_bytes': self.index.nbytes,
+        }
+
+
+# How often (in data rows) the progress callback of process_data_excel is called
+PROGRESS_INTERVAL_ROWS = 5000
+
+
+# Processing stages timed by ProcessingProgress.end_stage, in the order they run
+STAGES = ('load', 'header_scan', 'classify', 'write', 'auxiliary_sheets', 'autofit', 'save')
+# Stages that go through the data rows; only their rows_per_sec means anything
+ROW_STAGES = ('classify', 'write')
+
+
+def peak_rss_bytes():
+    """High-water mark of this process's resident memory, in bytes (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class ProcessingProgress:
+    """
+    Counts classified data rows and reports (rows_processed, rows_excluded) to an
+    optional callback every PROGRESS_INTERVAL_ROWS rows and once at the end.
+
+    It also keeps the instrumentation of a run: excluded rows per keyword, and the
+    wall time and peak RSS of each stage, as marked by end_stage(). Peak RSS is the
+    process high-water mark when the stage ended, so in a long-lived worker it can
+    include earlier requests; the stage where it first grows is the one to look at.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.rows_processed = 0
+        self.rows_excluded = 0
+        self.excluded_by_keyword = collections.Counter()
+        self.excluded_foreign_characters = 0
+        self.excluded_duplicates = 0
+        # RowDeduplicator of the run, if rows are deduplicated; its counts go into the summary
+        self.deduplicator = None
+        # Summed 'dedup' summaries of merged runs, which each had their own deduplicator
+        self.merged_dedup = None
+        self.stages = {}
+        self.started_at = self._stage_started_at = time.perf_counter()
+
+    def add(self, excluded, reason=None):
+        self.rows_processed += 1
+        if excluded:
+            self.rows_excluded += 1
+            if reason == FOREIGN_CHARACTER_REASON:
+                self.excluded_foreign_characters += 1
+            elif reason == DUPLICATE_REASON:
+                self.excluded_duplicates += 1
+            elif reason is not None:
+                self.excluded_by_keyword[reason[len(KEYWORD_REASON_PREFIX):]] += 1
+        if self.callback and self.rows_processed % PROGRESS_INTERVAL_ROWS == 0:
+            self.callback(self.rows_processed, self.rows_excluded)
+
+    def finish(self):
+        if self.callback:
+            self.callback(self.rows_processed, self.rows_excluded)
+
+    def merge(self, summary):
+        """Adds the row and dedup counts of another run's summary (e.g. a sheet processed in a worker)."""
+        self.rows_processed += summary['rows_processed']
+        self.rows_excluded += summary['rows_excluded']
+        self.excluded_by_keyword.update(summary['excluded_by_keyword'])
+        self.excluded_foreign_characters += summary['excluded_foreign_characters']
+        self.excluded_duplicates += summary['excluded_duplicates']
+        if 'dedup' in summary:
+            dedup = summary['dedup']
+            if self.merged_dedup is None:
+                self.merged_dedup = dict(dedup)
+            else:
+                for field in ('duplicates', 'dropped', 'unique_keys', 'index_bytes'):
+                    self.merged_dedup[field] += dedup[field]
+                if self.merged_dedup['key'] != dedup['key']:
+                    # dedup_key='auto' chose a different key for some sheets
+                    self.merged_dedup['key'] = 'auto'
+        if self.callback:
+            self.callback(self.rows_processed, self.rows_excluded)
+
+    def end_stage(self, name):
+        """
+        Records the time since the previous stage ended (or since the run started)
+        as stage name. A stage that ends more than once adds up.
+        """
+        now = time.perf_counter()
+        timing = self.stages.setdefault(name, {'seconds': 0.0})
+        timing['seconds'] += now - self._stage_started_at
+        timing['peak_rss_bytes'] = peak_rss_bytes()
+        self._stage_started_at = now
+
+    def summary(self):
+        stages = {}
+        for name, timing in self.stages.items():
+            seconds = timing['seconds']
+            stages[name] = {
+                'seconds': round(seconds, 4),
+                'rows_per_sec': (round(self.rows_processed / seconds, 1)
+                                 if name in ROW_STAGES and seconds > 0 else None),
+                'peak_rss_bytes': timing['peak_rss_bytes'],
+            }
+        summary = {
+            'rows_processed': self.rows_processed,
+            'rows_kept': self.rows_processed - self.rows_excluded,
+            'rows_excluded': self.rows_excluded,
+            'excluded_by_keyword': dict(self.excluded_by_keyword.most_common()),
+            'excluded_foreign_characters': self.excluded_foreign_characters,
+            'excluded_duplicates': self.excluded_duplicates,
+            'total_seconds': round(time.perf_counter() - self.started_at, 4),
+            'stages': stages,
+        }
+        if self.deduplicator is not None:
+            summary['dedup'] = self.deduplicator.summary()
+        elif self.merged_dedup is not None:
+            summary['dedup'] = dict(self.merged_dedup)
+        return summary
+
+
+OUTPUT_FORMATS = ('xlsx', 'csv', 'csv.gz', 'jsonl')
+
+
+def _json_value(value):
+    # Dates and times as ISO 8601; anything else JSON has no type for as text
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def unique_keys(names):
+    """
+    JSON Lines keys for header names: empty names become column_<n> and repeated
+    names get a numeric suffix (KOLOM, KOLOM_2, ...), so no column overwrites another.
+    """
+    keys = []
+    seen = set()
+    for pos, name in enumerate(names):
+        base = str(name) if name is not None else f'column_{pos + 1}'
+        key, number = base, 1
+        while key in seen:
+            number += 1
+            key = f'{base}_{number}'
+        seen.add(key)
+        keys.append(key)
+    return keys
+
+
+class RowFileWriter:
+    """
+    Writes rows of values one at a time to a CSV, gzip-compressed CSV ('csv.gz') or
+    JSON Lines file. The first row written is the header; in JSON Lines it names the
+    keys of the objects written for the following rows (see unique_keys).
+    """
+
+    def __init__(self, path, output_format):
+        self.output_format = output_format
+        if output_format == 'csv.gz':
+            self.file = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        else:
+            self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.csv_writer = csv.writer(self.file) if output_format != 'jsonl' else None
+        self.header = None
+        self.keys = None
+
+    def write_row(self, values):
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(values)
+            return
+        if self.header is None:
+            self.header = list(values)
+            self.keys = unique_keys(self.header)
+            return
+        if len(values) > len(self.keys):
+            self.keys = unique_keys(self.header + [None] * (len(values) - len(self.header)))
+        self.file.write(json.dumps(dict(zip(self.keys, values)), ensure_ascii=False, default=_json_value))
+        self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+
+def display_width(value):
+    """Length of a value as used by the column auto-fit (0 for empty cells)."""
+    if value is None:
+        return 0
+    try:
+        return len(str(value))
+    except TypeError:
+        return 0
+
+
+class ColumnWidths:
+    """
+    Tracks the per-column maximum display width of the rows written to a sheet,
+    so auto-fit needs no second pass over the written cells. rows_measured counts
+    the rows passed to update, for sampled auto-fit.
+    """
+
+    def __init__(self, header_values):
+        self.max_lengths = [display_width(value) for value in header_values]
+        self.rows_measured = 0
+
+    def update(self, values):
+        self.rows_measured += 1
+        max_lengths = self.max_lengths
+        for col_pos, value in enumerate(values):
+            if value is None:
+                continue
+            current_length = display_width(value)
+            if col_pos >= len(max_lengths):
+                max_lengths.extend([0] * (col_pos + 1 - len(max_lengths)))
+            if current_length > max_lengths[col_pos]:
+                max_lengths[col_pos] = current_length
+
+    def apply(self, ws):
+        apply_column_widths(ws, self.max_lengths)
+
+
+def apply_column_widths(ws, max_lengths):
+    """Sets auto-fit widths on ws from a list of per-column maximum lengths."""
+    for col_idx_new, max_length in enumerate(max_lengths):
+        column_letter = openpyxl.utils.get_column_letter(col_idx_new + 1)
+        adjusted_width = min((max_length + 2), 75)
+        if adjusted_width > 0:
+            ws.column_dimensions[column_letter].width = adjusted_width
+
+
+def process_data_excel(input_filepath, cleaned_output_filepath, excluded_output_filepath, keywords_list=None, input_sheet_name='Sheet1', output_sheet_name='Processed Data', streaming=False, reason_column=False, progress_callback=None, auxiliary_sheets='copy', autofit_sample_rows=None, reader='xlsx', output_format='xlsx', keyword_matcher=None, foreign_scripts=None, foreign_ratio=None, dedup='off', dedup_key='auto', input_sheet_names=None, sheet_workers=None):
+    """
+    Splits the rows of input_sheet_name into a cleaned and an excluded workbook.
+    With input_sheet_names, several sheets are filtered at once instead; see
+    process_data_sheets.
+
+    input_filepath is a path (the file is deleted once processing ends) or a
+    seekable binary file object, which is read in place and left to the caller.
+
+    With streaming=True both outputs are built as write_only workbooks and rows are
+    appended as they are classified, so memory stays flat regardless of row count.
+    Column widths have to be known before the first row of a write_only sheet is
+    written, so streaming mode first makes a values-only pass over the input sheet
+    to classify the rows and measure the widths, then streams the cells.
 
-    if keywords_list is None:
-        keywords_list = []
+    Keywords are compiled once into a KeywordMatcher. Callers processing many files
+    with the same keywords can pass a prebuilt one as keyword_matcher instead of
+    keywords_list. With reason_column=True the excluded output gets an extra last
+    column saying which keyword (or foreign script) caused each row to be excluded.
+
+    foreign_scripts lists the scripts whose characters exclude a row (names from
+    script_detector.SCRIPT_RANGES; None means DEFAULT_SCRIPTS, an empty list turns
+    the check off). With foreign_ratio, a row is only excluded when at least that
+    share of its KONTEN characters belong to those scripts.
+
+    dedup='exclude' routes repeated rows to the excluded output (reason 'duplicate')
+    and dedup='drop' leaves them out of both; see RowDeduplicator. dedup_key picks
+    the key: 'uuid', 'konten' (normalized text) or 'auto' (UUID when the sheet has
+    that column). Dropped rows are not counted in rows_processed.
+
+    A single sheet is processed on one core. To use several cores, process several
+    sheets (input_sheet_names) or several workbooks (batch.py).
+
+    auxiliary_sheets controls the other sheets of the workbook: 'copy' (default)
+    copies them into both outputs, reading each one once; 'skip' leaves them out;
+    'reference' copies their raw sheet XML inside the xlsx without building cells
+    (values, formulas, layout and number formats are kept; see sheet_reference).
+
+    reader selects how the data rows are read: 'xlsx' (default) parses the sheet XML
+    straight into value tuples with xlsx_reader, several times faster than building
+    openpyxl cells; 'openpyxl' uses openpyxl's read_only cells and is kept for parity
+    checks. Both give the same output.
+
+    output_format picks the file type of both outputs: 'xlsx' (default), 'csv',
+    'csv.gz' (gzip-compressed CSV) or 'jsonl' (JSON Lines, one object per data row
+    keyed by the header, made unique with unique_keys). The flat formats hold the
+    processed sheet only: rows are written to the files as they are classified, in
+    a single pass with no workbook in memory, and streaming, auto-fit and
+    auxiliary_sheets do not apply. Values are written as read; number formats are
+    not kept.
+
+    Column auto-fit widths are measured while rows are written. autofit_sample_rows=N
+    measures only the first N data rows of each output sheet, which is close to free
+    on huge sheets and lets streaming mode skip its pre-pass (a single read of the
+    input sheet).
+
+    progress_callback, if given, is called as progress_callback(rows_processed, rows_excluded)
+    every PROGRESS_INTERVAL_ROWS data rows and once when classification is done.
+    Returns a summary dict with rows_processed, rows_kept and rows_excluded, the
+    excluded rows per keyword (excluded_by_keyword, excluded_foreign_characters,
+    excluded_duplicates, and a 'dedup' dict with the duplicate counts when deduplicating),
+    total_seconds and, per stage (see STAGES), its seconds, rows_per_sec (None
+    except for ROW_STAGES) and peak_rss_bytes. In the in-memory path 'classify'
+    includes building the output rows; in streaming mode rows written after the
+    pre-pass count as 'write'.
+    """
+
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'. Expected one of: {', '.join(OUTPUT_FORMATS)}.")
+    if reader not in READERS:
+        raise ValueError(f"Unknown reader '{reader}'. Expected one of: {', '.join(READERS)}.")
+    if auxiliary_sheets not in AUXILIARY_SHEET_MODES:
+        raise ValueError(f"Unknown auxiliary_sheets mode '{auxiliary_sheets}'. Expected one of: {', '.join(AUXILIARY_SHEET_MODES)}.")
+    if autofit_sample_rows is not None and (not isinstance(autofit_sample_rows, int) or autofit_sample_rows < 1):
+        raise ValueError(f"autofit_sample_rows must be a positive integer, got {autofit_sample_rows!r}.")
+    if dedup not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode '{dedup}'. Expected one of: {', '.join(DEDUP_MODES)}.")
+    if dedup_key not in DEDUP_KEYS:
+        raise ValueError(f"Unknown dedup_key '{dedup_key}'. Expected one of: {', '.join(DEDUP_KEYS)}.")
+    if keyword_matcher is None:
+        keyword_matcher = KeywordMatcher(keywords_list or [])
+    if foreign_scripts is None and foreign_ratio is None:
+        script_detector = DEFAULT_SCRIPT_DETECTOR
+    else:
+        script_detector = ScriptDetector(DEFAULT_SCRIPTS if foreign_scripts is None else foreign_scripts,
+                                         foreign_ratio)
+    if input_sheet_names is not None:
+        if output_format != 'xlsx':
+            raise ValueError("Processing several sheets needs output_format 'xlsx'.")
+        return process_data_sheets(input_filepath, cleaned_output_filepath, excluded_output_filepath,
+                                   input_sheet_names, keyword_matcher, script_detector, reason_column,
+                                   progress_callback, sheet_workers, auxiliary_sheets, autofit_sample_rows,
+                                   reader, dedup, dedup_key)
+    progress = ProcessingProgress(progress_callback)
 
     original_workbook = None
     try:
@@ -56,6 +698,7 @@ def process_data_excel(input_filepath, cleaned_output_filepath, excluded_output_
             input_sheet = original_workbook[input_sheet_name]
         except KeyError:
             raise ValueError(f"Input sheet '{input_sheet_name}' not found in the Excel file.")
+        progress.end_stage('load')
 
         # Read the first row to get headers (iter_rows is key for read_only)
         first_row_generator = input_sheet.iter_rows(min_row=1, max_row=1)
@@ -86,6 +729,25 @@ def process_data_excel(input_filepath, cleaned_output_filepath, excluded_output_
         # All columns will be copied by default, as UUID is no longer excluded.
         # columns_to_copy_indices = [idx for idx in range(len(header_row_cells)) if idx != uuid_col_index]
         columns_to_copy_indices = list(range(len(header_row_cells)))
+        if dedup != 'off':
+            progress.deduplicator = RowDeduplicator(dedup, [cell.value for cell in header_row_cells],
+                                                    konten_col_index, dedup_key)
+        progress.end_stage('header_scan')
+
+        if output_format != 'xlsx':
+            _write_flat_outputs(input_sheet, header_row_cells, konten_col_index, columns_to_copy_indices,
+                                keyword_matcher, cleaned_output_filepath, excluded_output_filepath,
+                                output_format, reason_column, progress, reader,
+                                script_detector)
+            return progress.summary()
+
+        if streaming:
+            _stream_data_excel(original_workbook, input_sheet, header_row_cells, konten_col_index,
+                               columns_to_copy_indices, keyword_matcher, input_sheet_name,
+                               output_sheet_name, cleaned_output_filepath, excluded_output_filepath,
+                               reason_column, progress, auxiliary_sheets,
+                               autofit_sample_rows, reader, script_detector)
+            return progress.summary()
 
 
         # Create new workbooks for output
@@ -101,108 +763,73 @@ def process_data_excel(input_filepath, cleaned_output_filepath, excluded_output_
         excluded_ws.sheet_state = 'visible'
 
         # --- Copy HEADER ROW (UUID now included) ---
-        current_row_in_cleaned = 1
-        current_row_in_excluded = 1
-        target_col_for_header_cleaned = 1
-        target_col_for_header_excluded = 1
-
-        for idx in columns_to_copy_indices: # Iterate through all columns
-            original_cell = header_row_cells[idx]
-            new_cleaned_cell = cleaned_ws.cell(row=current_row_in_cleaned, column=target_col_for_header_cleaned)
-            copy_cell_properties(original_cell, new_cleaned_cell)
-            target_col_for_header_cleaned += 1
-
-            new_excluded_cell = excluded_ws.cell(row=current_row_in_excluded, column=target_col_for_header_excluded)
-            copy_cell_properties(original_cell, new_excluded_cell)
-            target_col_for_header_excluded += 1
+        # Rows are written in one batch with ws.append, which keeps its own row cursor.
+        # Asking for target_ws.max_row per row scans every stored cell and made the
+        # data loop quadratic in the number of rows.
+        cleaned_ws.append([build_cell(cleaned_ws, header_row_cells[idx]) for idx in columns_to_copy_indices])
+        excluded_header = [build_cell(excluded_ws, header_row_cells[idx]) for idx in columns_to_copy_indices]
+        if reason_column:
+            excluded_header.append(REASON_COLUMN_HEADER)
+        excluded_ws.append(excluded_header)
+
+        header_values = [header_row_cells[idx].value for idx in columns_to_copy_indices]
+        cleaned_widths = ColumnWidths(header_values)
+        excluded_widths = ColumnWidths(header_values + ([REASON_COLUMN_HEADER] if reason_column else []))
+        number_formats = StyleNumberFormats(original_workbook)
         
         # Row and column dimensions are not available in read_only mode, so skipping copying them.
 
 
-        # Foreign character pattern
-        foreign_character_pattern = r'[\u4E00-\u9FFF\uAC00-\uD7AF\u0900-\u097F\u0600-\u06FF\u0400-\u04FF]'
-
         # Iterate through DATA ROWS (starting from row 2)
-        for r_idx, row_cells in enumerate(input_sheet.iter_rows(min_row=2), 2):
-            row_cells_list = list(row_cells) 
-
-            if konten_col_index >= len(row_cells_list):
+        data_rows = iter_data_rows(input_sheet, reader)
+        rows_are_values = reader == 'xlsx'
+        classified_rows = iter_classified_rows(data_rows, konten_col_index, keyword_matcher,
+                                               rows_are_values, script_detector)
+        if progress.deduplicator is not None:
+            classified_rows = progress.deduplicator.apply(classified_rows, rows_are_values)
+        for row, decision, reason in classified_rows:
+            if decision == ROW_SKIP:
                 continue
+            progress.add(decision == ROW_EXCLUDE, reason)
 
-            konten_cell = row_cells_list[konten_col_index]
-            konten_value = str(konten_cell.value or '').strip()
+            # Copy the cells of the data row to its target sheet
+            target_ws = excluded_ws if decision == ROW_EXCLUDE else cleaned_ws
+            new_row = copy_row(target_ws, row, columns_to_copy_indices, number_formats)
+            if decision == ROW_EXCLUDE and reason_column:
+                new_row.append(reason)
+            target_ws.append(new_row)
 
-            exclude_row = False
-            for keyword in keywords_list:
-                if str(keyword).strip().lower() in konten_value.lower():
-                    exclude_row = True
-                    break
-
-            if not exclude_row:
-                if re.search(foreign_character_pattern, konten_value):
-                    exclude_row = True
-
-            target_worksheets_for_data = []
-            if exclude_row:
-                target_worksheets_for_data.append(excluded_ws)
-            else:
-                target_worksheets_for_data.append(cleaned_ws)
-
-            # Copy cells to the target sheets for data rows
-            for target_ws in target_worksheets_for_data:
-                current_target_row = target_ws.max_row + 1
-                target_col_for_data = 1
-
-                for idx in columns_to_copy_indices: # Iterate through all columns, including where UUID was
-                    original_cell = row_cells_list[idx]
-                    new_cell = target_ws.cell(row=current_target_row, column=target_col_for_data)
-                    copy_cell_properties(original_cell, new_cell)
-                    target_col_for_data += 1
+            # Auto-fit widths are measured as rows are written (only a sheet's first rows when sampling)
+            target_widths = excluded_widths if decision == ROW_EXCLUDE else cleaned_widths
+            if autofit_sample_rows is None or target_widths.rows_measured < autofit_sample_rows:
+                target_widths.update([cell.value if hasattr(cell, 'value') else cell for cell in new_row])
+        progress.finish()
+        progress.end_stage('classify')
 
 
         # Copy all other sheets from the original workbook (UUID now included, no dimensions/styles)
-        for workbook in [cleaned_workbook, excluded_workbook]:
-            for sheet_name in original_workbook.sheetnames:
-                if sheet_name != input_sheet_name:
-                    original_sheet = original_workbook[sheet_name]
-                    new_ws = workbook.create_sheet(title=sheet_name)
-                    new_ws.sheet_state = original_sheet.sheet_state
-
-                    for r_idx_other, row in enumerate(original_sheet.iter_rows(values_only=False), 1):
-                        target_other_sheet_col_idx = 1
-                        row_cells_other_list = list(row)
-                        for c_idx, cell in enumerate(row_cells_other_list):
-                            # UUID column is no longer specifically skipped
-                            # if c_idx == uuid_col_index:
-                            #    continue
-                            new_cell = new_ws.cell(row=r_idx_other, column=target_other_sheet_col_idx)
-                            copy_cell_properties(cell, new_cell)
-                            target_other_sheet_col_idx += 1
+        reference_state = add_auxiliary_sheets(original_workbook, input_sheet_name,
+                                               [cleaned_workbook, excluded_workbook], auxiliary_sheets)
+        progress.end_stage('auxiliary_sheets')
 
 
         # Auto-fit column widths for the main processed sheets
-        for ws in [cleaned_ws, excluded_ws]:
-            for col_idx_new, column in enumerate(ws.columns):
-                max_length = 0
-                for cell in column:
-                    try:
-                        if cell.value is not None:
-                            current_length = len(str(cell.value))
-                            if current_length > max_length:
-                                max_length = current_length
-                    except TypeError:
-                        pass
-                column_letter = openpyxl.utils.get_column_letter(col_idx_new + 1)
-                adjusted_width = min((max_length + 2), 75)
-                if adjusted_width > 0:
-                    ws.column_dimensions[column_letter].width = adjusted_width
+        cleaned_widths.apply(cleaned_ws)
+        excluded_widths.apply(excluded_ws)
+        progress.end_stage('autofit')
 
         # Save the workbooks
         cleaned_workbook.save(cleaned_output_filepath)
         excluded_workbook.save(excluded_output_filepath)
+        progress.end_stage('save')
+        if reference_state:
+            finish_reference_sheets(original_workbook, reference_state,
+                                    [cleaned_output_filepath, excluded_output_filepath])
+            progress.end_stage('auxiliary_sheets')
 
         print(f"Cleaned data saved to {cleaned_output_filepath} in sheet '{output_sheet_name}' and other sheets preserved.")
         print(f"Excluded items saved to {excluded_output_filepath} in sheet '{output_sheet_name}' and other sheets preserved.")
+        return progress.summary()
 
     except FileNotFoundError:
         raise FileNotFoundError(f"Input file not found at {input_filepath}")
@@ -218,9 +845,449 @@ def process_data_excel(input_filepath, cleaned_output_filepath, excluded_output_
                 print(f"Closed original workbook to free memory.")
             except Exception as e:
                 print(f"Error closing original workbook: {e}")
-        
-        time.sleep(0.1)
-        if os.path.exists(input_filepath):
+
+        # Only uploads saved to disk are deleted; file objects (e.g. the request's
+        # spooled upload stream) belong to the caller. The workbook is closed above,
+        # so the file can be removed right away.
+        if isinstance(input_filepath, (str, os.PathLike)) and os.path.exists(input_filepath):
+            try:
+                os.remove(input_filepath)
+                print(f"Deleted uploaded input file: {input_filepath}")
+            except Exception as e:
+                print(f"Error deleting input file {input_filepath}: {e}")
+
+
+def _stream_data_excel(original_workbook, input_sheet, header_row_cells, konten_col_index,
+                       columns_to_copy_indices, keyword_matcher, input_sheet_name,
+                       output_sheet_name, cleaned_output_filepath, excluded_output_filepath,
+                       reason_column=False, progress=None,
+                       auxiliary_sheets='copy', autofit_sample_rows=None, reader='xlsx',
+                       script_detector=DEFAULT_SCRIPT_DETECTOR):
+    """
+    Streaming counterpart of the in-memory path of process_data_excel.
+    Produces the same cleaned/excluded files using write_only workbooks.
+
+    Exact auto-fit needs the widths of every row before the first row is written,
+    hence the values-only pre-pass. With autofit_sample_rows the widths come from the
+    first rows of each output sheet instead: a sheet's rows are held back until its
+    widths are set and the input sheet is read only once.
+    """
+    progress = progress or ProcessingProgress()
+    header_values = [header_row_cells[idx].value for idx in columns_to_copy_indices]
+    cleaned_widths = ColumnWidths(header_values)
+    excluded_widths = ColumnWidths(header_values + ([REASON_COLUMN_HEADER] if reason_column else []))
+    number_formats = StyleNumberFormats(original_workbook)
+
+    # --- Pass 1 (exact auto-fit only): classify rows and measure column widths ---
+    # One byte per data row is kept, so this stays small even for very large sheets.
+    # The exclusion reasons are only recomputed in pass 2 when the reason column is on.
+    row_decisions = None
+    if autofit_sample_rows is None:
+        row_decisions = bytearray()
+        data_rows = iter_data_rows(input_sheet, reader, values_only=True)
+        classified_rows = iter_classified_rows(data_rows, konten_col_index, keyword_matcher,
+                                               True, script_detector)
+        if progress.deduplicator is not None:
+            classified_rows = progress.deduplicator.apply(classified_rows)
+        for row_values, decision, reason in classified_rows:
+            # Pass 2 cannot recompute a duplicate's reason from its KONTEN alone
+            duplicate = decision == ROW_EXCLUDE and reason == DUPLICATE_REASON
+            row_decisions.append(ROW_DUPLICATE if duplicate else decision)
+            if decision == ROW_SKIP:
+                continue
+            progress.add(decision == ROW_EXCLUDE, reason)
+
+            new_row = [row_values[idx] for idx in columns_to_copy_indices]
+            if decision == ROW_EXCLUDE:
+                if reason_column:
+                    new_row.append(reason)
+                excluded_widths.update(new_row)
+            else:
+                cleaned_widths.update(new_row)
+        progress.finish()
+        progress.end_stage('classify')
+
+    # --- Create write_only output workbooks ---
+    cleaned_workbook = openpyxl.Workbook(write_only=True)
+    excluded_workbook = openpyxl.Workbook(write_only=True)
+    cleaned_ws = cleaned_workbook.create_sheet(title=output_sheet_name)
+    excluded_ws = excluded_workbook.create_sheet(title=output_sheet_name)
+
+    cleaned_header = [build_cell(cleaned_ws, header_row_cells[idx]) for idx in columns_to_copy_indices]
+    excluded_header = [build_cell(excluded_ws, header_row_cells[idx]) for idx in columns_to_copy_indices]
+    if reason_column:
+        excluded_header.append(REASON_COLUMN_HEADER)
+
+    # Column widths must be set before the first row is appended, so each sheet's
+    # rows are held back (by decision) until its widths are known
+    output_sheets = {ROW_KEEP: (cleaned_ws, cleaned_widths), ROW_EXCLUDE: (excluded_ws, excluded_widths)}
+    held_rows = {ROW_KEEP: [cleaned_header], ROW_EXCLUDE: [excluded_header]}
+
+    def release_held_rows(decision):
+        target_ws, target_widths = output_sheets[decision]
+        target_widths.apply(target_ws)
+        for new_row in held_rows.pop(decision):
+            target_ws.append(new_row)
+
+    if row_decisions is not None:
+        release_held_rows(ROW_KEEP)
+        release_held_rows(ROW_EXCLUDE)
+        progress.end_stage('autofit')
+
+    # --- Stream the data rows into their target sheet ---
+    # Pass 2 when the decisions are known, otherwise classify while writing.
+    data_rows = iter_data_rows(input_sheet, reader)
+    rows_are_values = reader == 'xlsx'
+    if row_decisions is not None:
+        classified_rows = ((row, ROW_EXCLUDE, DUPLICATE_REASON) if decision == ROW_DUPLICATE else (row, decision, None)
+                           for decision, row in zip(row_decisions, data_rows))
+    else:
+        classified_rows = iter_classified_rows(data_rows, konten_col_index, keyword_matcher,
+                                               rows_are_values, script_detector)
+        if progress.deduplicator is not None:
+            classified_rows = progress.deduplicator.apply(classified_rows, rows_are_values)
+
+    for row, decision, reason in classified_rows:
+        if decision == ROW_SKIP:
+            continue
+        target_ws = excluded_ws if decision == ROW_EXCLUDE else cleaned_ws
+        new_row = copy_row(target_ws, row, columns_to_copy_indices, number_formats)
+        konten_value = row[konten_col_index] if rows_are_values else row[konten_col_index].value
+        if decision == ROW_EXCLUDE and reason_column:
+            if reason is None:
+                reason = exclusion_reason(str(konten_value or '').strip(), keyword_matcher, script_detector)
+            new_row.append(reason)
+
+        if row_decisions is None:
+            progress.add(decision == ROW_EXCLUDE, reason)
+        if decision not in held_rows:
+            target_ws.append(new_row)
+            continue
+
+        target_widths = output_sheets[decision][1]
+        target_widths.update([cell.value if hasattr(cell, 'value') else cell for cell in new_row])
+        held_rows[decision].append(new_row)
+        if target_widths.rows_measured >= autofit_sample_rows:
+            release_held_rows(decision)
+
+    for decision in list(held_rows):
+        release_held_rows(decision)
+    if row_decisions is None:
+        progress.finish()
+    # Without the pre-pass, classifying and writing the rows is one stage
+    progress.end_stage('write' if row_decisions is not None else 'classify')
+
+    # Copy all other sheets from the original workbook
+    reference_state = add_auxiliary_sheets(original_workbook, input_sheet_name,
+                                           [cleaned_workbook, excluded_workbook], auxiliary_sheets)
+    progress.end_stage('auxiliary_sheets')
+
+    # Save the workbooks
+    cleaned_workbook.save(cleaned_output_filepath)
+    excluded_workbook.save(excluded_output_filepath)
+    progress.end_stage('save')
+    if reference_state:
+        finish_reference_sheets(original_workbook, reference_state,
+                                [cleaned_output_filepath, excluded_output_filepath])
+        progress.end_stage('auxiliary_sheets')
+
+    print(f"Cleaned data streamed to {cleaned_output_filepath} in sheet '{output_sheet_name}' and other sheets preserved.")
+    print(f"Excluded items streamed to {excluded_output_filepath} in sheet '{output_sheet_name}' and other sheets preserved.")
+
+
+def _write_flat_outputs(input_sheet, header_row_cells, konten_col_index, columns_to_copy_indices,
+                        keyword_matcher, cleaned_output_filepath, excluded_output_filepath,
+                        output_format, reason_column=False, progress=None,
+                        reader='xlsx', script_detector=DEFAULT_SCRIPT_DETECTOR):
+    """
+    Writes the cleaned and excluded rows as CSV, gzip-compressed CSV or JSON Lines
+    (see RowFileWriter), row by row in a single pass over the input sheet.
+    """
+    progress = progress or ProcessingProgress()
+    header_values = [header_row_cells[idx].value for idx in columns_to_copy_indices]
+    cleaned_writer = RowFileWriter(cleaned_output_filepath, output_format)
+    excluded_writer = RowFileWriter(excluded_output_filepath, output_format)
+    try:
+        cleaned_writer.write_row(header_values)
+        excluded_writer.write_row(header_values + ([REASON_COLUMN_HEADER] if reason_column else []))
+
+        data_rows = iter_data_rows(input_sheet, reader, values_only=True)
+        classified_rows = iter_classified_rows(data_rows, konten_col_index, keyword_matcher,
+                                               True, script_detector)
+        if progress.deduplicator is not None:
+            classified_rows = progress.deduplicator.apply(classified_rows)
+        for row, decision, reason in classified_rows:
+            if decision == ROW_SKIP:
+                continue
+            progress.add(decision == ROW_EXCLUDE, reason)
+            new_row = [row[idx] for idx in columns_to_copy_indices]
+            if decision == ROW_EXCLUDE:
+                if reason_column:
+                    new_row.append(reason)
+                excluded_writer.write_row(new_row)
+            else:
+                cleaned_writer.write_row(new_row)
+        progress.finish()
+        progress.end_stage('classify')
+    finally:
+        cleaned_writer.close()
+        excluded_writer.close()
+    progress.end_stage('save')
+
+    print(f"Cleaned data written to {cleaned_output_filepath} ({output_format}).")
+    print(f"Excluded items written to {excluded_output_filepath} ({output_format}).")
+
+
+# input_sheet_names value that selects every sheet with a KONTEN header
+ALL_KONTEN_SHEETS = '*'
+# Rows pickled per record of a sheet's spill files
+SPILL_BATCH_ROWS = 1000
+
+
+def konten_column_index(header_values):
+    """Index of the KONTEN column in a header row (case and surrounding spaces ignored), or -1."""
+    for idx, value in enumerate(header_values):
+        if str(value or '').strip().upper() == 'KONTEN':
+            return idx
+    return -1
+
+
+def _sheet_header(input_sheet):
+    try:
+        return list(next(input_sheet.iter_rows(min_row=1, max_row=1)))
+    except StopIteration:
+        return []
+
+
+def _write_spill(spill_file, rows):
+    pickle.dump(rows, spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _iter_spill(path):
+    with open(path, 'rb') as spill_file:
+        while True:
+            try:
+                rows = pickle.load(spill_file)
+            except EOFError:
+                return
+            yield from rows
+
+
+def _process_sheet_to_spill(input_path, sheet_name, spill_dir, keyword_matcher, script_detector,
+                            reason_column, autofit_sample_rows, reader, dedup, dedup_key):
+    """
+    Runs in a pool worker: classifies the data rows of one sheet and spills the
+    cleaned and excluded rows to two temporary files, in sheet order ('save' in the
+    sheet's stages is the last spill write). Rows are
+    stored ready to write, as (value, number format, None) payloads for
+    build_cell_from_payload.
+    Returns what the writing process needs: header, spill paths, column widths
+    and the sheet's summary.
+    """
+    progress = ProcessingProgress()
+    workbook = openpyxl.load_workbook(input_path, read_only=True)
+    try:
+        input_sheet = workbook[sheet_name]
+        header_row_cells = _sheet_header(input_sheet)
+        header_values = [cell.value for cell in header_row_cells]
+        konten_col_index = konten_column_index(header_values)
+        if konten_col_index == -1:
+            raise ValueError(f"'KONTEN' column not found in sheet '{sheet_name}'. "
+                             f"Available columns (from first row) are: {header_values}")
+        progress.end_stage('load')
+        columns = range(len(header_row_cells))
+        rows_are_values = reader == 'xlsx'
+        number_formats = StyleNumberFormats(workbook)
+        if dedup != 'off':
+            progress.deduplicator = RowDeduplicator(dedup, header_values, konten_col_index, dedup_key)
+        cleaned_widths = ColumnWidths(header_values)
+        excluded_widths = ColumnWidths(header_values + ([REASON_COLUMN_HEADER] if reason_column else []))
+
+        spill_files = {decision: tempfile.NamedTemporaryFile(dir=spill_dir, suffix=suffix, delete=False)
+                       for decision, suffix in ((ROW_KEEP, '_cleaned.pickle'), (ROW_EXCLUDE, '_excluded.pickle'))}
+        spill_paths = {decision: spill_file.name for decision, spill_file in spill_files.items()}
+        pending = {ROW_KEEP: [], ROW_EXCLUDE: []}
+        try:
+            data_rows = iter_data_rows(input_sheet, reader)
+            classified_rows = iter_classified_rows(data_rows, konten_col_index, keyword_matcher,
+                                                   rows_are_values, script_detector)
+            if progress.deduplicator is not None:
+                classified_rows = progress.deduplicator.apply(classified_rows, rows_are_values)
+            for row, decision, reason in classified_rows:
+                if decision == ROW_SKIP:
+                    continue
+                progress.add(decision == ROW_EXCLUDE, reason)
+                if isinstance(row, xlsx_reader.StyledRow):
+                    style_ids = row.style_ids
+                    new_row = [(row[idx], number_formats.get(style_ids[idx]), None) for idx in columns]
+                    values = row
+                else:
+                    new_row = [cell_payload(row[idx]) for idx in columns]
+                    values = [payload[0] for payload in new_row]
+                if decision == ROW_EXCLUDE and reason_column:
+                    new_row.append(reason)
+                    values = list(values) + [reason]
+                target_widths = excluded_widths if decision == ROW_EXCLUDE else cleaned_widths
+                if autofit_sample_rows is None or target_widths.rows_measured < autofit_sample_rows:
+                    target_widths.update(values)
+
+                batch = pending[decision]
+                batch.append(new_row)
+                if len(batch) >= SPILL_BATCH_ROWS:
+                    _write_spill(spill_files[decision], batch)
+                    pending[decision] = []
+            progress.end_stage('classify')
+            for decision, batch in pending.items():
+                if batch:
+                    _write_spill(spill_files[decision], batch)
+        finally:
+            for spill_file in spill_files.values():
+                spill_file.close()
+        progress.end_stage('save')
+
+        return {
+            'sheet_name': sheet_name,
+            'header': [cell_payload(cell) for cell in header_row_cells],
+            'cleaned_spill': spill_paths[ROW_KEEP],
+            'excluded_spill': spill_paths[ROW_EXCLUDE],
+            'cleaned_widths': cleaned_widths.max_lengths,
+            'excluded_widths': excluded_widths.max_lengths,
+            'summary': progress.summary(),
+        }
+    finally:
+        workbook.close()
+
+
+def _append_spilled_rows(target_ws, spill_path):
+    for new_row in _iter_spill(spill_path):
+        target_ws.append([build_cell_from_payload(target_ws, item) if isinstance(item, tuple) else item
+                          for item in new_row])
+
+
+def process_data_sheets(input_filepath, cleaned_output_filepath, excluded_output_filepath, input_sheet_names,
+                        keyword_matcher, script_detector=DEFAULT_SCRIPT_DETECTOR, reason_column=False,
+                        progress_callback=None, max_workers=None, auxiliary_sheets='copy',
+                        autofit_sample_rows=None, reader='xlsx', dedup='off', dedup_key='auto'):
+    """
+    Filters the KONTEN rows of several sheets of one workbook in a single call.
+
+    input_sheet_names is a list of sheet names, or ALL_KONTEN_SHEETS ('*') for every
+    sheet whose header row has a KONTEN column. Each sheet is classified in its own
+    process (at most max_workers at once, default one per CPU), which spills its
+    cleaned and excluded rows to temporary files. This process then goes through
+    the sheets of the workbook in order and adds each one to both write_only output
+    workbooks: a processed sheet once it is done, any other sheet as auxiliary_sheets
+    says, so the outputs keep the workbook's sheet order. Deduplication is per sheet;
+    the 'dedup' entry of the totals adds up the sheets' counts, and its key is 'auto'
+    when the sheets were deduplicated on different keys.
+
+    Called by process_data_excel (with input_sheet_names), which validates the
+    options. Returns the totals of all sheets in the usual summary format, plus a
+    'sheets' dict with each sheet's own summary (its stages are timed in its worker).
+    In the totals, 'classify' is the time spent waiting for the workers and 'write'
+    the time spent writing the processed sheets.
+    """
+    progress = ProcessingProgress(progress_callback)
+    spill_dir = tempfile.mkdtemp(prefix='aceng_sheets_')
+    original_workbook = None
+    try:
+        # Pool workers open the workbook themselves, so they need it as a file
+        if isinstance(input_filepath, (str, os.PathLike)):
+            input_path = input_filepath
+        else:
+            input_path = os.path.join(spill_dir, 'input.xlsx')
+            input_filepath.seek(0)
+            with open(input_path, 'wb') as input_copy:
+                shutil.copyfileobj(input_filepath, input_copy)
+
+        original_workbook = openpyxl.load_workbook(input_path, read_only=True)
+        has_konten = {sheet_name: konten_column_index(cell.value for cell in
+                                                      _sheet_header(original_workbook[sheet_name])) != -1
+                      for sheet_name in original_workbook.sheetnames}
+        if input_sheet_names == ALL_KONTEN_SHEETS:
+            sheet_names = [sheet_name for sheet_name in original_workbook.sheetnames if has_konten[sheet_name]]
+            if not sheet_names:
+                raise ValueError("No sheet with a 'KONTEN' column found in the Excel file.")
+        else:
+            sheet_names = list(dict.fromkeys(input_sheet_names))
+            if not sheet_names:
+                raise ValueError("No input sheets given.")
+            missing = [sheet_name for sheet_name in sheet_names if sheet_name not in original_workbook.sheetnames]
+            if missing:
+                raise ValueError(f"Input sheet(s) {', '.join(map(repr, missing))} not found in the Excel file.")
+            without_konten = [sheet_name for sheet_name in sheet_names if not has_konten[sheet_name]]
+            if without_konten:
+                raise ValueError(f"'KONTEN' column not found in sheet(s) {', '.join(map(repr, without_konten))}.")
+            # Start them in workbook order, whatever order they were asked for in
+            sheet_names.sort(key=original_workbook.sheetnames.index)
+        progress.end_stage('load')
+
+        cleaned_workbook = openpyxl.Workbook(write_only=True)
+        excluded_workbook = openpyxl.Workbook(write_only=True)
+        workbooks = [cleaned_workbook, excluded_workbook]
+        reference_state = None
+        sheet_summaries = {}
+        max_workers = min(len(sheet_names), max_workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {sheet_name: pool.submit(_process_sheet_to_spill, input_path, sheet_name, spill_dir,
+                                               keyword_matcher, script_detector, reason_column,
+                                               autofit_sample_rows, reader, dedup, dedup_key)
+                       for sheet_name in sheet_names}
+            for sheet_name in original_workbook.sheetnames:
+                if sheet_name not in futures:
+                    if auxiliary_sheets == 'reference':
+                        reference_state = prepare_reference_sheets(original_workbook, [sheet_name], workbooks,
+                                                                   reference_state)
+                    elif auxiliary_sheets == 'copy':
+                        copy_auxiliary_sheets(original_workbook, [sheet_name], workbooks)
+                    progress.end_stage('auxiliary_sheets')
+                    continue
+
+                result = futures[sheet_name].result()
+                progress.end_stage('classify')
+                for workbook, widths, spill_path, with_reason in (
+                        (cleaned_workbook, result['cleaned_widths'], result['cleaned_spill'], False),
+                        (excluded_workbook, result['excluded_widths'], result['excluded_spill'], reason_column)):
+                    target_ws = workbook.create_sheet(title=sheet_name)
+                    apply_column_widths(target_ws, widths)
+                    header = [build_cell_from_payload(target_ws, payload) for payload in result['header']]
+                    if with_reason:
+                        header.append(REASON_COLUMN_HEADER)
+                    target_ws.append(header)
+                    _append_spilled_rows(target_ws, spill_path)
+                    os.remove(spill_path)
+                sheet_summaries[sheet_name] = result['summary']
+                progress.merge(result['summary'])
+                progress.end_stage('write')
+
+        cleaned_workbook.save(cleaned_output_filepath)
+        excluded_workbook.save(excluded_output_filepath)
+        progress.end_stage('save')
+        if reference_state:
+            finish_reference_sheets(original_workbook, reference_state,
+                                    [cleaned_output_filepath, excluded_output_filepath])
+            progress.end_stage('auxiliary_sheets')
+
+        print(f"Cleaned data of sheets {sheet_names} saved to {cleaned_output_filepath}.")
+        print(f"Excluded items of sheets {sheet_names} saved to {excluded_output_filepath}.")
+        summary = progress.summary()
+        summary['sheets'] = sheet_summaries
+        return summary
+
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Input file not found at {input_filepath}")
+    except ValueError as e:
+        raise e
+    except Exception as e:
+        raise Exception(f"An error occurred during data processing: {e}")
+    finally:
+        if original_workbook:
+            try:
+                original_workbook.close()
+            except Exception as e:
+                print(f"Error closing original workbook: {e}")
+        shutil.rmtree(spill_dir, ignore_errors=True)
+        if isinstance(input_filepath, (str, os.PathLike)) and os.path.exists(input_filepath):
             try:
                 os.remove(input_filepath)
                 print(f"Deleted uploaded input file: {input_filepath}")
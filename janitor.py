@@ -0,0 +1,171 @@
+"""
+Background removal of old processed outputs and orphaned uploads.
+
+Every gunicorn worker runs a FileJanitor thread, but a sweep takes an exclusive
+file lock and records when it last ran, so across all workers the folders are
+swept once per interval.
+"""
+import os
+import re
+import time
+import random
+import threading
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; sweeps of several processes may then overlap (harmless)
+    fcntl = None
+
+# Uploads saved by app.save_upload are named <uuid4 hex>_<filename>; other files are left alone
+UPLOAD_NAME_PATTERN = re.compile(r'^[0-9a-f]{32}_')
+
+
+def _folder_files(folder):
+    """(mtime, size, path) of the regular files directly inside folder; dot files are skipped."""
+    files = []
+    try:
+        entries = list(os.scandir(folder))
+    except FileNotFoundError:
+        return files
+    for entry in entries:
+        if entry.name.startswith('.'):
+            continue
+        try:
+            if entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            continue
+    return files
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        print(f"Error deleting file {path}: {e}")
+        return False
+
+
+class FileJanitor:
+    """
+    Keeps the processed files folder within an age limit and a disk quota.
+
+    A sweep first lets the result cache evict (so its index stays consistent),
+    then deletes any output older than max_age seconds, then the oldest outputs
+    until the folder holds at most max_bytes. Files modified in the last min_age
+    seconds are never deleted for the quota, since a job may still be writing
+    them. Uploads older than upload_max_age (left behind by crashed jobs) are
+    deleted as well. Cache entries whose files are gone miss on their next lookup.
+    """
+
+    def __init__(self, processed_folder, upload_folder, lock_path, max_age, max_bytes, upload_max_age,
+                 interval=300, min_age=600, cache=None):
+        self.processed_folder = processed_folder
+        self.upload_folder = upload_folder
+        self.lock_path = lock_path
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.upload_max_age = upload_max_age
+        self.interval = interval
+        self.min_age = min_age
+        self.cache = cache
+        self._thread = None
+        self._thread_pid = None
+        self._thread_lock = threading.Lock()
+
+    def _sweep_due(self, lock_file):
+        lock_file.seek(0)
+        try:
+            last_sweep = float(lock_file.read() or 0)
+        except ValueError:
+            last_sweep = 0
+        return time.time() - last_sweep >= self.interval
+
+    def sweep(self, force=False):
+        """
+        Runs one sweep unless another process is sweeping or one ran less than
+        interval seconds ago (force=True ignores the latter). Returns a summary of
+        what was deleted, or None if the sweep was skipped.
+        """
+        with open(self.lock_path, 'a+') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return None
+            if not force and not self._sweep_due(lock_file):
+                return None
+            summary = self._sweep()
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(repr(time.time()))
+            return summary
+
+    def _sweep(self):
+        if self.cache is not None:
+            try:
+                self.cache.evict()
+            except Exception as e:
+                print(f"Error evicting result cache: {e}")
+
+        now = time.time()
+        removed_files = removed_bytes = 0
+        kept = []
+        for mtime, size, path in _folder_files(self.processed_folder):
+            if now - mtime > self.max_age:
+                if _remove(path):
+                    removed_files += 1
+                    removed_bytes += size
+            else:
+                kept.append((mtime, size, path))
+
+        total = sum(size for _, size, _ in kept)
+        for mtime, size, path in sorted(kept):
+            if total <= self.max_bytes:
+                break
+            if now - mtime < self.min_age:
+                continue
+            if _remove(path):
+                removed_files += 1
+                removed_bytes += size
+                total -= size
+
+        removed_uploads = 0
+        for mtime, size, path in _folder_files(self.upload_folder):
+            if UPLOAD_NAME_PATTERN.match(os.path.basename(path)) and now - mtime > self.upload_max_age:
+                if _remove(path):
+                    removed_uploads += 1
+        return {
+            'removed_files': removed_files,
+            'removed_bytes': removed_bytes,
+            'removed_uploads': removed_uploads,
+            'processed_bytes': total,
+        }
+
+    def _run(self):
+        # Spread the workers' first attempts instead of having them all try the lock at once
+        time.sleep(random.uniform(0, min(self.interval, 60)))
+        while True:
+            try:
+                summary = self.sweep()
+                if summary and (summary['removed_files'] or summary['removed_uploads']):
+                    print(f"Janitor removed {summary['removed_files']} processed files "
+                          f"({summary['removed_bytes']} bytes) and {summary['removed_uploads']} uploads.")
+            except Exception as e:
+                print(f"Janitor sweep failed: {e}")
+            time.sleep(self.interval)
+
+    def ensure_started(self):
+        """Starts the sweep thread of this process, once (and again in a forked child)."""
+        if self._thread is not None and self._thread_pid == os.getpid():
+            return
+        with self._thread_lock:
+            if self._thread is not None and self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='file-janitor', daemon=True)
+            self._thread.start()
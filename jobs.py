@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import excel_processor
+import result_cache
+
+logger = logging.getLogger(__name__)
+
+# Job states stored in the jobs table
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+# Progress is written to SQLite at most this often per job (seconds)
+PROGRESS_WRITE_INTERVAL = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    filename TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    rows_processed INTEGER NOT NULL DEFAULT 0,
+    rows_excluded INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT
+)
+"""
+
+
+def _connect(db_path):
+    """Opens the jobs database; every process (gunicorn workers and pool workers) uses its own connection."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_db(db_path):
+    """Creates the jobs table if needed and switches the database to WAL for concurrent readers."""
+    conn = _connect(db_path)
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(_SCHEMA)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _update_job(db_path, job_id, **fields):
+    conn = _connect(db_path)
+    try:
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_job(db_path, job_id, processor_kwargs, result, cache=None, cache_key=None, metrics=None, runner=None,
+            admission=None, admission_ticket=None, outputs=None):
+    """
+    Runs excel_processor.process_data_excel for one job inside a pool worker,
+    recording progress and the final state in the jobs table.
+    result is stored as the job's result (e.g. download URLs) once it succeeds,
+    and also in cache under cache_key when a result cache is given.
+    The run is added to metrics (a metrics.ProcessingMetrics), if given.
+    runner replaces process_data_excel (e.g. batch.run_batch); it gets the same
+    progress_callback and must return a summary dict.
+    With admission (an admission.AdmissionController), the job stays 'queued' until
+    its admission_ticket fits in the memory budget, and frees it when it ends.
+    outputs are (staged path, final path) pairs of files the processor writes under
+    a per-run name; they are moved into place once the run succeeds (see
+    result_cache.publish_outputs).
+    """
+    if runner is None:
+        runner = excel_processor.process_data_excel
+    if admission is not None:
+        try:
+            admission.start(admission_ticket)
+            _run_admitted_job(db_path, job_id, processor_kwargs, result, cache, cache_key, metrics, runner, outputs)
+        finally:
+            admission.release(admission_ticket)
+        return
+    _run_admitted_job(db_path, job_id, processor_kwargs, result, cache, cache_key, metrics, runner, outputs)
+
+
+def _run_admitted_job(db_path, job_id, processor_kwargs, result, cache, cache_key, metrics, runner, outputs):
+    _update_job(db_path, job_id, status=JOB_RUNNING, started_at=time.time())
+
+    last_write = [0.0]
+
+    def on_progress(rows_processed, rows_excluded):
+        now = time.time()
+        if now - last_write[0] >= PROGRESS_WRITE_INTERVAL:
+            last_write[0] = now
+            _update_job(db_path, job_id, rows_processed=rows_processed, rows_excluded=rows_excluded)
+
+    try:
+        summary = runner(progress_callback=on_progress, **processor_kwargs)
+        if outputs:
+            result_cache.publish_outputs(outputs)
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+        if outputs:
+            result_cache.discard_outputs(outputs)
+        _update_job(db_path, job_id, status=JOB_FAILED, finished_at=time.time(), error=str(e))
+        if metrics is not None:
+            metrics.record_failure()
+        return
+
+    logger.info(json.dumps({'event': 'excel_processed', 'job_id': job_id, **(summary or {})}))
+    if metrics is not None:
+        try:
+            metrics.record_run(summary or {})
+        except Exception as e:
+            logger.error(f"Job {job_id}: could not record metrics: {e}")
+
+    result = dict(result, **(summary or {}))
+    _update_job(db_path, job_id,
+                status=JOB_DONE,
+                finished_at=time.time(),
+                rows_processed=result.get('rows_processed', 0),
+                rows_excluded=result.get('rows_excluded', 0),
+                result=json.dumps(result))
+
+    if cache is not None and cache_key is not None:
+        try:
+            if outputs:
+                output_files = [os.path.basename(final_path) for _, final_path in outputs]
+            else:
+                output_files = [os.path.basename(processor_kwargs['cleaned_output_filepath']),
+                                os.path.basename(processor_kwargs['excluded_output_filepath'])]
+            cache.store(cache_key, output_files, result)
+        except Exception as e:
+            logger.error(f"Job {job_id}: could not store result in cache: {e}")
+
+
+def _job_future_done(db_path, job_id, metrics, admission, admission_ticket, future):
+    """
+    Done callback of a job's future. run_job records its own failures, so an
+    exception here means the job never ran to the end: its process died (e.g. it
+    was OOM-killed) or it could not be sent to the pool. The job is marked failed
+    instead of staying 'queued' or 'running' forever, and its admission ticket is
+    freed: a job still queued when the pool broke never reached run_job, and its
+    waiting ticket belongs to this (live) process, so it is never dropped as stale.
+    """
+    if future.cancelled() or future.exception() is None:
+        return
+    error = future.exception()
+    logger.error(f"Job {job_id} did not finish: {error}")
+    if admission is not None:
+        try:
+            admission.release(admission_ticket)
+        except Exception as e:
+            logger.error(f"Job {job_id}: could not release its admission ticket: {e}")
+    try:
+        _update_job(db_path, job_id, status=JOB_FAILED, finished_at=time.time(),
+                    error=f"Job did not finish: {error}")
+        if metrics is not None:
+            metrics.record_failure()
+    except Exception as e:
+        logger.error(f"Job {job_id}: could not record the failure: {e}")
+
+
+class JobQueue:
+    """
+    Local background job queue for Excel processing.
+
+    Job state lives in a SQLite database so any gunicorn worker can answer
+    status requests; the work itself runs in a bounded process pool owned by
+    the worker that accepted the upload. Jobs beyond max_workers wait in the
+    pool's queue with status 'queued'.
+    """
+
+    def __init__(self, db_path, max_workers=2):
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_pid = None
+        init_db(db_path)
+
+    def _get_executor(self):
+        # Created lazily (and again after a fork) so each gunicorn worker owns its pool
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def submit(self, processor_kwargs, result=None, filename=None, cache=None, cache_key=None, metrics=None,
+               runner=None, admission=None, admission_ticket=None, outputs=None):
+        """
+        Queues a process_data_excel call and returns the new job id.
+        processor_kwargs are passed to process_data_excel (or to runner, a picklable
+        module-level function, if given); result is merged into the job's result when
+        it finishes (and stored in cache under cache_key, if given).
+        The finished run is recorded in metrics, if given. With admission, the job
+        waits for admission_ticket to fit in the memory budget before it starts.
+        outputs are the (staged path, final path) pairs to publish when it succeeds.
+        """
+        job_id = uuid.uuid4().hex
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("INSERT INTO jobs (id, status, filename, created_at) VALUES (?, ?, ?, ?)",
+                         (job_id, JOB_QUEUED, filename, time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+
+        job_args = (run_job, self.db_path, job_id, processor_kwargs, result or {},
+                    cache, cache_key, metrics, runner, admission, admission_ticket, outputs)
+        try:
+            try:
+                future = self._get_executor().submit(*job_args)
+            except BrokenProcessPool:
+                # A worker of the pool died (e.g. OOM-killed); the pool takes no more work
+                logger.warning("Job pool is broken, starting a new one")
+                self._executor.shutdown(wait=False)
+                self._executor = None
+                future = self._get_executor().submit(*job_args)
+            future.add_done_callback(functools.partial(_job_future_done, self.db_path, job_id, metrics,
+                                                       admission, admission_ticket))
+        except Exception as e:
+            _update_job(self.db_path, job_id, status=JOB_FAILED, finished_at=time.time(),
+                        error=f"Could not start job: {e}")
+            raise
+        return job_id
+
+    def get(self, job_id):
+        """Returns the job as a dict, or None if there is no such job."""
+        conn = _connect(self.db_path)
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+
+        job = {
+            'job_id': row['id'],
+            'status': row['status'],
+            'filename': row['filename'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+            'rows_processed': row['rows_processed'],
+            'rows_excluded': row['rows_excluded'],
+        }
+        if row['result']:
+            job.update(json.loads(row['result']))
+        if row['error']:
+            job['error'] = row['error']
+        return job
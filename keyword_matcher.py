@@ -0,0 +1,87 @@
+import re
+
+
+def normalize_keyword(keyword):
+    """Normalizes a keyword the same way the row filter compares it (stripped, lowercase)."""
+    return str(keyword).strip().lower()
+
+
+def _trie_pattern(trie):
+    """
+    Turns a character trie into a regex where shared prefixes are only tested once,
+    e.g. ['gopay', 'gojek'] -> 'go(?:jek|pay)'. Every match of the pattern is a
+    complete keyword. The trie is walked with an explicit stack, so long keywords
+    do not hit the recursion limit.
+    """
+    patterns = {}
+    stack = [(trie, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if not children_done:
+            stack.append((node, True))
+            stack.extend((child, False) for char, child in node.items() if char != '')
+            continue
+        is_end = '' in node
+        alternatives = [re.escape(char) + patterns.pop(id(child))
+                        for char, child in sorted(node.items()) if char != '']
+        if not alternatives:
+            pattern = ''
+        elif len(alternatives) == 1 and not is_end:
+            pattern = alternatives[0]
+        else:
+            group = '(?:' + '|'.join(alternatives) + ')'
+            pattern = group + '?' if is_end else group
+        patterns[id(node)] = pattern
+    return patterns[id(trie)]
+
+
+class KeywordMatcher:
+    """
+    Precompiled case-insensitive substring matcher for the exclusion keywords.
+
+    Keywords are normalized once and compiled into a single trie-shaped regex,
+    so each KONTEN value is lowercased once and scanned once no matter how
+    many keywords there are. Build one per request and reuse it for every row.
+    """
+
+    def __init__(self, keywords_list=None):
+        self.keywords = []
+        # normalized keyword -> keyword as it was given (stripped), for reporting
+        self._original = {}
+        for keyword in keywords_list or []:
+            normalized = normalize_keyword(keyword)
+            if normalized not in self._original:
+                self._original[normalized] = str(keyword).strip()
+                self.keywords.append(normalized)
+
+        self.pattern = None
+        if self.keywords:
+            trie = {}
+            for keyword in self.keywords:
+                node = trie
+                for char in keyword:
+                    node = node.setdefault(char, {})
+                node[''] = True
+            # An empty keyword matches every value, exactly like `'' in text` did.
+            try:
+                self.pattern = re.compile(_trie_pattern(trie))
+            except RecursionError:
+                # Hundreds of keywords that are each a prefix of the next nest as many
+                # groups, more than re can compile; fall back to a plain alternation,
+                # longest first so the longest keyword at a position wins, as in the trie.
+                self.pattern = re.compile('|'.join(
+                    re.escape(keyword) for keyword in sorted(self.keywords, key=len, reverse=True)))
+
+    def __bool__(self):
+        return self.pattern is not None
+
+    def find(self, text):
+        """
+        Returns the keyword found in text (as it was given), or None when no keyword matches.
+        """
+        if self.pattern is None:
+            return None
+        match = self.pattern.search(text.lower())
+        if match is None:
+            return None
+        return self._original[match.group(0)]
@@ -0,0 +1,157 @@
+import re
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from keyword_matcher import KeywordMatcher
+
+# Names are used in URLs and form fields
+KEYWORD_SET_NAME_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9 _.-]{0,63}$')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS keyword_sets (
+    name TEXT PRIMARY KEY,
+    keywords TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def validate_keywords(keywords):
+    """Returns keywords as a list of stripped, non-empty strings; raises ValueError if it is not a list of strings."""
+    if not isinstance(keywords, list) or not all(isinstance(keyword, str) for keyword in keywords):
+        raise ValueError("Keywords must be a list of strings.")
+    return [keyword.strip() for keyword in keywords if keyword.strip()]
+
+
+class KeywordSetStore:
+    """
+    Named keyword lists kept in SQLite, so clients send a set name instead of the
+    whole list with every upload.
+
+    Every update bumps the set's version. Compiled KeywordMatchers are kept in a
+    per-process LRU cache keyed by (name, version): a request only reads the set's
+    row, and the keywords are normalized and compiled once per version and process.
+    Since the version is read from SQLite each time, an update made through any
+    gunicorn worker is picked up by all of them.
+    """
+
+    def __init__(self, db_path, cache_size=32):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self._matchers = OrderedDict()
+        self._lock = threading.Lock()
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(_SCHEMA)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _to_dict(row, with_keywords=True):
+        keywords = json.loads(row['keywords'])
+        keyword_set = {
+            'name': row['name'],
+            'version': row['version'],
+            'keyword_count': len(keywords),
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+        if with_keywords:
+            keyword_set['keywords'] = keywords
+        return keyword_set
+
+    def list(self):
+        """Returns all sets (without their keywords), sorted by name."""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT * FROM keyword_sets ORDER BY name").fetchall()
+        finally:
+            conn.close()
+        return [self._to_dict(row, with_keywords=False) for row in rows]
+
+    def get(self, name):
+        """Returns the set as a dict, or None if there is no such set."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM keyword_sets WHERE name = ?", (name,)).fetchone()
+        finally:
+            conn.close()
+        return self._to_dict(row) if row is not None else None
+
+    def put(self, name, keywords):
+        """
+        Creates the set or replaces its keywords (bumping its version).
+        Returns (keyword_set, created). Raises ValueError for an invalid name or keywords.
+        """
+        if not isinstance(name, str) or not KEYWORD_SET_NAME_PATTERN.match(name):
+            raise ValueError("Invalid keyword set name. Use up to 64 letters, digits, spaces, '_', '.' or '-'.")
+        keywords = validate_keywords(keywords)
+        now = time.time()
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE so two workers updating the same set cannot both read the same version
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("SELECT version FROM keyword_sets WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                conn.execute("INSERT INTO keyword_sets (name, keywords, version, created_at, updated_at) "
+                             "VALUES (?, ?, 1, ?, ?)", (name, json.dumps(keywords, ensure_ascii=False), now, now))
+            else:
+                conn.execute("UPDATE keyword_sets SET keywords = ?, version = version + 1, updated_at = ? "
+                             "WHERE name = ?", (json.dumps(keywords, ensure_ascii=False), now, name))
+            conn.commit()
+            saved = conn.execute("SELECT * FROM keyword_sets WHERE name = ?", (name,)).fetchone()
+        finally:
+            conn.close()
+        return self._to_dict(saved), row is None
+
+    def delete(self, name):
+        """Deletes the set; returns False if there was no such set."""
+        conn = self._connect()
+        try:
+            deleted = conn.execute("DELETE FROM keyword_sets WHERE name = ?", (name,)).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            for key in [key for key in self._matchers if key[0] == name]:
+                del self._matchers[key]
+        return bool(deleted)
+
+    def matcher(self, name):
+        """
+        Returns (keyword_set, KeywordMatcher) for the current version of the set, or
+        (None, None) if there is no such set. The matcher comes from the LRU cache
+        when this process has already compiled this version.
+        """
+        keyword_set = self.get(name)
+        if keyword_set is None:
+            return None, None
+        key = (name, keyword_set['version'])
+        with self._lock:
+            keyword_matcher = self._matchers.get(key)
+            if keyword_matcher is not None:
+                self._matchers.move_to_end(key)
+                return keyword_set, keyword_matcher
+
+        keyword_matcher = KeywordMatcher(keyword_set['keywords'])
+        with self._lock:
+            # Older versions of the set will not be asked for again
+            for old_key in [old_key for old_key in self._matchers if old_key[0] == name]:
+                del self._matchers[old_key]
+            self._matchers[key] = keyword_matcher
+            self._matchers.move_to_end(key)
+            while len(self._matchers) > self.cache_size:
+                self._matchers.popitem(last=False)
+        return keyword_set, keyword_matcher
@@ -0,0 +1,147 @@
+import math
+import sqlite3
+
+# Histogram bucket upper bounds; +Inf is always added
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+ROWS_PER_SECOND_BUCKETS = (1000, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000)
+RSS_BUCKETS = tuple(2 ** power * 1024 * 1024 for power in range(5, 14))  # 32 MB .. 8 GB
+
+# name: (type, help text, buckets for histograms)
+METRICS = {
+    'aceng_stage_duration_seconds': (
+        'histogram', 'Wall time of each processing stage.', DURATION_BUCKETS),
+    'aceng_stage_peak_rss_bytes': (
+        'histogram', 'Peak resident memory of the processing process at the end of each stage.', RSS_BUCKETS),
+    'aceng_processing_duration_seconds': (
+        'histogram', 'Wall time of a whole processing run.', DURATION_BUCKETS),
+    'aceng_processing_rows_per_second': (
+        'histogram', 'Data rows classified per second over a whole processing run.', ROWS_PER_SECOND_BUCKETS),
+    'aceng_rows_processed_total': ('counter', 'Data rows classified.', None),
+    'aceng_rows_excluded_total': ('counter', 'Data rows excluded, by reason kind.', None),
+    'aceng_processing_runs_total': ('counter', 'Processing runs, by outcome.', None),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metric_samples (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels)
+)
+"""
+
+
+def _format_labels(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+
+def _format_bound(bound):
+    return '+Inf' if math.isinf(bound) else repr(float(bound))
+
+
+class ProcessingMetrics:
+    """
+    Aggregated processing metrics shared by every process that handles uploads.
+
+    Runs are folded into cumulative histogram buckets and counters kept in SQLite,
+    so gunicorn workers and background job processes all add to the same numbers
+    and /metrics shows the total whichever worker answers it. Only the aggregates
+    are stored: the database stays a few hundred rows however many files go through.
+    Per-keyword counts stay in the per-request summary; keywords are user input and
+    would make unbounded label sets here.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(_SCHEMA)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _add(self, conn, name, labels, amount):
+        conn.execute(
+            "INSERT INTO metric_samples (name, labels, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value",
+            (name, _format_labels(labels), amount))
+
+    def _observe(self, conn, name, labels, value):
+        if value is None:
+            return
+        buckets = METRICS[name][2]
+        for bound in buckets + (math.inf,):
+            # Every bucket gets a row (possibly 0) so each series lists all of its buckets
+            self._add(conn, f'{name}_bucket', labels + (('le', _format_bound(bound)),), int(value <= bound))
+        self._add(conn, f'{name}_sum', labels, value)
+        self._add(conn, f'{name}_count', labels, 1)
+
+    def record_run(self, summary):
+        """Adds a successful process_data_excel run, given its summary dict."""
+        conn = self._connect()
+        try:
+            for stage, timing in summary.get('stages', {}).items():
+                labels = (('stage', stage),)
+                self._observe(conn, 'aceng_stage_duration_seconds', labels, timing['seconds'])
+                self._observe(conn, 'aceng_stage_peak_rss_bytes', labels, timing['peak_rss_bytes'])
+            total_seconds = summary.get('total_seconds')
+            self._observe(conn, 'aceng_processing_duration_seconds', (), total_seconds)
+            if total_seconds:
+                self._observe(conn, 'aceng_processing_rows_per_second', (),
+                              summary['rows_processed'] / total_seconds)
+            self._add(conn, 'aceng_rows_processed_total', (), summary.get('rows_processed', 0))
+            self._add(conn, 'aceng_rows_excluded_total', (('reason', 'keyword'),),
+                      sum(summary.get('excluded_by_keyword', {}).values()))
+            self._add(conn, 'aceng_rows_excluded_total', (('reason', 'foreign_characters'),),
+                      summary.get('excluded_foreign_characters', 0))
+            self._add(conn, 'aceng_rows_excluded_total', (('reason', 'duplicate'),),
+                      summary.get('excluded_duplicates', 0))
+            self._add(conn, 'aceng_processing_runs_total', (('outcome', 'success'),), 1)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def record_failure(self):
+        """Counts a processing run that raised."""
+        conn = self._connect()
+        try:
+            self._add(conn, 'aceng_processing_runs_total', (('outcome', 'failure'),), 1)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def render(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT name, labels, value FROM metric_samples").fetchall()
+        finally:
+            conn.close()
+
+        samples = {}
+        for name, labels, value in rows:
+            samples.setdefault(name, []).append((labels, value))
+
+        def sort_key(sample):
+            # Buckets in ascending le order (+Inf last), other labels alphabetically
+            labels = sample[0]
+            if 'le="' in labels:
+                le = labels.rsplit('le="', 1)[1].rstrip('"')
+                return labels.rsplit('le="', 1)[0], float(le)
+            return labels, 0.0
+
+        lines = []
+        for name, (metric_type, help_text, _) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            series = [name] if metric_type == 'counter' else [f'{name}_bucket', f'{name}_sum', f'{name}_count']
+            for series_name in series:
+                for labels, value in sorted(samples.get(series_name, []), key=sort_key):
+                    label_text = f'{{{labels}}}' if labels else ''
+                    number = int(value) if float(value).is_integer() else value
+                    lines.append(f'{series_name}{label_text} {number}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+
+from keyword_matcher import normalize_keyword
+
+# Bytes read at a time when hashing uploads
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_stream(stream):
+    """Returns the sha256 hex digest of a binary stream and rewinds it to the start."""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def staging_path(output_path):
+    """
+    Per-run path to write an output to before publish_outputs moves it to
+    output_path. Output names only depend on the cache key, so two runs of the
+    same upload must not write the final files directly.
+    """
+    folder, name = os.path.split(output_path)
+    return os.path.join(folder, f"tmp_{uuid.uuid4().hex[:16]}_{name}")
+
+
+def publish_outputs(outputs):
+    """
+    Moves each (staged path, final path) pair into place. os.replace is atomic, so
+    a download of the previous file keeps reading the old one until it is done.
+    """
+    for staged_path, final_path in outputs:
+        os.replace(staged_path, final_path)
+
+
+def discard_outputs(outputs):
+    """Deletes the staged files of a failed run."""
+    for staged_path, _ in outputs:
+        try:
+            os.remove(staged_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error deleting staged file {staged_path}: {e}")
+
+
+def cache_key(file_digest, keywords_list, input_sheet_name, processor_version, options=None):
+    """
+    Builds the cache key of a processing request.
+
+    Keywords are normalized and sorted, since their order and case do not change
+    which rows are excluded. options holds any other settings that change the
+    output files (reason column, ...); when the reason column is on the keywords
+    are kept as given, because the reason text quotes them.
+    """
+    options = dict(options or {})
+    if options.get('reason_column'):
+        keywords = [str(keyword).strip() for keyword in keywords_list]
+    else:
+        keywords = sorted({normalize_keyword(keyword) for keyword in keywords_list})
+    material = json.dumps({
+        'file': file_digest,
+        'keywords': keywords,
+        'sheet': input_sheet_name,
+        'version': processor_version,
+        'options': options,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of processed outputs in the processed files folder.
+
+    Each entry is a small JSON file in <folder>/.cache/<key>.json that lists the
+    output files it owns and the result returned to the client. Entries expire
+    after max_age seconds, and the least recently used ones are evicted once the
+    files they own exceed max_bytes in total. All state is on disk, so every
+    gunicorn worker (and background job process) shares the same cache.
+    """
+
+    def __init__(self, folder, max_bytes=2 * 1024 ** 3, max_age=24 * 3600):
+        self.folder = folder
+        self.index_folder = os.path.join(folder, '.cache')
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(self.index_folder, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.index_folder, f"{key}.json")
+
+    def _load(self, entry_path):
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def output_name(self, key, filename, prefix):
+        """Name of a cached output file, e.g. cleaned_<key prefix>_<filename>."""
+        return f"{prefix}_{key[:16]}_{filename}"
+
+    def lookup(self, key):
+        """
+        Returns the stored result for key, or None on a miss (or if its files are gone).
+        A hit refreshes the entry's last-used time.
+        """
+        entry_path = self._entry_path(key)
+        entry = self._load(entry_path)
+        if entry is None:
+            return None
+        if time.time() - entry['created_at'] > self.max_age or \
+                not all(os.path.exists(os.path.join(self.folder, name)) for name in entry['files']):
+            self._remove(entry_path, entry)
+            return None
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return entry['result']
+
+    def store(self, key, files, result):
+        """Records that the given output files (names inside folder) hold result for key, then evicts."""
+        entry = {
+            'key': key,
+            'files': list(files),
+            'result': result,
+            'created_at': time.time(),
+        }
+        tmp_path = self._entry_path(key) + f".{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._entry_path(key))
+        # The caller is about to hand out links to these files, so they must survive this eviction
+        self.evict(keep=key)
+
+    def _remove(self, entry_path, entry):
+        for name in entry.get('files', []):
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error deleting cached file {name}: {e}")
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self, keep=None):
+        """
+        Removes expired entries, then least recently used ones until the cache fits
+        in max_bytes. The entry of key keep is never removed, even if it alone is
+        larger than max_bytes.
+        """
+        now = time.time()
+        live = []
+        for name in os.listdir(self.index_folder):
+            if not name.endswith('.json'):
+                continue
+            entry_path = os.path.join(self.index_folder, name)
+            entry = self._load(entry_path)
+            if entry is None:
+                continue
+            if now - entry['created_at'] > self.max_age:
+                self._remove(entry_path, entry)
+                continue
+            size = 0
+            for file_name in entry['files']:
+                try:
+                    size += os.path.getsize(os.path.join(self.folder, file_name))
+                except OSError:
+                    pass
+            try:
+                last_used = os.path.getmtime(entry_path)
+            except OSError:
+                continue
+            live.append((last_used, size, entry_path, entry))
+
+        total = sum(size for _, size, _, _ in live)
+        for last_used, size, entry_path, entry in sorted(live, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            if entry.get('key') == keep:
+                continue
+            self._remove(entry_path, entry)
+            total -= size
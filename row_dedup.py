@@ -0,0 +1,76 @@
+import hashlib
+from array import array
+
+# Empty slot marker; a digest that happens to be 0 is stored as 1 instead
+_EMPTY = 0
+# The table doubles once it is more than half full
+_MAX_LOAD = 0.5
+_MIN_SLOTS = 1024
+
+
+def normalize_konten(value):
+    """Dedup key of a KONTEN text: lowercase with runs of whitespace collapsed to one space."""
+    return ' '.join(str(value).lower().split())
+
+
+def key_digest(key):
+    """64-bit digest of a dedup key (a str)."""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+
+class DigestIndex:
+    """
+    Set of 64-bit key digests for spotting repeated rows in one pass.
+
+    Only the digest of each key is kept, in an open-addressing table backed by an
+    array('Q'): 8 bytes per slot, at most half the slots in use, so about 16 bytes
+    per distinct key (16 MB for 1M rows) instead of the key strings themselves.
+    Two different keys share a digest with probability about n^2 / 2^65 (below
+    1e-7 for 1M rows), in which case the later row counts as a duplicate.
+    """
+
+    def __init__(self, expected_keys=0):
+        size = _MIN_SLOTS
+        while size * _MAX_LOAD < expected_keys:
+            size *= 2
+        self._slots = array('Q', bytes(8 * size))
+        self._mask = size - 1
+        self._limit = int(size * _MAX_LOAD)
+        self.count = 0
+
+    @property
+    def nbytes(self):
+        """Memory held by the table."""
+        return len(self._slots) * self._slots.itemsize
+
+    def add(self, key):
+        """Adds key (a str) and returns True if it was new, False if it was seen before."""
+        digest = key_digest(key)
+        slots = self._slots
+        mask = self._mask
+        slot = digest & mask
+        while True:
+            stored = slots[slot]
+            if stored == _EMPTY:
+                break
+            if stored == digest:
+                return False
+            slot = (slot + 1) & mask
+        slots[slot] = digest
+        self.count += 1
+        if self.count > self._limit:
+            self._grow()
+        return True
+
+    def _grow(self):
+        old_slots = self._slots
+        size = len(old_slots) * 2
+        self._slots = slots = array('Q', bytes(8 * size))
+        self._mask = mask = size - 1
+        self._limit = int(size * _MAX_LOAD)
+        for digest in old_slots:
+            if digest != _EMPTY:
+                slot = digest & mask
+                while slots[slot] != _EMPTY:
+                    slot = (slot + 1) & mask
+                slots[slot] = digest
@@ -0,0 +1,78 @@
+import re
+
+# Unicode blocks of the scripts that can be excluded, by name
+SCRIPT_RANGES = {
+    'cjk': ((0x4E00, 0x9FFF),),
+    'hangul': ((0xAC00, 0xD7AF),),
+    'devanagari': ((0x0900, 0x097F),),
+    'arabic': ((0x0600, 0x06FF),),
+    'cyrillic': ((0x0400, 0x04FF),),
+    'japanese_kana': ((0x3040, 0x309F), (0x30A0, 0x30FF)),
+    'thai': ((0x0E00, 0x0E7F),),
+    'hebrew': ((0x0590, 0x05FF),),
+    'greek': ((0x0370, 0x03FF),),
+}
+
+# The scripts excluded when a request does not choose any
+DEFAULT_SCRIPTS = ('cjk', 'hangul', 'devanagari', 'arabic', 'cyrillic')
+
+
+def _character_class(scripts):
+    ranges = sorted(code_range for script in scripts for code_range in SCRIPT_RANGES[script])
+    return '[' + ''.join(f'\\U{start:08X}-\\U{end:08X}' for start, end in ranges) + ']'
+
+
+class ScriptDetector:
+    """
+    Precompiled detector for characters of the excluded (foreign) scripts.
+
+    The code point ranges of the chosen scripts are compiled once into a single
+    character class, which the regex engine checks per character with a range
+    table in C. Text that is pure ASCII can never contain them, and str.isascii()
+    answers that without scanning (CPython keeps the flag on the string), so the
+    common all-latin KONTEN value costs nothing. Any other text goes straight to
+    the compiled regex. Callers that check every row can test str.isascii()
+    themselves and call search, the regex's own bound method, so a non-ASCII value
+    costs exactly one regex search and no Python call in between.
+
+    With min_ratio, text only counts as foreign when at least that share of its
+    characters belong to the chosen scripts (e.g. 0.3 keeps Indonesian posts that
+    quote a single foreign word). Build one per request and reuse it for every row.
+    """
+
+    def __init__(self, scripts=DEFAULT_SCRIPTS, min_ratio=None):
+        scripts = tuple(dict.fromkeys(scripts))
+        unknown = [script for script in scripts if script not in SCRIPT_RANGES]
+        if unknown:
+            raise ValueError(f"Unknown script(s) {', '.join(map(repr, unknown))}. "
+                             f"Expected any of: {', '.join(SCRIPT_RANGES)}.")
+        if min_ratio is not None and not 0 < min_ratio <= 1:
+            raise ValueError(f"min_ratio must be in (0, 1], got {min_ratio!r}.")
+        self.scripts = scripts
+        self.min_ratio = min_ratio
+        self.pattern = re.compile(_character_class(scripts)) if scripts else None
+        # Runs of foreign characters, so counting needs one match per run instead of per character
+        self._run_pattern = re.compile(_character_class(scripts) + '+') if scripts else None
+        # pattern.search when a single foreign character makes text foreign (no min_ratio), else None
+        self.search = self.pattern.search if scripts and min_ratio is None else None
+
+    def __bool__(self):
+        return self.pattern is not None
+
+    def foreign_characters(self, text):
+        """Number of characters of text that belong to the chosen scripts."""
+        if self.pattern is None or text.isascii():
+            return 0
+        # Most texts have none: find the first one with the cheaper single-character search
+        first = self.pattern.search(text)
+        if first is None:
+            return 0
+        return sum(map(len, self._run_pattern.findall(text, first.start())))
+
+    def is_foreign(self, text):
+        """True when text should be excluded for its foreign characters."""
+        if text.isascii() or self.pattern is None:
+            return False
+        if self.min_ratio is None:
+            return self.pattern.search(text) is not None
+        return self.foreign_characters(text) >= self.min_ratio * len(text)
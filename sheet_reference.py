@@ -0,0 +1,178 @@
+"""
+Copies worksheets between xlsx files at the XML level, without building cell objects.
+
+Used by excel_processor for auxiliary_sheets='reference': the output workbook gets an
+empty placeholder sheet, and after it is saved the placeholder's XML part is swapped
+for the source sheet's raw XML. Only the bits that point into the source workbook are
+rewritten on the way through, with regular expressions rather than an XML parse:
+
+- shared string cells (t="s") become inline strings, since the output has its own
+  shared string table;
+- style ids (s="N" on cells and rows, style="N" on columns) are mapped to styles
+  registered in the output that carry the same number format (fonts, fills and
+  borders are not copied, as in the normal copy);
+- relationship ids (r:id, e.g. on pageSetup) are removed, since the output has no
+  matching relationship parts;
+- elements that need relationship parts or styles the output does not have
+  (hyperlinks, drawings, tables, conditional formatting, extensions) are dropped.
+"""
+import os
+import re
+import shutil
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+SPREADSHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+RELATIONSHIP_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_RELATIONSHIP_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+_CELL_RE = re.compile(rb'<c\b([^>]*?)(/>|>(.*?)</c>)', re.S)
+_ATTR_RE = re.compile(rb'([\w:]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_VALUE_RE = re.compile(rb'<v>([^<]*)</v>')
+_ROW_RE = re.compile(rb'<row\b([^>]*?)(/?)>')
+_COL_RE = re.compile(rb'<col\b([^>]*?)(/?)>')
+_REL_ID_RE = re.compile(rb'\sr:id\s*=\s*(?:"[^"]*"|\'[^\']*\')')
+_TAB_SELECTED_RE = re.compile(rb'\stabSelected\s*=\s*(["\'])(?:1|true)\1')
+_DROPPED_ELEMENTS_RE = re.compile(
+    rb'<(hyperlinks|conditionalFormatting|tableParts|oleObjects|controls|extLst)\b[^>]*?(?:/>|>.*?</\1>)'
+    rb'|<(?:drawing|legacyDrawing|legacyDrawingHF|picture)\b[^>]*?/>',
+    re.S
+)
+
+
+def is_referenceable(sheet_xml_head):
+    """
+    True when a sheet part uses the default (unprefixed) SpreadsheetML namespace,
+    which is what the rewrite expects. sheet_xml_head is the first bytes of the part.
+    """
+    return b'<worksheet' in sheet_xml_head
+
+
+def sheet_part_paths(archive):
+    """Maps sheet titles to their worksheet part paths inside an open xlsx ZipFile."""
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    targets = {}
+    for rel in rels.iter(f'{{{PACKAGE_RELATIONSHIP_NS}}}Relationship'):
+        target = rel.get('Target')
+        if target.startswith('/'):
+            target = target.lstrip('/')
+        else:
+            target = posixpath.normpath(posixpath.join('xl', target))
+        targets[rel.get('Id')] = target
+
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    paths = {}
+    for sheet in workbook.iter(f'{{{SPREADSHEET_NS}}}sheet'):
+        rel_id = sheet.get(f'{{{RELATIONSHIP_NS}}}id')
+        if rel_id in targets:
+            paths[sheet.get('name')] = targets[rel_id]
+    return paths
+
+
+def _attributes(start_tag):
+    """
+    (name, value) pairs of the attributes of a start tag. XML allows single or
+    double quotes; values come back ready to be written between double quotes.
+    """
+    attrs = []
+    for match in _ATTR_RE.finditer(start_tag):
+        double_quoted, single_quoted = match.group(2), match.group(3)
+        value = double_quoted if double_quoted is not None else single_quoted.replace(b'"', b'&quot;')
+        attrs.append((match.group(1), value))
+    return attrs
+
+
+def _map_style(value, style_map):
+    """Output style id (bytes) for a source style id, or None for the default style."""
+    mapped = style_map.get(value.decode('ascii'), '0')
+    return None if mapped == '0' else mapped.encode('ascii')
+
+
+def _rewrite_styled_element(match, tag, style_attr, style_map):
+    """
+    Maps the style attribute of a <row> or <col> start tag. When the style maps to
+    the default one it is dropped together with customFormat, which needs a style.
+    """
+    attrs = _attributes(match.group(1))
+    style = next((value for name, value in attrs if name == style_attr), None)
+    mapped = _map_style(style, style_map) if style is not None else None
+    new_attrs = []
+    for name, value in attrs:
+        if name == style_attr:
+            if mapped is not None:
+                new_attrs.append(name + b'="' + mapped + b'"')
+        elif name == b'customFormat' and mapped is None:
+            continue
+        else:
+            new_attrs.append(name + b'="' + value + b'"')
+    start = b'<' + tag + b' ' + b' '.join(new_attrs) if new_attrs else b'<' + tag
+    return start + match.group(2) + b'>'
+
+
+def rewrite_sheet_xml(sheet_xml, shared_strings, style_map):
+    """
+    Rewrites a source worksheet part so it is valid inside the output workbook.
+    style_map maps source style ids to output style ids (both as str).
+    """
+    def rewrite_cell(match):
+        attrs = _attributes(match.group(1))
+        body = match.group(3)
+        new_attrs = []
+        is_shared_string = False
+        for name, value in attrs:
+            if name == b's':
+                mapped = _map_style(value, style_map)
+                if mapped is not None:
+                    new_attrs.append(b's="' + mapped + b'"')
+            elif name == b't':
+                if value == b's':
+                    is_shared_string = True
+                    new_attrs.append(b't="inlineStr"')
+                else:
+                    new_attrs.append(name + b'="' + value + b'"')
+            elif name in (b'cm', b'vm'):
+                # cell/value metadata live in a part the output does not have
+                continue
+            else:
+                new_attrs.append(name + b'="' + value + b'"')
+
+        start = b'<c ' + b' '.join(new_attrs) if new_attrs else b'<c'
+        if body is None:
+            return start + b'/>'
+        if is_shared_string:
+            value = _VALUE_RE.search(body)
+            text = ''
+            if value is not None:
+                text = str(shared_strings[int(value.group(1))] or '')
+            body = b'<is><t xml:space="preserve">' + escape(text).encode('utf-8') + b'</t></is>'
+        return start + b'>' + body + b'</c>'
+
+    sheet_xml = _DROPPED_ELEMENTS_RE.sub(b'', sheet_xml)
+    sheet_xml = _TAB_SELECTED_RE.sub(b'', sheet_xml)
+    sheet_xml = _REL_ID_RE.sub(b'', sheet_xml)
+    sheet_xml = _ROW_RE.sub(lambda match: _rewrite_styled_element(match, b'row', b's', style_map), sheet_xml)
+    sheet_xml = _COL_RE.sub(lambda match: _rewrite_styled_element(match, b'col', b'style', style_map), sheet_xml)
+    return _CELL_RE.sub(rewrite_cell, sheet_xml)
+
+
+def replace_sheet_parts(xlsx_path, replacements):
+    """
+    Replaces the XML of the named sheets of a saved xlsx file.
+    replacements maps sheet titles to the new worksheet XML (bytes).
+    """
+    if not replacements:
+        return
+    tmp_path = f"{xlsx_path}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(xlsx_path) as source:
+        part_paths = sheet_part_paths(source)
+        new_parts = {part_paths[title]: xml for title, xml in replacements.items() if title in part_paths}
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as target:
+            for info in source.infolist():
+                if info.filename in new_parts:
+                    target.writestr(info, new_parts[info.filename])
+                else:
+                    with source.open(info) as src, target.open(info, 'w') as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(tmp_path, xlsx_path)
@@ -0,0 +1,118 @@
+import os
+import sys
+import datetime
+
+import openpyxl
+import pytest
+
+# The modules live at the repository root, next to app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import excel_processor  # noqa: E402
+
+# KONTEN values of the standard test sheet, used in turn: keyword hits ('gopay',
+# 'dijual'), clean rows, a foreign script, a value whose lowercase is longer ('İ')
+# and an empty cell. The long clean row is the fourth.
+KONTEN_TEXTS = ('gopay promo hari ini', 'clean row', '你好 semua', 'a much longer clean row ' * 3,
+                'dijual murah', 'İstanbul trip', None)
+
+
+def write_workbook(path, sheets):
+    """Saves a workbook with a sheet per title in sheets (a dict of title: rows), in order."""
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for title, rows in sheets.items():
+        sheet = workbook.create_sheet(title)
+        for row in rows:
+            sheet.append(row)
+    workbook.save(path)
+
+
+def write_konten_workbook(path, rows=120, short_row=False):
+    """
+    Saves the standard test workbook: a 'Sheet1' with UUID, KONTEN, TANGGAL (a date,
+    formatted dd/mm/yyyy) and SHARE (a percentage) columns, followed by a small
+    'Lookup' sheet. short_row adds a last row without a KONTEN cell.
+    """
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'Sheet1'
+    sheet.append(['UUID', 'KONTEN', 'TANGGAL', 'SHARE'])
+    for index in range(rows):
+        sheet.append([f'id-{index}', KONTEN_TEXTS[index % len(KONTEN_TEXTS)],
+                      datetime.datetime(2024, 1, 1) + datetime.timedelta(days=index), index / rows])
+        sheet.cell(row=index + 2, column=3).number_format = 'dd/mm/yyyy'
+        sheet.cell(row=index + 2, column=4).number_format = '0.0%'
+    if short_row:
+        sheet.append(['short row'])
+    workbook.create_sheet('Lookup').append(['code', 1])
+    workbook.save(path)
+
+
+def workbook_contents(path):
+    """{sheet title: (cells as (value, number format) rows, {column letter: width})} of an xlsx output."""
+    workbook = openpyxl.load_workbook(path)
+    contents = {}
+    for sheet in workbook.worksheets:
+        cells = [[(cell.value, cell.number_format) for cell in row] for row in sheet.iter_rows()]
+        widths = {letter: dimension.width for letter, dimension in sheet.column_dimensions.items()
+                  if dimension.width}
+        contents[sheet.title] = cells, widths
+    return contents
+
+
+def sheet_rows(path, title=None, min_row=1):
+    """Value tuples of a sheet of an xlsx output (the first sheet by default)."""
+    workbook = openpyxl.load_workbook(path)
+    sheet = workbook[title] if title else workbook.worksheets[0]
+    return list(sheet.iter_rows(min_row=min_row, values_only=True))
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """
+    The app module (app.py), imported once with its upload and output folders and
+    its SQLite databases in a temporary directory, no memory budget and one job worker.
+    """
+    base = tmp_path_factory.mktemp('app')
+    environment = {
+        'ACENG_UPLOAD_FOLDER': base / 'uploads',
+        'ACENG_PROCESSED_FOLDER': base / 'processed_files',
+        'ACENG_JOBS_DB': base / 'jobs.sqlite3',
+        'ACENG_KEYWORD_SETS_DB': base / 'keyword_sets.sqlite3',
+        'ACENG_METRICS_DB': base / 'metrics.sqlite3',
+        'ACENG_ADMISSION_DB': base / 'admission.sqlite3',
+        'ACENG_MEMORY_BUDGET_MB': 0,
+        'ACENG_JOB_WORKERS': 1,
+    }
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        for name, value in environment.items():
+            monkeypatch.setenv(name, str(value))
+        import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    """A Flask test client of the app."""
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def run_processor(tmp_path):
+    """
+    Returns run(name='run', build=write_konten_workbook, keywords=('gopay',), **options):
+    writes a source workbook with build(path), runs process_data_excel on it with the
+    options and returns (summary, cleaned path, excluded path). Outputs are named after
+    name and carry the output format as extension.
+    """
+    def run(name='run', build=write_konten_workbook, keywords=('gopay',), **options):
+        source = tmp_path / f'{name}_source.xlsx'
+        build(source)
+        extension = options.get('output_format', 'xlsx')
+        cleaned, excluded = tmp_path / f'{name}_cleaned.{extension}', tmp_path / f'{name}_excluded.{extension}'
+        summary = excel_processor.process_data_excel(str(source), str(cleaned), str(excluded),
+                                                     keywords_list=list(keywords), **options)
+        return summary, cleaned, excluded
+
+    return run
@@ -0,0 +1,115 @@
+import os
+import time
+import multiprocessing
+
+import pytest
+
+import admission
+import jobs
+
+MB = 2 ** 20
+
+
+def _crashing_runner(progress_callback, **kwargs):
+    os._exit(9)
+
+
+def _wait_failed(job_queue, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if job_queue.get(job_id)['status'] == jobs.JOB_FAILED:
+            return
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} did not fail")
+
+
+def test_killed_job_frees_its_budget(tmp_path):
+    controller = admission.AdmissionController(str(tmp_path / 'admission.sqlite3'), 100 * MB)
+    job_queue = jobs.JobQueue(str(tmp_path / 'jobs.sqlite3'), max_workers=1)
+
+    ticket = controller.admit(80 * MB)
+    job_id = job_queue.submit({}, runner=_crashing_runner, admission=controller, admission_ticket=ticket)
+    _wait_failed(job_queue, job_id)
+
+    # The ticket was started by the killed pool process, not by this one
+    assert controller.start(controller.admit(80 * MB), timeout=10)
+
+
+def _slow_crashing_runner(progress_callback, **kwargs):
+    # Gives the test time to queue another job behind this one
+    time.sleep(1)
+    os._exit(9)
+
+
+def test_jobs_queued_in_a_broken_pool_free_their_tickets(tmp_path):
+    controller = admission.AdmissionController(str(tmp_path / 'admission.sqlite3'), 100 * MB,
+                                               max_queued_bytes=100 * MB)
+    job_queue = jobs.JobQueue(str(tmp_path / 'jobs.sqlite3'), max_workers=1)
+
+    crashing_id = job_queue.submit({}, runner=_slow_crashing_runner, admission=controller,
+                                   admission_ticket=controller.admit(20 * MB))
+    queued_id = job_queue.submit({}, runner=_crashing_runner, admission=controller,
+                                 admission_ticket=controller.admit(80 * MB))
+    _wait_failed(job_queue, crashing_id)
+    _wait_failed(job_queue, queued_id)
+
+    # The queued job never reached run_job; its ticket was waiting, owned by this live process
+    assert controller.usage()['waiting'] == 0
+    assert controller.admit(100 * MB)
+
+
+def test_running_ticket_holds_the_budget(tmp_path):
+    controller = admission.AdmissionController(str(tmp_path / 'admission.sqlite3'), 100 * MB, poll_interval=0.05)
+    running = controller.admit(80 * MB)
+    assert controller.start(running)
+
+    waiting = controller.admit(80 * MB)
+    assert not controller.start(waiting, timeout=0.2)
+    controller.release(running)
+    assert controller.start(waiting, timeout=0.2)
+    assert controller.usage()['running_bytes'] == 80 * MB
+
+
+def _admit_in_child(db_path, queue):
+    queue.put(admission.AdmissionController(db_path, 100 * MB).admit(80 * MB))
+
+
+def test_ticket_dropped_as_stale_still_waits_for_room(tmp_path):
+    db_path = str(tmp_path / 'admission.sqlite3')
+    controller = admission.AdmissionController(db_path, 100 * MB, poll_interval=0.05)
+    # A ticket whose admitting process died before the job started
+    queue = multiprocessing.Queue()
+    child = multiprocessing.Process(target=_admit_in_child, args=(db_path, queue))
+    child.start()
+    orphan = queue.get(timeout=10)
+    child.join()
+
+    running = controller.admit(80 * MB)
+    assert controller.start(running)
+    assert not controller.start(orphan, timeout=0.2)
+    assert controller.usage()['waiting_bytes'] == 80 * MB
+
+    controller.release(running)
+    assert controller.start(orphan, timeout=0.2)
+    assert controller.usage()['running_bytes'] == 80 * MB
+
+
+def test_admit_rejects_jobs_that_cannot_fit(tmp_path):
+    controller = admission.AdmissionController(str(tmp_path / 'admission.sqlite3'), 100 * MB,
+                                               max_queued_bytes=100 * MB)
+    with pytest.raises(admission.AdmissionRejected) as too_large:
+        controller.admit(101 * MB)
+    assert too_large.value.status == 503
+
+    controller.admit(80 * MB)
+    with pytest.raises(admission.AdmissionRejected) as queue_full:
+        controller.admit(80 * MB)
+    assert queue_full.value.status == 429
+
+
+def test_disabled_controller_admits_everything(tmp_path):
+    controller = admission.AdmissionController(str(tmp_path / 'admission.sqlite3'), None)
+    ticket = controller.admit(10 ** 12)
+    assert ticket is None
+    assert controller.start(ticket, timeout=0)
+    controller.release(ticket)
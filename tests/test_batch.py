@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import zipfile
+import subprocess
+
+import pytest
+
+import batch
+from conftest import sheet_rows, write_konten_workbook
+
+
+def _zip_workbooks(zip_path, members, tmp_path):
+    """Zips a fresh standard workbook under each member name (other names get text content)."""
+    source = tmp_path / 'member.xlsx'
+    write_konten_workbook(source, rows=12)
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        for member in members:
+            if member.endswith('.xlsx'):
+                archive.write(source, member)
+            else:
+                archive.writestr(member, 'not a workbook')
+
+
+def test_batch_imports_without_flask():
+    repo_root = os.path.dirname(os.path.abspath(batch.__file__))
+    code = "import sys; sys.modules['flask'] = sys.modules['werkzeug'] = None; import batch"
+    subprocess.run([sys.executable, '-c', code], cwd=repo_root, check=True)
+
+
+def test_extract_flattens_folders_and_skips_other_members(tmp_path):
+    zip_path = tmp_path / 'in.zip'
+    _zip_workbooks(zip_path, ['a.xlsx', 'sub/b.xlsx', 'other/a.xlsx', 'notes.txt', '__MACOSX/sub/b.xlsx',
+                              'sub/~$b.xlsx', 'folder/'], tmp_path)
+    destination = tmp_path / 'out'
+    destination.mkdir()
+
+    workbooks = batch.extract_workbooks(str(zip_path), str(destination))
+
+    assert [name for name, _ in workbooks] == ['a.xlsx', 'b.xlsx', '2_a.xlsx']
+    assert sorted(os.listdir(destination)) == ['2_a.xlsx', 'a.xlsx', 'b.xlsx']
+    assert all(os.path.dirname(path) == str(destination) for _, path in workbooks)
+
+
+def test_extract_keeps_member_names_inside_the_destination(tmp_path):
+    zip_path = tmp_path / 'in.zip'
+    _zip_workbooks(zip_path, ['../../evil.xlsx', '/etc/abs.xlsx', '..\\..\\win.xlsx', 'sp ace;$(x).xlsx',
+                              'dir/..xlsx'], tmp_path)
+    destination = tmp_path / 'out'
+    destination.mkdir()
+
+    workbooks = batch.extract_workbooks(str(zip_path), str(destination))
+
+    assert [name for name, _ in workbooks] == ['evil.xlsx', 'abs.xlsx', 'win.xlsx', 'sp_ace_x_.xlsx',
+                                               'workbook.xlsx']
+    assert sorted(os.listdir(tmp_path)) == ['in.zip', 'member.xlsx', 'out']
+
+
+def test_extract_rejects_bad_archives(tmp_path):
+    not_a_zip = tmp_path / 'in.zip'
+    not_a_zip.write_bytes(b'plain bytes')
+    with pytest.raises(ValueError, match='not a valid zip'):
+        batch.extract_workbooks(str(not_a_zip), str(tmp_path))
+
+    _zip_workbooks(not_a_zip, ['notes.txt'], tmp_path)
+    with pytest.raises(ValueError, match='no .xlsx workbooks'):
+        batch.extract_workbooks(str(not_a_zip), str(tmp_path))
+
+    _zip_workbooks(not_a_zip, ['a.xlsx'], tmp_path)
+    with pytest.raises(ValueError, match='more than the limit'):
+        batch.extract_workbooks(str(not_a_zip), str(tmp_path), max_total_bytes=10)
+
+
+def test_failing_workbook_is_recorded_and_the_others_are_processed(tmp_path):
+    good, broken = tmp_path / 'good.xlsx', tmp_path / 'broken.xlsx'
+    write_konten_workbook(good, rows=14)
+    broken.write_bytes(b'not really a workbook')
+    output_dir = tmp_path / 'output'
+    output_dir.mkdir()
+
+    manifest = batch.process_batch([('good.xlsx', str(good)), ('broken.xlsx', str(broken))], str(output_dir),
+                                   ['gopay'], max_workers=2)
+
+    assert [(entry['name'], entry['status']) for entry in manifest['files']] == [
+        ('broken.xlsx', 'failed'), ('good.xlsx', 'done')]
+    assert manifest['files'][0]['error']
+    assert (manifest['files_total'], manifest['files_done'], manifest['files_failed']) == (2, 1, 1)
+    assert manifest['rows_processed'] == manifest['files'][1]['rows_processed'] == 14
+    assert sorted(os.listdir(output_dir)) == ['cleaned_good.xlsx', 'excluded_good.xlsx']
+
+
+@pytest.mark.parametrize('output_format', ['xlsx', 'csv'])
+def test_result_zip_holds_the_outputs_and_the_manifest(tmp_path, output_format):
+    zip_path = tmp_path / 'in.zip'
+    _zip_workbooks(zip_path, ['first.xlsx', 'nested/second.xlsx'], tmp_path)
+    result_path = tmp_path / 'result.zip'
+
+    manifest = batch.run_batch(str(zip_path), str(result_path), ['gopay'], max_workers=2,
+                               output_format=output_format)
+
+    assert not zip_path.exists()
+    with zipfile.ZipFile(result_path) as result:
+        assert sorted(result.namelist()) == sorted([
+            batch.MANIFEST_NAME,
+            *(batch.output_name(prefix, name, output_format)
+              for prefix in ('cleaned', 'excluded') for name in ('first.xlsx', 'second.xlsx'))])
+        stored = json.loads(result.read(batch.MANIFEST_NAME))
+        if output_format == 'xlsx':
+            result.extract('cleaned_first.xlsx', tmp_path)
+            assert sheet_rows(tmp_path / 'cleaned_first.xlsx')[0] == ('UUID', 'KONTEN', 'TANGGAL', 'SHARE')
+
+    assert stored['keywords'] == ['gopay']
+    assert stored['options'] == {'output_format': output_format}
+    assert (stored['files_total'], stored['files_done'], stored['files_failed']) == (2, 2, 0)
+    assert stored['rows_processed'] == manifest['rows_processed'] == 24
+    assert stored['rows_kept'] + stored['rows_excluded'] == 24
+    first = stored['files'][0]
+    assert first['name'] == 'first.xlsx'
+    assert first['cleaned_file'] == batch.output_name('cleaned', 'first.xlsx', output_format)
+    assert first['excluded_by_keyword'] == {'gopay': 2}
@@ -0,0 +1,54 @@
+import os
+import time
+
+from janitor import FileJanitor
+
+
+def _write(path, size, age):
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _janitor(tmp_path, **kwargs):
+    processed, uploads = tmp_path / 'processed', tmp_path / 'uploads'
+    processed.mkdir()
+    uploads.mkdir()
+    settings = dict(max_age=3600, max_bytes=10_000, upload_max_age=3600, min_age=600)
+    settings.update(kwargs)
+    return FileJanitor(str(processed), str(uploads), str(tmp_path / 'janitor.lock'), **settings), processed, uploads
+
+
+def test_sweep_removes_old_outputs_then_the_oldest_over_quota(tmp_path):
+    janitor, processed, _ = _janitor(tmp_path)
+    _write(processed / 'expired.xlsx', 100, age=7200)
+    _write(processed / 'oldest.xlsx', 6000, age=3000)
+    _write(processed / 'older.xlsx', 3000, age=2000)
+    _write(processed / 'recent.xlsx', 6000, age=60)  # may still be written, never removed for the quota
+    _write(processed / '.keep', 100, age=7200)
+
+    summary = janitor.sweep(force=True)
+
+    assert sorted(os.listdir(processed)) == ['.keep', 'older.xlsx', 'recent.xlsx']
+    assert summary['removed_files'] == 2
+    assert summary['removed_bytes'] == 6100
+    assert summary['processed_bytes'] == 9000
+
+
+def test_sweep_removes_only_old_uploads_it_named(tmp_path):
+    janitor, _, uploads = _janitor(tmp_path)
+    _write(uploads / f'{"a" * 32}_old.xlsx', 10, age=7200)
+    _write(uploads / f'{"b" * 32}_new.xlsx', 10, age=60)
+    _write(uploads / 'TESTING.xlsx', 10, age=7200)
+
+    assert janitor.sweep(force=True)['removed_uploads'] == 1
+    assert sorted(os.listdir(uploads)) == ['TESTING.xlsx', f'{"b" * 32}_new.xlsx']
+
+
+def test_sweep_runs_once_per_interval(tmp_path):
+    janitor, _, _ = _janitor(tmp_path, interval=300)
+    assert janitor.sweep() is not None
+    assert janitor.sweep() is None
+    assert janitor.sweep(force=True) is not None
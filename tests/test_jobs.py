@@ -0,0 +1,75 @@
+import os
+import time
+
+import openpyxl
+
+import jobs
+
+
+def _crashing_runner(progress_callback, **kwargs):
+    os._exit(9)
+
+
+def _summary_runner(progress_callback, **kwargs):
+    return {'rows_processed': 3, 'rows_excluded': 1}
+
+
+def _wait_finished(job_queue, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = job_queue.get(job_id)
+        if job['status'] in (jobs.JOB_DONE, jobs.JOB_FAILED):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_crashed_job_fails_and_pool_recovers(tmp_path):
+    job_queue = jobs.JobQueue(str(tmp_path / 'jobs.sqlite3'), max_workers=1)
+
+    crashed = _wait_finished(job_queue, job_queue.submit({}, runner=_crashing_runner))
+    assert crashed['status'] == jobs.JOB_FAILED
+    assert 'did not finish' in crashed['error']
+
+    done = _wait_finished(job_queue, job_queue.submit({}, runner=_summary_runner))
+    assert done['status'] == jobs.JOB_DONE
+    assert done['rows_processed'] == 3
+
+
+def _failing_runner(progress_callback, **kwargs):
+    raise ValueError("Input sheet 'Sheet9' not found in the Excel file.")
+
+
+def test_job_runs_process_data_excel(tmp_path):
+    source = tmp_path / 'source.xlsx'
+    workbook = openpyxl.Workbook()
+    workbook.active.append(['UUID', 'KONTEN'])
+    for index, text in enumerate(['gopay promo', 'clean row', 'another clean row']):
+        workbook.active.append([f'id-{index}', text])
+    workbook.save(source)
+    job_queue = jobs.JobQueue(str(tmp_path / 'jobs.sqlite3'), max_workers=1)
+
+    job_id = job_queue.submit({
+        'input_filepath': str(source),
+        'cleaned_output_filepath': str(tmp_path / 'cleaned.xlsx'),
+        'excluded_output_filepath': str(tmp_path / 'excluded.xlsx'),
+        'keywords_list': ['gopay'],
+        'input_sheet_name': 'Sheet',
+        'streaming': True,
+    }, result={'cleaned_file_url': '/download/cleaned.xlsx'}, filename='source.xlsx')
+    job = _wait_finished(job_queue, job_id)
+
+    assert job['status'] == jobs.JOB_DONE
+    assert job['filename'] == 'source.xlsx'
+    assert (job['rows_processed'], job['rows_excluded']) == (3, 1)
+    assert job['cleaned_file_url'] == '/download/cleaned.xlsx'
+    assert job['excluded_by_keyword'] == {'gopay': 1}
+    assert (tmp_path / 'cleaned.xlsx').exists() and not source.exists()
+
+
+def test_failed_job_records_its_error(tmp_path):
+    job_queue = jobs.JobQueue(str(tmp_path / 'jobs.sqlite3'), max_workers=1)
+    job = _wait_finished(job_queue, job_queue.submit({}, runner=_failing_runner))
+    assert job['status'] == jobs.JOB_FAILED
+    assert job['error'] == "Input sheet 'Sheet9' not found in the Excel file."
+    assert job_queue.get('no-such-job') is None
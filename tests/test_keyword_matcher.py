@@ -0,0 +1,49 @@
+import pytest
+
+from keyword_matcher import KeywordMatcher
+
+
+def test_shared_prefixes_are_tested_once():
+    matcher = KeywordMatcher(['gopay', 'gojek', 'go'])
+    assert matcher.pattern.pattern == 'go(?:jek|pay)?'
+    assert matcher.find('bayar pakai gopay saja') == 'gopay'
+    assert matcher.find('naik gojek') == 'gojek'
+    assert matcher.find('ayo go') == 'go'
+    assert matcher.find('tidak ada') is None
+
+
+def test_no_keywords():
+    matcher = KeywordMatcher([])
+    assert not matcher
+    assert matcher.find('apa saja') is None
+
+
+@pytest.mark.parametrize('keywords', [[''], ['  '], ['', 'gopay']])
+def test_empty_keyword_matches_every_value(keywords):
+    matcher = KeywordMatcher(keywords)
+    assert matcher.find('apa saja') is not None
+    assert matcher.find('') is not None
+
+
+def test_case_folding_reports_the_keyword_as_given():
+    matcher = KeywordMatcher(['  GoPay ', 'gopay', 'Dijual'])
+    assert matcher.keywords == ['gopay', 'dijual']
+    assert matcher.find('Promo GOPAY hari ini') == 'GoPay'
+    assert matcher.find('RUMAH DIJUAL') == 'Dijual'
+
+
+def test_long_keyword():
+    keyword = 'promo ' * 500
+    matcher = KeywordMatcher([keyword, keyword + 'gopay'])
+    assert matcher.find('x ' + keyword.upper() + 'gopay') == keyword + 'gopay'
+    assert matcher.find('x ' + keyword) == keyword.strip()
+    assert matcher.find(keyword[:-10]) is None
+
+
+def test_deeply_nested_keywords_fall_back_to_an_alternation():
+    # Each keyword is a prefix of the next, so the trie pattern nests 600 groups
+    keywords = ['a' * length for length in range(1, 600)] + ['a' * length + 'b' for length in range(1, 600)]
+    matcher = KeywordMatcher(keywords)
+    assert '(?:' not in matcher.pattern.pattern
+    assert matcher.find('x' + 'a' * 10 + 'b') == 'a' * 10 + 'b'
+    assert matcher.find('xaaay') == 'aaa'
@@ -0,0 +1,170 @@
+import io
+import json
+
+import pytest
+
+from keyword_sets import KeywordSetStore
+from conftest import write_konten_workbook
+
+
+@pytest.fixture
+def store(tmp_path):
+    return KeywordSetStore(str(tmp_path / 'keyword_sets.sqlite3'), cache_size=2)
+
+
+def test_put_and_get(store):
+    keyword_set, created = store.put('promo', [' gopay ', 'Dijual', ''])
+
+    assert created
+    assert keyword_set['version'] == 1
+    assert keyword_set['keywords'] == ['gopay', 'Dijual']
+    assert store.get('promo')['keywords'] == ['gopay', 'Dijual']
+    assert store.list() == [{key: value for key, value in keyword_set.items() if key != 'keywords'}]
+
+
+def test_update_bumps_the_version(store):
+    store.put('promo', ['gopay'])
+    keyword_set, created = store.put('promo', ['ovo', 'dana'])
+
+    assert not created
+    assert keyword_set['version'] == 2
+    assert keyword_set['keyword_count'] == 2
+    assert store.get('promo')['keywords'] == ['ovo', 'dana']
+
+
+def test_matcher_is_cached_per_version(store):
+    store.put('promo', ['gopay'])
+    _, first = store.matcher('promo')
+    _, again = store.matcher('promo')
+    assert again is first
+
+    store.put('promo', ['ovo'])
+    keyword_set, updated = store.matcher('promo')
+    assert updated is not first
+    assert keyword_set['version'] == 2
+    assert updated.find('bayar pakai OVO') == 'ovo'
+    assert updated.find('gopay') is None
+
+
+def test_update_through_another_store_is_picked_up(store):
+    store.put('promo', ['gopay'])
+    _, cached = store.matcher('promo')
+
+    # Another gunicorn worker has its own store on the same database
+    KeywordSetStore(store.db_path).put('promo', ['ovo'])
+
+    _, updated = store.matcher('promo')
+    assert updated is not cached
+    assert updated.find('ovo') == 'ovo'
+
+
+def test_delete_drops_the_cached_matcher(store):
+    store.put('promo', ['gopay'])
+    store.matcher('promo')
+
+    assert store.delete('promo')
+    assert store.matcher('promo') == (None, None)
+    assert not store.delete('promo')
+
+    store.put('promo', ['ovo'])
+    keyword_set, keyword_matcher = store.matcher('promo')
+    assert keyword_set['version'] == 1
+    assert keyword_matcher.find('gopay') is None
+
+
+def test_cache_keeps_the_most_recently_used_sets(store):
+    for name in ('a', 'b', 'c'):
+        store.put(name, [name])
+    _, matcher_a = store.matcher('a')
+    store.matcher('b')
+    store.matcher('a')
+    store.matcher('c')
+
+    assert list(store._matchers) == [('a', 1), ('c', 1)]
+    assert store.matcher('a')[1] is matcher_a
+
+
+def test_unknown_names(store):
+    assert store.get('missing') is None
+    assert store.matcher('missing') == (None, None)
+    assert store.list() == []
+
+
+@pytest.mark.parametrize('name, keywords', [
+    ('', ['gopay']),
+    ('bad/name', ['gopay']),
+    ('x' * 65, ['gopay']),
+    ('promo', 'gopay'),
+    ('promo', ['gopay', 1]),
+])
+def test_invalid_sets_are_rejected(store, name, keywords):
+    with pytest.raises(ValueError):
+        store.put(name, keywords)
+    assert store.list() == []
+
+
+def test_keyword_set_endpoints(client):
+    created = client.put('/keyword-sets/endpoint-promo', json={'keywords': ['gopay']})
+    assert created.status_code == 201
+    assert created.get_json()['version'] == 1
+
+    updated = client.put('/keyword-sets/endpoint-promo', json={'keywords': ['gopay', 'ovo']})
+    assert updated.status_code == 200
+    assert updated.get_json()['version'] == 2
+
+    assert client.get('/keyword-sets/endpoint-promo').get_json()['keywords'] == ['gopay', 'ovo']
+    names = [keyword_set['name'] for keyword_set in client.get('/keyword-sets').get_json()['keyword_sets']]
+    assert 'endpoint-promo' in names
+
+    assert client.delete('/keyword-sets/endpoint-promo').status_code == 204
+    assert client.get('/keyword-sets/endpoint-promo').status_code == 404
+    assert client.delete('/keyword-sets/endpoint-promo').status_code == 404
+
+
+@pytest.mark.parametrize('body', [None, {'words': ['gopay']}, {'keywords': 'gopay'}, {'keywords': [1, 2]}])
+def test_put_endpoint_rejects_invalid_bodies(client, body):
+    response = client.put('/keyword-sets/invalid-body', json=body) if body is not None else \
+        client.put('/keyword-sets/invalid-body', data='not json', content_type='application/json')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert client.get('/keyword-sets/invalid-body').status_code == 404
+
+
+def test_put_endpoint_rejects_invalid_names(client):
+    response = client.put('/keyword-sets/' + 'x' * 65, json={'keywords': ['gopay']})
+    assert response.status_code == 400
+    assert 'Invalid keyword set name' in response.get_json()['error']
+
+
+def _upload(tmp_path, **fields):
+    source = tmp_path / 'upload.xlsx'
+    write_konten_workbook(source, rows=20)
+    return dict(fields, excelFile=(io.BytesIO(source.read_bytes()), 'export.xlsx'))
+
+
+def test_upload_uses_the_keyword_set(client, tmp_path):
+    client.put('/keyword-sets/upload-promo', json={'keywords': ['dijual']})
+
+    response = client.post('/process-excel', data=_upload(tmp_path, keywordSet='upload-promo'),
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['excluded_by_keyword'] == {'dijual': 3}
+
+
+def test_unknown_keyword_set_in_an_upload_is_a_404(client, tmp_path):
+    response = client.post('/process-excel', data=_upload(tmp_path, keywordSet='no-such-set'),
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 404
+    assert response.get_json()['error'] == "Keyword set 'no-such-set' not found."
+
+
+def test_keyword_set_and_keywords_together_are_rejected(client, tmp_path):
+    client.put('/keyword-sets/form-promo', json={'keywords': ['gopay']})
+
+    response = client.post('/jobs', data=_upload(tmp_path, keywordSet='form-promo', keywords=json.dumps(['ovo'])),
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 400
+    assert 'not both' in response.get_json()['error']
@@ -0,0 +1,106 @@
+import io
+import json
+
+import metrics
+from conftest import write_konten_workbook
+
+MB = 2 ** 20
+
+
+def _summary(total_seconds=2.0, rows_processed=1000):
+    return {
+        'stages': {'load': {'seconds': 0.2, 'peak_rss_bytes': 40 * MB},
+                   'classify': {'seconds': 1.5, 'peak_rss_bytes': 100 * MB}},
+        'total_seconds': total_seconds,
+        'rows_processed': rows_processed,
+        'excluded_by_keyword': {'gopay': 3, 'Dijual': 2},
+        'excluded_foreign_characters': 1,
+        'excluded_duplicates': 4,
+    }
+
+
+def _samples(text):
+    """The sample lines of a Prometheus text exposition, as {series with labels: value}."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            samples[series] = float(value)
+    return samples
+
+
+def test_render_histograms_and_counters(tmp_path):
+    processing_metrics = metrics.ProcessingMetrics(str(tmp_path / 'metrics.sqlite3'))
+    processing_metrics.record_run(_summary())
+    processing_metrics.record_run(_summary(total_seconds=0.5))
+    processing_metrics.record_failure()
+
+    text = processing_metrics.render()
+    samples = _samples(text)
+
+    assert '# TYPE aceng_stage_duration_seconds histogram' in text
+    assert '# TYPE aceng_rows_processed_total counter' in text
+    # Cumulative buckets: 0.2s is above 0.1 and within 0.25
+    assert samples['aceng_stage_duration_seconds_bucket{stage="load",le="0.1"}'] == 0
+    assert samples['aceng_stage_duration_seconds_bucket{stage="load",le="0.25"}'] == 2
+    assert samples['aceng_stage_duration_seconds_bucket{stage="load",le="+Inf"}'] == 2
+    assert samples['aceng_stage_duration_seconds_count{stage="load"}'] == 2
+    assert samples['aceng_stage_duration_seconds_sum{stage="load"}'] == 0.4
+    assert samples['aceng_stage_peak_rss_bytes_bucket{stage="classify",le="67108864.0"}'] == 0
+    assert samples['aceng_stage_peak_rss_bytes_bucket{stage="classify",le="134217728.0"}'] == 2
+    assert samples['aceng_processing_duration_seconds_bucket{le="0.5"}'] == 1
+    assert samples['aceng_processing_duration_seconds_bucket{le="2.5"}'] == 2
+    assert samples['aceng_processing_duration_seconds_count'] == 2
+    # 500 and 2000 rows per second
+    assert samples['aceng_processing_rows_per_second_bucket{le="1000.0"}'] == 1
+    assert samples['aceng_processing_rows_per_second_bucket{le="5000.0"}'] == 2
+
+    assert samples['aceng_rows_processed_total'] == 2000
+    assert samples['aceng_rows_excluded_total{reason="keyword"}'] == 10
+    assert samples['aceng_rows_excluded_total{reason="foreign_characters"}'] == 2
+    assert samples['aceng_rows_excluded_total{reason="duplicate"}'] == 8
+    assert samples['aceng_processing_runs_total{outcome="success"}'] == 2
+    assert samples['aceng_processing_runs_total{outcome="failure"}'] == 1
+
+
+def test_render_lists_buckets_in_ascending_order(tmp_path):
+    processing_metrics = metrics.ProcessingMetrics(str(tmp_path / 'metrics.sqlite3'))
+    processing_metrics.record_run(_summary())
+
+    lines = [line for line in processing_metrics.render().splitlines()
+             if line.startswith('aceng_processing_duration_seconds_bucket')]
+    bounds = [line.split('le="', 1)[1].split('"', 1)[0] for line in lines]
+    assert bounds == [repr(float(bound)) for bound in metrics.DURATION_BUCKETS] + ['+Inf']
+
+
+def test_render_without_runs_lists_every_metric(tmp_path):
+    text = metrics.ProcessingMetrics(str(tmp_path / 'metrics.sqlite3')).render()
+    for name, (metric_type, _, _) in metrics.METRICS.items():
+        assert f'# TYPE {name} {metric_type}' in text
+    assert _samples(text) == {}
+
+
+def test_metrics_endpoint_counts_a_processed_upload(client, tmp_path):
+    before = _samples(client.get('/metrics').get_data(as_text=True))
+
+    source = tmp_path / 'export.xlsx'
+    write_konten_workbook(source, rows=40)
+    # A keyword no other test uses, so the result cannot come from the cache
+    data = {'keywords': json.dumps(['metrics endpoint']), 'foreignScripts': 'none',
+            'excelFile': (io.BytesIO(source.read_bytes()), 'export.xlsx')}
+    response = client.post('/process-excel', data=data, content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_json()
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    after = _samples(response.get_data(as_text=True))
+
+    def added(series):
+        return after.get(series, 0) - before.get(series, 0)
+
+    assert added('aceng_processing_runs_total{outcome="success"}') == 1
+    assert added('aceng_rows_processed_total') == 40
+    assert added('aceng_processing_duration_seconds_count') == 1
+    assert added('aceng_processing_duration_seconds_bucket{le="+Inf"}') == 1
+    assert added('aceng_stage_duration_seconds_count{stage="classify"}') == 1
@@ -0,0 +1,72 @@
+import openpyxl
+import pytest
+
+import excel_processor
+from conftest import write_workbook
+
+
+SHEETS = {
+    'Sheet1': [['UUID', 'KONTEN'], ['a1', 'gopay promo'], ['a2', 'clean row']],
+    'Lookup': [['code', 'name'], [1, 'one']],
+    'Other': [['konten ', 'extra'], ['plain text', 1], ['你好', 2], ['dijual GOPAY', 3]],
+}
+
+
+def _build(path):
+    write_workbook(path, SHEETS)
+
+
+@pytest.mark.parametrize('auxiliary_sheets', ['copy', 'reference'])
+def test_outputs_keep_the_workbook_sheet_order(run_processor, auxiliary_sheets):
+    summary, cleaned, excluded = run_processor(
+        build=_build, input_sheet_names=excel_processor.ALL_KONTEN_SHEETS, sheet_workers=2,
+        auxiliary_sheets=auxiliary_sheets, reason_column=True)
+
+    assert summary['rows_processed'] == 5
+    assert summary['rows_excluded'] == 3
+    for output in (cleaned, excluded):
+        assert openpyxl.load_workbook(output).sheetnames == ['Sheet1', 'Lookup', 'Other']
+
+    kept = openpyxl.load_workbook(cleaned)
+    assert [row for row in kept['Other'].iter_rows(values_only=True)] == [('konten ', 'extra'), ('plain text', 1)]
+    assert [row for row in kept['Lookup'].iter_rows(values_only=True)] == [('code', 'name'), (1, 'one')]
+    dropped = openpyxl.load_workbook(excluded)
+    assert [row[-1] for row in dropped['Other'].iter_rows(min_row=2, values_only=True)] == [
+        'foreign characters', 'keyword: gopay']
+
+
+def test_each_sheet_summary_has_its_own_stages(run_processor):
+    summary, cleaned, _ = run_processor(build=_build, input_sheet_names=['Other', 'Sheet1'], auxiliary_sheets='skip')
+
+    assert set(summary['sheets']) == {'Sheet1', 'Other'}
+    assert summary['sheets']['Other']['rows_processed'] == 3
+    for sheet_summary in summary['sheets'].values():
+        assert set(sheet_summary['stages']) == {'load', 'classify', 'save'}
+        assert sheet_summary['stages']['classify']['rows_per_sec'] > 0
+    assert openpyxl.load_workbook(cleaned).sheetnames == ['Sheet1', 'Other']
+
+
+@pytest.mark.parametrize('dedup_key, key', [('auto', 'auto'), ('konten', 'konten')])
+def test_totals_add_up_the_dedup_summaries_of_the_sheets(run_processor, dedup_key, key):
+    sheets = {
+        'Sheet1': [['UUID', 'KONTEN'], ['a1', 'same text'], ['a1', 'same text'], ['a2', 'Same  Text']],
+        'Other': [['KONTEN'], ['plain text'], ['Plain text'], ['plain text'], ['other text']],
+    }
+    summary, _, _ = run_processor(build=lambda path: write_workbook(path, sheets),
+                                  input_sheet_names=excel_processor.ALL_KONTEN_SHEETS,
+                                  dedup='drop', dedup_key=dedup_key)
+
+    per_sheet = [summary['sheets'][name]['dedup'] for name in ('Sheet1', 'Other')]
+    assert summary['dedup']['mode'] == 'drop'
+    assert summary['dedup']['key'] == key
+    for field in ('duplicates', 'dropped', 'unique_keys', 'index_bytes'):
+        assert summary['dedup'][field] == sum(dedup[field] for dedup in per_sheet)
+    # Sheet1 repeats a UUID (and, by KONTEN, a text); Other repeats a text twice
+    assert summary['dedup']['duplicates'] == (1 if dedup_key == 'auto' else 2) + 2
+    assert summary['rows_processed'] + summary['dedup']['dropped'] == 7
+
+
+def test_totals_have_no_dedup_summary_without_dedup(run_processor):
+    summary, _, _ = run_processor(build=_build, input_sheet_names=['Sheet1', 'Other'])
+
+    assert 'dedup' not in summary
@@ -0,0 +1,17 @@
+import excel_processor
+
+
+def test_rows_per_sec_only_for_row_stages():
+    progress = excel_processor.ProcessingProgress()
+    for stage in excel_processor.STAGES:
+        for _ in range(10):
+            progress.add(False)
+        progress.end_stage(stage)
+
+    stages = progress.summary()['stages']
+    assert set(stages) == set(excel_processor.STAGES)
+    for name, timing in stages.items():
+        if name in excel_processor.ROW_STAGES:
+            assert timing['rows_per_sec'] > 0
+        else:
+            assert timing['rows_per_sec'] is None
@@ -0,0 +1,54 @@
+import os
+import time
+
+import result_cache
+
+
+def _store(cache, key, size):
+    name = cache.output_name(key, 'out.xlsx', 'cleaned')
+    with open(os.path.join(cache.folder, name), 'wb') as f:
+        f.write(b'x' * size)
+    cache.store(key, [name], {'cleaned_file_url': name})
+    return name
+
+
+def test_cache_key_ignores_keyword_order_and_case():
+    key = result_cache.cache_key('digest', ['Gopay', 'promo'], 'Sheet1', '1')
+    assert key == result_cache.cache_key('digest', ['promo', 'gopay '], 'Sheet1', '1')
+    assert key != result_cache.cache_key('digest', ['promo', 'gopay'], 'Sheet1', '2')
+    assert key != result_cache.cache_key('digest', ['promo', 'gopay'], 'Sheet1', '1', {'reader': 'openpyxl'})
+
+
+def test_store_and_lookup(tmp_path):
+    cache = result_cache.ResultCache(str(tmp_path))
+    assert cache.lookup('a' * 64) is None
+    name = _store(cache, 'a' * 64, 10)
+    assert cache.lookup('a' * 64) == {'cleaned_file_url': name}
+
+    os.remove(tmp_path / name)
+    assert cache.lookup('a' * 64) is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = result_cache.ResultCache(str(tmp_path), max_bytes=25)
+    old = _store(cache, 'a' * 64, 10)
+    time.sleep(0.01)
+    _store(cache, 'b' * 64, 10)
+    time.sleep(0.01)
+    assert cache.lookup('a' * 64) is not None  # now the most recently used
+    time.sleep(0.01)
+    _store(cache, 'c' * 64, 10)
+
+    assert cache.lookup('b' * 64) is None
+    assert cache.lookup('a' * 64) is not None
+    assert os.path.exists(tmp_path / old)
+
+
+def test_store_keeps_an_entry_larger_than_the_cache(tmp_path):
+    cache = result_cache.ResultCache(str(tmp_path), max_bytes=25)
+    _store(cache, 'a' * 64, 10)
+    name = _store(cache, 'b' * 64, 100)
+
+    assert os.path.exists(tmp_path / name)
+    assert cache.lookup('b' * 64) is not None
+    assert cache.lookup('a' * 64) is None
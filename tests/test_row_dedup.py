@@ -0,0 +1,70 @@
+import pytest
+
+from row_dedup import DigestIndex, normalize_konten
+from conftest import sheet_rows, write_workbook
+
+
+def test_digest_index_grows_and_remembers_every_key():
+    index = DigestIndex()
+    keys = [f'key {number}' for number in range(5000)]
+    assert all(index.add(key) for key in keys)
+    assert not any(index.add(key) for key in keys)
+    assert index.count == 5000
+    assert index.nbytes >= 2 * 5000 * 8
+
+
+def test_normalize_konten():
+    assert normalize_konten('  Promo   GOPAY\n hari ini ') == 'promo gopay hari ini'
+
+
+# (UUID, KONTEN) rows of the dedup workbook
+DEDUP_ROWS = [
+    ('u1', 'Promo hari ini'),
+    ('u2', 'promo  HARI ini'),  # same text as u1
+    ('u1', 'another text'),  # same UUID as the first row
+    ('u3', 'gopay promo'),  # excluded by keyword, never a duplicate
+    ('u4', 'gopay promo'),
+    ('u5', ''),  # empty keys are never duplicates
+    ('u6', ''),
+]
+
+
+def _run(run_processor, streaming=False, with_uuid=True, **kwargs):
+    if with_uuid:
+        sheet = [['UUID', 'KONTEN']] + [list(row) for row in DEDUP_ROWS]
+    else:
+        sheet = [['KONTEN']] + [[konten] for _, konten in DEDUP_ROWS]
+    summary, cleaned, excluded = run_processor(build=lambda path: write_workbook(path, {'Sheet1': sheet}),
+                                               streaming=streaming, reason_column=True, **kwargs)
+    return summary, sheet_rows(cleaned, min_row=2), sheet_rows(excluded, min_row=2)
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_exclude_by_uuid(run_processor, streaming):
+    summary, kept, dropped = _run(run_processor, streaming, dedup='exclude')
+    assert [row[0] for row in kept] == ['u1', 'u2', 'u5', 'u6']
+    assert [(row[0], row[-1]) for row in dropped] == [
+        ('u1', 'duplicate'), ('u3', 'keyword: gopay'), ('u4', 'keyword: gopay')]
+    assert summary['excluded_duplicates'] == 1
+    assert summary['dedup']['key'] == 'uuid'
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_drop_by_konten(run_processor, streaming):
+    summary, kept, dropped = _run(run_processor, streaming, dedup='drop', dedup_key='konten')
+    assert [row[0] for row in kept] == ['u1', 'u1', 'u5', 'u6']
+    assert all(row[-1] != 'duplicate' for row in dropped)
+    assert summary['dedup']['dropped'] == 1
+    assert summary['rows_processed'] == 6
+
+
+def test_auto_key_without_uuid_column_uses_konten(run_processor):
+    summary, kept, _ = _run(run_processor, with_uuid=False, dedup='exclude')
+    assert summary['dedup']['key'] == 'konten'
+    # Without the UUID column the empty KONTEN rows are blank and skipped
+    assert [row[0] for row in kept] == ['Promo hari ini', 'another text']
+
+
+def test_uuid_key_needs_a_uuid_column(run_processor):
+    with pytest.raises(ValueError, match='UUID'):
+        _run(run_processor, with_uuid=False, dedup='exclude', dedup_key='uuid')
@@ -0,0 +1,67 @@
+import csv
+import gzip
+import json
+import datetime
+
+import pytest
+
+import excel_processor
+from conftest import sheet_rows, write_workbook
+
+
+def _read_flat(path, output_format):
+    """Rows of a flat output: lists of CSV fields, or the JSON Lines objects."""
+    opener = gzip.open if output_format == 'csv.gz' else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        if output_format == 'jsonl':
+            return [json.loads(line) for line in f]
+        return list(csv.reader(f))
+
+
+def _as_csv(value):
+    return '' if value is None else str(value)
+
+
+def _as_json(value):
+    return value.isoformat() if isinstance(value, datetime.datetime) else value
+
+
+@pytest.mark.parametrize('output_format', ['csv', 'csv.gz', 'jsonl'])
+def test_flat_outputs_match_the_xlsx_output(run_processor, output_format):
+    xlsx_summary, xlsx_cleaned, xlsx_excluded = run_processor('xlsx', reason_column=True)
+    flat_summary, flat_cleaned, flat_excluded = run_processor('flat', reason_column=True,
+                                                              output_format=output_format)
+
+    for key in ('rows_processed', 'rows_kept', 'rows_excluded', 'excluded_by_keyword'):
+        assert flat_summary[key] == xlsx_summary[key]
+    for xlsx_path, flat_path in ((xlsx_cleaned, flat_cleaned), (xlsx_excluded, flat_excluded)):
+        # The flat outputs hold the processed sheet only, with the header and values as read
+        expected = sheet_rows(xlsx_path)
+        rows = _read_flat(flat_path, output_format)
+        if output_format == 'jsonl':
+            # No header line: every object is keyed by the header
+            assert len(rows) == len(expected) - 1
+            assert all(list(row) == list(expected[0]) for row in rows)
+            assert [list(row.values()) for row in rows] == [
+                [_as_json(value) for value in row] for row in expected[1:]]
+        else:
+            assert len(rows) == len(expected)
+            assert rows == [[_as_csv(value) for value in row] for row in expected]
+    assert xlsx_summary['rows_excluded'] > 0
+
+
+def test_jsonl_keys_of_repeated_and_empty_headers_are_unique(run_processor):
+    sheet = [['KONTEN', 'KOLOM', 'KOLOM', None, 'KOLOM_2'],
+             ['first row', 1, 2, 3, 4],
+             ['gopay promo', 5, 6, 7, 8]]
+    _, cleaned, excluded = run_processor(build=lambda path: write_workbook(path, {'Sheet1': sheet}),
+                                         output_format='jsonl')
+
+    assert _read_flat(cleaned, 'jsonl') == [
+        {'KONTEN': 'first row', 'KOLOM': 1, 'KOLOM_2': 2, 'column_4': 3, 'KOLOM_2_2': 4}]
+    assert _read_flat(excluded, 'jsonl') == [
+        {'KONTEN': 'gopay promo', 'KOLOM': 5, 'KOLOM_2': 6, 'column_4': 7, 'KOLOM_2_2': 8}]
+
+
+def test_unique_keys():
+    assert excel_processor.unique_keys(['A', 'A', None, 'A_2', 'A']) == ['A', 'A_2', 'column_3', 'A_2_2', 'A_3']
@@ -0,0 +1,68 @@
+import pytest
+
+import excel_processor
+from keyword_matcher import KeywordMatcher
+from script_detector import ScriptDetector, SCRIPT_RANGES
+
+# Non-ASCII text without any foreign character
+PADDING = 'é \U0001F600 ' * 100
+
+
+@pytest.mark.parametrize('script', list(SCRIPT_RANGES))
+def test_every_range_boundary_is_found(script):
+    detector = ScriptDetector([script])
+    for start, end in SCRIPT_RANGES[script]:
+        for code_point in (start, end):
+            text = PADDING + chr(code_point)
+            assert detector.is_foreign(text)
+            assert detector.foreign_characters(text) == 1
+            assert detector.search(text).start() == len(PADDING)
+    assert not detector.is_foreign(PADDING)
+    assert detector.search(PADDING) is None
+
+
+def test_other_scripts_are_ignored():
+    detector = ScriptDetector(['greek'])
+    text = PADDING + 'привет 你好'
+    assert not detector.is_foreign(text)
+    assert ScriptDetector().is_foreign(text)
+
+
+@pytest.mark.parametrize('text', ['plain text', 'é \U0001F600', 'halo 你好', 'привет', '', 'gopay 你好'])
+def test_exclusion_reason_matches_is_foreign(text):
+    keyword_matcher = KeywordMatcher(['gopay'])
+    for detector in (ScriptDetector(), ScriptDetector(min_ratio=0.5), ScriptDetector(())):
+        reason = excel_processor.exclusion_reason(text, keyword_matcher, detector)
+        if keyword_matcher.find(text) is None:
+            assert (reason == excel_processor.FOREIGN_CHARACTER_REASON) == detector.is_foreign(text)
+
+
+def test_default_scripts_and_ascii():
+    detector = ScriptDetector()
+    assert detector.is_foreign('halo 你好')
+    assert detector.is_foreign('привет')
+    assert not detector.is_foreign('plain ascii text')
+    assert not detector.is_foreign('Γειά σου')  # greek is not a default script
+    assert not detector.is_foreign('')
+
+
+def test_min_ratio_counts_foreign_characters():
+    detector = ScriptDetector(min_ratio=0.5)
+    assert detector.foreign_characters('ab你好') == 2
+    assert detector.is_foreign('ab你好')
+    assert not detector.is_foreign('abc你好')
+    assert not detector.is_foreign('abcdefgh 你')
+    assert detector.search is None
+
+
+def test_no_scripts_turns_the_check_off():
+    detector = ScriptDetector(())
+    assert not detector
+    assert not detector.is_foreign('你好')
+    assert detector.search is None
+
+
+@pytest.mark.parametrize('kwargs', [{'scripts': ['klingon']}, {'min_ratio': 0}, {'min_ratio': 1.5}])
+def test_invalid_settings_are_rejected(kwargs):
+    with pytest.raises(ValueError):
+        ScriptDetector(**kwargs)
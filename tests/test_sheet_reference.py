@@ -0,0 +1,118 @@
+import openpyxl
+import pytest
+from openpyxl.styles import Font
+
+import excel_processor
+import sheet_reference
+
+
+def _workbook_with_styled_aux_sheet(path):
+    workbook = openpyxl.Workbook()
+    data = workbook.active
+    data.title = 'Sheet1'
+    data.append(['KONTEN'])
+    data.append(['gopay promo'])
+    data.append(['clean row'])
+
+    aux = workbook.create_sheet('Notes')
+    for index in range(1, 40):
+        aux.cell(row=index, column=1, value=index).number_format = '0.00%'
+    aux.append(['plain'])
+    aux.row_dimensions[2].font = Font(bold=True)
+    aux.row_dimensions[3].number_format = '0.00%'
+    aux.column_dimensions['B'].font = Font(italic=True)
+    aux.column_dimensions['C'].number_format = '0.00%'
+    workbook.save(path)
+
+
+def test_reference_sheet_with_styled_rows_and_columns_reloads(tmp_path):
+    source = tmp_path / 'source.xlsx'
+    cleaned = tmp_path / 'cleaned.xlsx'
+    excluded = tmp_path / 'excluded.xlsx'
+    _workbook_with_styled_aux_sheet(source)
+
+    excel_processor.process_data_excel(
+        str(source), str(cleaned), str(excluded), keywords_list=['gopay'], streaming=True,
+        auxiliary_sheets='reference',
+    )
+
+    for output in (cleaned, excluded):
+        workbook = openpyxl.load_workbook(output)
+        notes = workbook['Notes']
+        assert notes['A1'].value == 1
+        assert notes['A1'].number_format == '0.00%'
+        assert notes.row_dimensions[3].number_format == '0.00%'
+        assert notes.column_dimensions['C'].number_format == '0.00%'
+
+
+def test_rewrite_drops_relationship_ids_and_unmapped_styles():
+    sheet_xml = (
+        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        b'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        b'<cols><col min="1" max="1" width="9" style="7" customWidth="1"/></cols>'
+        b'<sheetData><row r="1" s="7" customFormat="1"><c r="A1" s="7"><v>1</v></c></row>'
+        b'<row r="2" s="3" customFormat="1"/></sheetData>'
+        b'<pageSetup orientation="portrait" r:id="rId1"/></worksheet>'
+    )
+    rewritten = sheet_reference.rewrite_sheet_xml(sheet_xml, [], {'7': '2', '3': '0'})
+
+    assert b'r:id' not in rewritten
+    assert b'<col min="1" max="1" width="9" style="2" customWidth="1"/>' in rewritten
+    assert b'<row r="1" s="2" customFormat="1">' in rewritten
+    assert b'<row r="2"/>' in rewritten
+    assert b'<c r="A1" s="2">' in rewritten
+
+
+def test_rewrite_reads_single_quoted_attributes():
+    sheet_xml = (
+        b"<worksheet xmlns='http://schemas.openxmlformats.org/spreadsheetml/2006/main' "
+        b"xmlns:r='http://schemas.openxmlformats.org/officeDocument/2006/relationships'>"
+        b"<sheetViews><sheetView tabSelected='1' workbookViewId='0'/></sheetViews>"
+        b"<sheetData><row r='1'><c r='A1' t='s' s='1'><v>0</v></c>"
+        b"<c r='B1' t='str'><v>text</v></c></row></sheetData>"
+        b"<pageSetup orientation='portrait' r:id='rId1'/></worksheet>"
+    )
+    rewritten = sheet_reference.rewrite_sheet_xml(sheet_xml, ['shared & text'], {'1': '4'})
+
+    assert b'<row r="1">' in rewritten
+    assert b'<c r="A1" t="inlineStr" s="4"><is><t xml:space="preserve">shared &amp; text</t></is></c>' in rewritten
+    assert b'<c r="B1" t="str">' in rewritten
+    assert b'tabSelected' not in rewritten
+    assert b'r:id' not in rewritten
+
+
+def _workbook_with_formula_sheet(path):
+    workbook = openpyxl.Workbook()
+    data = workbook.active
+    data.title = 'Sheet1'
+    data.append(['KONTEN'])
+    data.append(['clean row'])
+    calc = workbook.create_sheet('Calc')
+    calc.append(['name', 'share', 'total'])
+    calc.append(['a', 0.25, '=B2*4'])
+    calc['B2'].number_format = '0.00%'
+    workbook.create_sheet('Hidden').sheet_state = 'hidden'
+    workbook.save(path)
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+@pytest.mark.parametrize('mode', excel_processor.AUXILIARY_SHEET_MODES)
+def test_auxiliary_sheet_modes(tmp_path, mode, streaming):
+    source = tmp_path / 'source.xlsx'
+    cleaned = tmp_path / 'cleaned.xlsx'
+    excluded = tmp_path / 'excluded.xlsx'
+    _workbook_with_formula_sheet(source)
+
+    excel_processor.process_data_excel(str(source), str(cleaned), str(excluded), keywords_list=['gopay'],
+                                       streaming=streaming, auxiliary_sheets=mode)
+
+    for output in (cleaned, excluded):
+        workbook = openpyxl.load_workbook(output)
+        if mode == 'skip':
+            assert workbook.sheetnames == ['Processed Data']
+            continue
+        assert workbook.sheetnames == ['Processed Data', 'Calc', 'Hidden']
+        assert workbook['Hidden'].sheet_state == 'hidden'
+        calc = workbook['Calc']
+        assert [cell.value for cell in calc[2]] == ['a', 0.25, '=B2*4']
+        assert calc['B2'].number_format == '0.00%'
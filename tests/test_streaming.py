@@ -0,0 +1,56 @@
+import functools
+
+import pytest
+
+import excel_processor
+from conftest import workbook_contents, write_konten_workbook
+
+
+def _run(run_processor, streaming, name=None, **kwargs):
+    summary, cleaned, excluded = run_processor(name or ('streaming' if streaming else 'memory'),
+                                               streaming=streaming, reason_column=True, **kwargs)
+    return summary, workbook_contents(cleaned), workbook_contents(excluded)
+
+
+@pytest.mark.parametrize('autofit_sample_rows', [None, 10])
+def test_streaming_output_matches_in_memory_output(run_processor, autofit_sample_rows):
+    memory_summary, memory_cleaned, memory_excluded = _run(run_processor, False, autofit_sample_rows=autofit_sample_rows)
+    streaming_summary, streaming_cleaned, streaming_excluded = _run(run_processor, True,
+                                                                    autofit_sample_rows=autofit_sample_rows)
+
+    assert streaming_cleaned == memory_cleaned
+    assert streaming_excluded == memory_excluded
+    for key in ('rows_processed', 'rows_kept', 'rows_excluded', 'excluded_by_keyword', 'excluded_foreign_characters'):
+        assert streaming_summary[key] == memory_summary[key]
+
+    cells, widths = memory_cleaned['Processed Data']
+    assert cells[1][2][1] == 'dd/mm/yyyy'
+    assert cells[1][3][1] == '0.0%'
+    assert widths
+    assert list(memory_cleaned) == ['Processed Data', 'Lookup']
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_sampled_autofit_only_measures_the_first_rows_of_each_sheet(run_processor, streaming):
+    _, exact_cleaned, _ = _run(run_processor, streaming)
+    _, one_row_cleaned, _ = _run(run_processor, streaming, autofit_sample_rows=1)
+    _, two_rows_cleaned, _ = _run(run_processor, streaming, autofit_sample_rows=2)
+    # The long KONTEN text is the fourth data row, but only the second kept one
+    assert one_row_cleaned['Processed Data'][1]['B'] < exact_cleaned['Processed Data'][1]['B']
+    assert two_rows_cleaned['Processed Data'][1]['B'] == exact_cleaned['Processed Data'][1]['B']
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_readers_give_the_same_output(run_processor, streaming):
+    build = functools.partial(write_konten_workbook, rows=200, short_row=True)
+    results = {reader: _run(run_processor, streaming, reader, build=build, keywords=['gopay', 'Dijual'],
+                            reader=reader)
+               for reader in excel_processor.READERS}
+
+    xlsx_summary, xlsx_cleaned, xlsx_excluded = results['xlsx']
+    openpyxl_summary, openpyxl_cleaned, openpyxl_excluded = results['openpyxl']
+    assert xlsx_cleaned == openpyxl_cleaned
+    assert xlsx_excluded == openpyxl_excluded
+    for key in ('rows_processed', 'rows_excluded', 'excluded_by_keyword', 'excluded_foreign_characters'):
+        assert xlsx_summary[key] == openpyxl_summary[key]
+    assert xlsx_summary['excluded_by_keyword'] == {'gopay': 29, 'Dijual': 28}
@@ -0,0 +1,122 @@
+import io
+import os
+import json
+import time
+
+import pytest
+
+from conftest import sheet_rows, write_konten_workbook
+
+
+def _upload(tmp_path, content=None, rows=30, **fields):
+    """Form data of an upload: the standard workbook (or content) plus the given fields."""
+    if content is None:
+        source = tmp_path / 'upload.xlsx'
+        write_konten_workbook(source, rows=rows)
+        content = source.read_bytes()
+    data = {'keywords': json.dumps(['gopay']), 'includeReason': 'true', **fields}
+    data['excelFile'] = (io.BytesIO(content), 'export.xlsx')
+    return data
+
+
+def _files(folder):
+    """Files in folder, except the result cache index and the janitor's lock."""
+    return sorted(name for name in os.listdir(folder) if not name.startswith('.'))
+
+
+@pytest.fixture
+def folders(app_module):
+    """The upload and output folders, emptied before each test."""
+    upload_folder = app_module.app.config['UPLOAD_FOLDER']
+    processed_folder = app_module.app.config['PROCESSED_FOLDER']
+    for folder in (upload_folder, processed_folder):
+        for name in _files(folder):
+            os.remove(os.path.join(folder, name))
+    return upload_folder, processed_folder
+
+
+def _wait_finished(client, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/jobs/{job_id}').get_json()
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_process_excel_reads_the_upload_in_place(client, folders, tmp_path):
+    upload_folder, processed_folder = folders
+
+    source = tmp_path / 'export.xlsx'
+    write_konten_workbook(source, rows=30)
+    response = client.post('/process-excel', data=_upload(tmp_path, source.read_bytes(), foreignScripts='none'),
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 200, response.get_json()
+    result = response.get_json()
+    assert result['cached'] is False
+    assert (result['rows_processed'], result['rows_excluded']) == (30, 5)
+    assert _files(upload_folder) == []
+    cleaned = os.path.join(processed_folder, os.path.basename(result['cleaned_url']))
+    excluded = os.path.join(processed_folder, os.path.basename(result['excluded_url']))
+    assert _files(processed_folder) == sorted(os.path.basename(path) for path in (cleaned, excluded))
+    assert len(sheet_rows(cleaned, min_row=2)) == 25
+    assert [row[-1] for row in sheet_rows(excluded, min_row=2)] == ['keyword: gopay'] * 5
+
+    again = client.post('/process-excel', data=_upload(tmp_path, source.read_bytes(), foreignScripts='none'),
+                        content_type='multipart/form-data')
+    assert again.get_json()['cached'] is True
+
+
+def test_process_excel_leaves_no_files_behind_on_error(client, folders, tmp_path):
+    upload_folder, processed_folder = folders
+
+    broken = client.post('/process-excel', data=_upload(tmp_path, content=b'not a workbook'),
+                         content_type='multipart/form-data')
+    missing_sheet = client.post('/process-excel', data=_upload(tmp_path, inputSheetName='Sheet9'),
+                                content_type='multipart/form-data')
+
+    assert broken.status_code == 500
+    assert missing_sheet.status_code == 500
+    assert 'Sheet9' in missing_sheet.get_json()['error']
+    assert _files(upload_folder) == []
+    assert _files(processed_folder) == []
+
+
+def test_jobs_saves_the_upload_and_deletes_it_when_done(client, folders, tmp_path):
+    upload_folder, processed_folder = folders
+
+    response = client.post('/jobs', data=_upload(tmp_path, rows=40), content_type='multipart/form-data')
+
+    assert response.status_code == 202, response.get_json()
+    job = _wait_finished(client, response.get_json()['job_id'])
+    assert job['status'] == 'done', job
+    assert job['rows_processed'] == 40
+    assert _files(upload_folder) == []
+    assert len(sheet_rows(os.path.join(processed_folder, os.path.basename(job['cleaned_url'])))) == 1 + 40 - 12
+
+
+def test_jobs_leaves_no_files_behind_on_error(client, folders, tmp_path):
+    upload_folder, processed_folder = folders
+
+    response = client.post('/jobs', data=_upload(tmp_path, rows=20, inputSheetName='Sheet9'),
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 202
+    job = _wait_finished(client, response.get_json()['job_id'])
+    assert job['status'] == 'failed'
+    assert 'Sheet9' in job['error']
+    assert _files(upload_folder) == []
+    assert _files(processed_folder) == []
+
+
+def test_upload_over_the_size_limit_is_rejected(app_module, client, folders, tmp_path, monkeypatch):
+    upload_folder, _ = folders
+    monkeypatch.setitem(app_module.app.config, 'MAX_CONTENT_LENGTH', 1024)
+
+    response = client.post('/process-excel', data=_upload(tmp_path), content_type='multipart/form-data')
+
+    assert response.status_code == 413
+    assert 'too large' in response.get_json()['error']
+    assert _files(upload_folder) == []
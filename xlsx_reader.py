@@ -0,0 +1,188 @@
+"""
+Fast row reader for xlsx worksheets, without building openpyxl cell objects.
+
+openpyxl's read_only mode still turns every cell into a dict and a ReadOnlyCell
+and resolves its style on access. For the data sheet we only need values (and,
+for the number format copy, the style id of each value), so this module iterparses
+the worksheet XML straight from the xlsx zip and yields plain tuples per row.
+
+Values match what openpyxl's read_only iter_rows(values_only=True) returns: shared
+and inline strings, numbers, booleans, dates (for cells whose style has a date
+format) and formulas as '=...' strings. Rows are padded to the sheet dimension and
+missing rows are yielded as empty rows, the same way openpyxl does.
+"""
+from openpyxl.xml.functions import iterparse
+from openpyxl.utils import column_index_from_string
+from openpyxl.utils.datetime import from_excel, from_ISO8601, WINDOWS_EPOCH
+from openpyxl.worksheet._reader import WorkSheetParser
+
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_ROW_TAG = f'{SHEET_NS}row'
+_VALUE_TAG = f'{SHEET_NS}v'
+_FORMULA_TAG = f'{SHEET_NS}f'
+_INLINE_STRING_TAG = f'{SHEET_NS}is'
+_TEXT_TAG = f'{SHEET_NS}t'
+_RUN_TAG = f'{SHEET_NS}r'
+
+_DIGITS = '0123456789'
+
+# Column letters -> 1-based index; there are few distinct columns, so this stays tiny
+_column_indexes = {}
+
+
+def _column_index(reference):
+    letters = reference.rstrip(_DIGITS)
+    index = _column_indexes.get(letters)
+    if index is None:
+        index = _column_indexes[letters] = column_index_from_string(letters)
+    return index
+
+
+def _cast_number(text):
+    # Same rule as openpyxl: integers unless there is a decimal point or an exponent
+    if '.' in text or 'E' in text or 'e' in text:
+        return float(text)
+    return int(text)
+
+
+def _inline_string(inline):
+    """Text of an <is> element: its plain <t> plus the <t> of its rich text runs."""
+    snippets = []
+    for child in inline:
+        if child.tag == _TEXT_TAG:
+            snippets.append(child.text or '')
+        elif child.tag == _RUN_TAG:
+            text = child.findtext(_TEXT_TAG)
+            if text is not None:
+                snippets.append(text)
+    return ''.join(snippets)
+
+
+class StyledRow(tuple):
+    """Value tuple of a row that also carries the style id of each value as style_ids."""
+
+
+def _styled_row(values, style_ids):
+    row = StyledRow(values)
+    row.style_ids = style_ids
+    return row
+
+
+def iter_sheet_rows(archive, sheet_path, shared_strings, min_row=1, max_row=None, max_column=None,
+                    date_style_ids=frozenset(), timedelta_style_ids=frozenset(), epoch=WINDOWS_EPOCH,
+                    with_styles=False):
+    """
+    Yields the rows of the worksheet part sheet_path of an open xlsx ZipFile as value tuples.
+
+    shared_strings is the workbook's shared string table (a list). Numeric cells whose
+    style id is in date_style_ids become datetimes (timedeltas for timedelta_style_ids).
+    max_row and max_column are the sheet dimension: rows are padded to max_column
+    values and reading stops after max_row, like openpyxl does. With with_styles=True
+    each row is a StyledRow whose style_ids give the style id of every value (0 for
+    padding).
+    """
+    # openpyxl's parser is only used for formula cells (shared formulas need its state)
+    formula_parser = None
+    empty_row = (None,) * max_column if max_column else ()
+    empty_styles = (0,) * max_column if max_column else ()
+    counter = min_row
+    row_number = 0
+    past_max_row = False
+
+    with archive.open(sheet_path) as source:
+        # Only end events: a row is complete when it ends, and start events would
+        # double the per-element overhead of the parse
+        for _, element in iterparse(source):
+            if element.tag != _ROW_TAG:
+                continue
+
+            row_reference = element.get('r')
+            row_number = int(row_reference) if row_reference else row_number + 1
+            if max_row is not None and row_number > max_row:
+                past_max_row = True
+                break
+            if row_number < counter:
+                element.clear()
+                continue
+
+            # Some rows are missing
+            while counter < row_number:
+                counter += 1
+                yield _styled_row(empty_row, empty_styles) if with_styles else empty_row
+
+            values = []
+            styles = []
+            column = 0
+            for cell in element:
+                cell_reference = cell.get('r')
+                column = _column_index(cell_reference) if cell_reference else column + 1
+                if max_column is not None and column > max_column:
+                    continue
+                while len(values) < column - 1:
+                    values.append(None)
+                    styles.append(0)
+
+                data_type = cell.get('t', 'n')
+                style_id = cell.get('s')
+                style_id = int(style_id) if style_id else 0
+
+                # <f> comes before <v> and <is> holds inline strings, so the first child tells the kind
+                child = cell[0] if len(cell) else None
+                if child is None:
+                    value = None
+                elif child.tag == _VALUE_TAG:
+                    value = child.text or None
+                    if value is not None:
+                        if data_type == 'n':
+                            value = _cast_number(value)
+                            if style_id in date_style_ids:
+                                try:
+                                    value = from_excel(value, epoch, timedelta=style_id in timedelta_style_ids)
+                                except (OverflowError, ValueError):
+                                    value = '#VALUE!'
+                        elif data_type == 's':
+                            value = shared_strings[int(value)]
+                        elif data_type == 'b':
+                            value = bool(int(value))
+                        elif data_type == 'd':
+                            value = from_ISO8601(value)
+                elif child.tag == _FORMULA_TAG:
+                    if formula_parser is None:
+                        formula_parser = WorkSheetParser(None, shared_strings)
+                    value = formula_parser.parse_formula(cell)
+                elif child.tag == _INLINE_STRING_TAG and data_type == 'inlineStr':
+                    value = _inline_string(child)
+                else:
+                    value = None
+                values.append(value)
+                styles.append(style_id)
+
+            if max_column is not None and len(values) < max_column:
+                padding = max_column - len(values)
+                values.extend([None] * padding)
+                styles.extend([0] * padding)
+
+            # Cleared rows stay in the tree as empty elements, as in openpyxl's own parser
+            element.clear()
+
+            counter += 1
+            yield _styled_row(values, styles) if with_styles else tuple(values)
+
+    # Like openpyxl, rows up to max_row are only filled in when the sheet has rows past it
+    if past_max_row:
+        while counter <= max_row:
+            counter += 1
+            yield _styled_row(empty_row, empty_styles) if with_styles else empty_row
+
+
+def iter_worksheet_rows(worksheet, min_row=1, with_styles=False):
+    """
+    iter_sheet_rows for an openpyxl read_only worksheet: the sheet part, shared
+    strings, date styles and dimension are taken from the already loaded workbook.
+    """
+    workbook = worksheet.parent
+    return iter_sheet_rows(workbook._archive, worksheet._worksheet_path, worksheet._shared_strings,
+                           min_row=min_row, max_row=worksheet.max_row, max_column=worksheet.max_column,
+                           date_style_ids=workbook._date_formats,
+                           timedelta_style_ids=workbook._timedelta_formats,
+                           epoch=workbook.epoch, with_styles=with_styles)